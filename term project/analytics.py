@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import List, Dict, Any
+
+
+# Check-in throughput while doors are open. CheckinAnalytics is a store
+# listener (see Store.add_listener): it counts check-ins per event per
+# minute of checkin_timestamp and active/checked-in registrations per ticket
+# type, so every check_in_attendee() moves a couple of counters. Attaching it
+# replays the stored timestamps, which is the backfill; backfill() does the
+# same for a registration stream without a store.
+#
+# Expected arrivals: the event's active registrations spread evenly over
+# ARRIVAL_WINDOW_MINUTES from doors-open (DOORS_OPEN on the start date unless
+# given). The queue at a minute is how far actual check-ins trail that curve.
+# The arrivals table only covers that window, so one stray timestamp days
+# away cannot stretch it; check-ins before or after it are counted instead.
+
+DOORS_OPEN = "08:00"
+ARRIVAL_WINDOW_MINUTES = 120
+RATE_MINUTES = 5
+ACTIVE = {"confirmed", "checked-in"}
+
+
+def _minute(timestamp) -> str | None:
+    # "YYYY-MM-DDTHH:MM", which sorts in time order
+    text = str(timestamp or "")
+    return text[:16] if len(text) >= 16 else None
+
+
+class CheckinAnalytics:
+    def __init__(self, store=None) -> None:
+        self.store = store
+        self.reset()
+        if store is not None:
+            store.add_listener(self)
+
+    def reset(self) -> None:
+        self._minutes: dict[str, dict[str, int]] = {}
+        self._tickets: dict[str, dict[str, list]] = {}  # event -> ticket type -> [active, checked_in]
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.remove_listener(self)
+            self.store = None
+
+    def apply(self, r: dict, delta: int) -> None:
+        status = r.get("status")
+        if status not in ACTIVE:
+            return
+        eid = r.get("event_id")
+        per_ticket = self._tickets.setdefault(eid, {})
+        row = per_ticket.get(r.get("ticket_type"))
+        if row is None:
+            row = per_ticket[r.get("ticket_type")] = [0, 0]
+        row[0] += delta
+        if status != "checked-in":
+            return
+        row[1] += delta
+        minute = _minute(r.get("checkin_timestamp"))
+        if minute is not None:
+            buckets = self._minutes.setdefault(eid, {})
+            count = buckets.get(minute, 0) + delta
+            if count:
+                buckets[minute] = count
+            else:
+                buckets.pop(minute, None)
+
+    def backfill(self, registrations) -> "CheckinAnalytics":
+        for r in registrations:
+            self.apply(r, 1)
+        return self
+
+    def per_minute(self, event_id: str) -> dict[str, int]:
+        return dict(sorted(self._minutes.get(event_id, {}).items()))
+
+    def no_show_rates(self, event_id: str) -> dict[str, dict]:
+        # active registrations not (yet) checked in, per ticket type
+        rates = {}
+        for ticket, (active, checked_in) in sorted(self._tickets.get(event_id, {}).items(), key=lambda x: str(x[0])):
+            if active:
+                rates[ticket] = {
+                    "registered": active,
+                    "checked_in": checked_in,
+                    "no_show": active - checked_in,
+                    "no_show_rate": round((active - checked_in) / active, 4),
+                }
+        return rates
+
+    def arrivals(
+        self,
+        event_id: str,
+        doors_open: datetime,
+        window: int = ARRIVAL_WINDOW_MINUTES,
+        until: datetime | None = None,
+    ) -> dict[str, dict]:
+        # minute -> actual and expected cumulative arrivals and the queue
+        buckets = self._minutes.get(event_id, {})
+        expected_total = sum(active for active, _ in self._tickets.get(event_id, {}).values())
+        last = doors_open + timedelta(minutes=window - 1)
+        if until is not None:
+            last = min(last, until)
+        start = doors_open.strftime("%Y-%m-%dT%H:%M")
+        # check-ins before doors-open count in the first minute
+        actual = sum(n for m, n in buckets.items() if m < start)
+        table = {}
+        minute, elapsed = doors_open, 0
+        while minute <= last:
+            key = minute.strftime("%Y-%m-%dT%H:%M")
+            now = buckets.get(key, 0)
+            actual += now
+            elapsed += 1
+            expected = round(expected_total * min(1.0, elapsed / window), 1)
+            table[key] = {
+                "checked_in": now,
+                "cumulative": actual,
+                "expected": expected,
+                "queue": max(0.0, round(expected - actual, 1)),
+            }
+            minute += timedelta(minutes=1)
+        return table
+
+    def outside_window(self, event_id: str, doors_open: datetime, window: int = ARRIVAL_WINDOW_MINUTES) -> dict[str, int]:
+        start = doors_open.strftime("%Y-%m-%dT%H:%M")
+        end = (doors_open + timedelta(minutes=window)).strftime("%Y-%m-%dT%H:%M")
+        buckets = self._minutes.get(event_id, {})
+        return {
+            "before": sum(n for m, n in buckets.items() if m < start),
+            "after": sum(n for m, n in buckets.items() if m >= end),
+        }
+
+    def summary(
+        self,
+        event_id: str,
+        doors_open: str | None = None,
+        window: int = ARRIVAL_WINDOW_MINUTES,
+        now: datetime | None = None,
+    ) -> dict:
+        event = (self.store.get_event(event_id) if self.store is not None else None) or {}
+        if doors_open is None:
+            doors_open = f"{event.get('start_date') or datetime.now().date().isoformat()}T{DOORS_OPEN}"
+        opened = datetime.fromisoformat(doors_open)
+        now = now or datetime.now()
+        buckets = self._minutes.get(event_id, {})
+        recent_from = (now - timedelta(minutes=RATE_MINUTES)).strftime("%Y-%m-%dT%H:%M")
+        recent_to = now.strftime("%Y-%m-%dT%H:%M")
+        recent = sum(n for m, n in buckets.items() if recent_from < m <= recent_to)
+        peak = max(buckets.items(), key=lambda x: (x[1], x[0])) if buckets else (None, 0)
+        table = self.arrivals(event_id, opened, window, until=now if now >= opened else None)
+        current = table[max(table)] if table else {"cumulative": 0, "expected": 0.0, "queue": 0.0}
+        outside = self.outside_window(event_id, opened, window)
+        return {
+            "event_id": event_id,
+            "doors_open": opened.isoformat(timespec="minutes"),
+            "checked_in": sum(buckets.values()),
+            "per_minute_now": round(recent / RATE_MINUTES, 2),
+            "peak_minute": peak[0],
+            "peak_per_minute": peak[1],
+            "expected_so_far": current["expected"],
+            "queue_now": current["queue"],
+            "before_window": outside["before"],
+            "after_window": outside["after"],
+            "no_show": self.no_show_rates(event_id),
+            "arrivals": table,
+        }
+
+
+def export(analytics: CheckinAnalytics, event_id: str, filename: str, **kwargs) -> str:
+    # CSV gets the per-minute table (one row per minute), JSON the full summary
+    import reports
+
+    summary = analytics.summary(event_id, **kwargs)
+    report = summary["arrivals"] if filename.lower().endswith(".csv") else summary
+    return reports.export_report(report, filename)
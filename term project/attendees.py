@@ -2,15 +2,14 @@ from __future__ import annotations
 
 import json
 import os
-import uuid
 from typing import List, Dict, Any, Optional
 
+from store import Store, ensure_store
+
 
 def load_attendees(path: str) -> list:
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    import storage
+    return list(storage.iter_json_array(path))
 
 
 def save_attendees(path: str, attendees: list) -> None:
@@ -24,16 +23,18 @@ def _generate_pin() -> str:
     return f"{random.randint(0, 9999):04d}"
 
 
-def register_attendee(attendees: list, profile: dict) -> dict:
+def register_attendee(attendees: list, profile: dict, store: Store | None = None) -> dict:
     required = ["name", "email"]
     for key in required:
         if key not in profile or not str(profile[key]).strip():
             raise ValueError(f"Missing required field '{key}' for attendee.")
 
+    store = ensure_store(store, attendees=attendees)
     email = profile["email"].strip().lower()
-    for a in attendees:
-        if a.get("email", "").strip().lower() == email:
-            raise ValueError("An attendee with this email already exists.")
+    if store.directory().find_by_email(email) is not None:
+        raise ValueError("An attendee with this email already exists.")
+
+    import uuid
 
     aid = profile.get("id") or uuid.uuid4().hex[:8]
     pin = profile.get("pin") or _generate_pin()
@@ -48,32 +49,41 @@ def register_attendee(attendees: list, profile: dict) -> dict:
         "pin": pin,
         "communication": profile.get("communication", {"email_opt_in": True}),
     }
-    attendees.append(attendee)
+    store.add_attendee(attendee)
     return attendee
 
 
-def authenticate_attendee(attendees: list, email: str, pin: str) -> dict | None:
-    email = email.strip().lower()
-    for a in attendees:
-        if a.get("email", "").strip().lower() == email and a.get("pin") == pin:
+def authenticate_attendee(attendees: list, email: str, pin: str, store: Store | None = None) -> dict | None:
+    store = ensure_store(store, attendees=attendees)
+    for a in store.directory().find_all_by_email(email):
+        if a.get("pin") == pin:
             return a
     return None
 
 
-def update_attendee(attendees: list, attendee_id: str, updates: dict) -> dict:
-    for a in attendees:
-        if a.get("id") == attendee_id:
-            if "email" in updates:
-                new_email = updates["email"].strip().lower()
-                for other in attendees:
-                    if other is a:
-                        continue
-                    if other.get("email", "").strip().lower() == new_email:
-                        raise ValueError("Another attendee already uses this email.")
-                updates["email"] = new_email
-            updates.pop("id", None)
-            updates.pop("pin", None)
-
-            a.update(updates)
-            return a
-    raise ValueError(f"Attendee with id '{attendee_id}' not found.")
+def search_attendees(attendees: list, query: str, store: Store | None = None, limit: int = 20) -> list:
+    store = ensure_store(store, attendees=attendees)
+    return store.directory().search(query, limit=limit)
+
+
+def update_attendee(
+    attendees: list,
+    attendee_id: str,
+    updates: dict,
+    store: Store | None = None,
+) -> dict:
+    store = ensure_store(store, attendees=attendees)
+    a = store.get_attendee(attendee_id)
+    if a is None:
+        raise ValueError(f"Attendee with id '{attendee_id}' not found.")
+    if "email" in updates:
+        new_email = updates["email"].strip().lower()
+        if any(other is not a for other in store.directory().find_all_by_email(new_email)):
+            raise ValueError("Another attendee already uses this email.")
+        updates["email"] = new_email
+    updates.pop("id", None)
+    updates.pop("pin", None)
+
+    with store.updating_attendee(a):
+        a.update(updates)
+    return a
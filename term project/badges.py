@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from string import Formatter
+from typing import List, Dict, Any
+
+import storage
+from store import Store
+
+
+# Batch badge printing for a whole event. Badges are rendered from a template
+# compiled once, then written either into a single zip, a single spool file
+# (badges separated by form feeds) or one spool file per printer.
+
+DEFAULT_TEMPLATE = "\n".join(
+    [
+        "==============================",
+        "        EVENT BADGE",
+        "==============================",
+        "Name        : {name}",
+        "Organization: {organization}",
+        "Ticket Type : {ticket_type}",
+        "Confirmation: {confirmation_code}",
+        "",
+        "Sessions:",
+        "{sessions}",
+        "==============================",
+    ]
+)
+
+FIELDS = {"name", "organization", "ticket_type", "confirmation_code", "registration_id", "event_id", "sessions"}
+FORMATS = ("zip", "spool", "printers")
+PAGE_BREAK = "\f\n"
+
+
+class BadgeTemplate:
+    # The template is split into literal text and field names once; rendering
+    # is a single join over precomputed parts instead of re-parsing it.
+
+    def __init__(self, text: str = DEFAULT_TEMPLATE) -> None:
+        self.parts: list[tuple[str, str | None]] = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and field not in FIELDS:
+                raise ValueError(f"Unknown badge field '{field}'.")
+            if spec or conversion:
+                raise ValueError("Badge fields do not take format specs or conversions.")
+            self.parts.append((literal, field))
+
+    def render(self, values: dict) -> str:
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(values[field]))
+        return "".join(out)
+
+
+def session_index(events: list) -> dict[str, dict[str, str]]:
+    return {
+        e.get("id"): {s["id"]: s.get("title") or s["id"] for s in e.get("sessions", [])}
+        for e in events
+    }
+
+
+def session_lines(session_ids: list, titles: dict[str, str] | None) -> str:
+    if not session_ids:
+        return "  (None assigned)"
+    if titles is None:
+        return "\n".join(f"  - Session ID: {sid}" for sid in session_ids)
+    return "\n".join(f"  - {titles[sid]}" if sid in titles else f"  - Session ID: {sid}" for sid in session_ids)
+
+
+def badge_values(attendee: dict, registration: dict, titles: dict[str, str] | None = None) -> dict:
+    return {
+        "name": attendee.get("name"),
+        "organization": attendee.get("organization", ""),
+        "ticket_type": registration.get("ticket_type"),
+        "confirmation_code": registration.get("confirmation_code"),
+        "registration_id": registration.get("id"),
+        "event_id": registration.get("event_id"),
+        "sessions": session_lines(registration.get("sessions", []), titles),
+    }
+
+
+def select(
+    store: Store,
+    event_id: str,
+    statuses: tuple = ("confirmed", "checked-in"),
+    ticket_type: str | None = None,
+    registration_ids: set | None = None,
+) -> list[dict]:
+    store.find_event(event_id)
+    selected = [
+        r
+        for r in store.registrations
+        if r.get("event_id") == event_id
+        and r.get("status") in statuses
+        and (ticket_type is None or r.get("ticket_type") == ticket_type)
+        and (registration_ids is None or r.get("id") in registration_ids)
+    ]
+    # printers hand out badges alphabetically
+    selected.sort(key=lambda r: ((store.get_attendee(r.get("attendee_id")) or {}).get("name") or "", r.get("id")))
+    return selected
+
+
+def render_all(
+    store: Store,
+    registrations: list[dict],
+    template: BadgeTemplate | None = None,
+    workers: int = 4,
+    chunk_size: int = 500,
+) -> list[tuple[str, str]]:
+    template = template or BadgeTemplate()
+    titles = session_index(store.events)
+
+    def render_chunk(chunk: list[dict]) -> list[tuple[str, str]]:
+        return [
+            (
+                r["id"],
+                template.render(
+                    badge_values(store.get_attendee(r.get("attendee_id")) or {}, r, titles.get(r.get("event_id")))
+                ),
+            )
+            for r in chunk
+        ]
+
+    chunks = [registrations[i : i + chunk_size] for i in range(0, len(registrations), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        rendered = map(render_chunk, chunks)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="badges") as pool:
+            rendered = list(pool.map(render_chunk, chunks))
+    return [badge for chunk in rendered for badge in chunk]
+
+
+def _replace_into(path: str, write) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def write_zip(path: str, badges: list[tuple[str, str]]) -> str:
+    def write(tmp: str) -> None:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as zf:
+            for rid, text in badges:
+                zf.writestr(f"badge_{rid}.txt", text)
+
+    return _replace_into(path, write)
+
+
+def write_spool(path: str, badges: list[tuple[str, str]]) -> str:
+    def write(tmp: str) -> None:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(PAGE_BREAK.join(text for _, text in badges))
+
+    return _replace_into(path, write)
+
+
+def write_printer_chunks(path: str, badges: list[tuple[str, str]], printers: int) -> list[str]:
+    # Contiguous slices, so each printer covers one alphabetical range.
+    if printers < 1:
+        raise ValueError("Number of printers must be at least 1.")
+    root, ext = os.path.splitext(path)
+    size = -(-len(badges) // printers) if badges else 0
+    return [
+        write_spool(f"{root}-printer{k + 1}{ext or '.txt'}", badges[k * size : (k + 1) * size])
+        for k in range(printers)
+    ]
+
+
+def generate_event_badges(
+    store: Store,
+    event_id: str,
+    out_path: str,
+    fmt: str = "zip",
+    printers: int = 1,
+    template: BadgeTemplate | None = None,
+    workers: int = 4,
+    **filters,
+) -> list[str]:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown badge output format '{fmt}'.")
+    badges = render_all(store, select(store, event_id, **filters), template, workers)
+    if fmt == "zip":
+        return [write_zip(out_path, badges)]
+    if fmt == "spool":
+        return [write_spool(out_path, badges)]
+    return write_printer_chunks(out_path, badges, printers)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Render every badge for an event in one batch.")
+    parser.add_argument("event_id")
+    parser.add_argument("--base-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--format", choices=FORMATS, default="zip")
+    parser.add_argument("--printers", type=int, default=1)
+    parser.add_argument("--out", help="output file (default: badges/<event>.zip or .txt)")
+    parser.add_argument("--ticket-type")
+    parser.add_argument("--template", help="text file with {name}, {sessions}, ... fields")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    store = Store(*storage.load_state(args.base_dir))
+    template = None
+    if args.template:
+        with open(args.template, "r", encoding="utf-8") as f:
+            template = BadgeTemplate(f.read())
+    ext = ".zip" if args.format == "zip" else ".txt"
+    out = args.out or os.path.join(args.base_dir, "badges", f"{args.event_id}{ext}")
+    try:
+        paths = generate_event_badges(
+            store,
+            args.event_id,
+            out,
+            fmt=args.format,
+            printers=args.printers,
+            template=template,
+            workers=args.workers,
+            ticket_type=args.ticket_type,
+        )
+    except ValueError as e:
+        raise SystemExit(f"Error: {e}")
+    for p in paths:
+        print(f"Wrote {p}")
+
+
+if __name__ == "__main__":
+    main()
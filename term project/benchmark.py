@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List, Dict, Any
+
+import attendees as attendees_mod
+import checkin
+import datagen
+import registration as reg_mod
+import records
+import reports
+import schedule
+import snapshot
+import storage
+from seats import SeatMap
+from store import Store
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_snapshot_load(n_registrations: int, repeat: int = 3) -> dict:
+    events, attendees, registrations = datagen.generate(n_registrations)
+    with tempfile.TemporaryDirectory() as base:
+        storage.write_snapshot(base, events, attendees, registrations)
+        snapshot.write(base, events, attendees, registrations)
+        assert snapshot.load(base) == storage.load_snapshot(base)
+
+        ddir = storage._data_dir(base)
+        json_bytes = sum(
+            os.path.getsize(os.path.join(ddir, f"{n}.json")) for n in ("events", "attendees", "registrations")
+        )
+        json_s = _best_of(lambda: storage.load_snapshot(base), repeat)
+        snap_s = _best_of(lambda: snapshot.load(base), repeat)
+        return {
+            "registrations": n_registrations,
+            "json_bytes": json_bytes,
+            "snapshot_bytes": os.path.getsize(snapshot.snapshot_path(base)),
+            "json_load_s": round(json_s, 4),
+            "snapshot_load_s": round(snap_s, 4),
+            "speedup": round(json_s / snap_s, 2),
+        }
+
+
+def _timed(fn, ops: int, repeat: int = 1) -> dict:
+    # fn performs `ops` operations; the best of `repeat` runs is reported.
+    seconds = _best_of(fn, repeat)
+    return {"ops": ops, "seconds": round(seconds, 6), "per_op_us": round(seconds / max(ops, 1) * 1e6, 3)}
+
+
+def bench_hot_paths(scale: str | int = "1k", repeat: int = 3, ops: int = 1000, seed: int = 7) -> dict:
+    events, attendees, registrations = datagen.generate(scale, seed)
+    rng = random.Random(seed)
+    results: dict[str, dict] = {}
+
+    # Read-only paths first, on the untouched data.
+    results["reports.aggregate"] = _timed(lambda: reports.aggregate(events, registrations), 1, repeat)
+    for name in ("attendance_report", "revenue_report", "session_popularity"):
+        fn = getattr(reports, name)
+        results[f"reports.{name}"] = _timed(lambda fn=fn: fn(events, registrations), 1, repeat)
+
+    with tempfile.TemporaryDirectory() as base:
+        mode = storage.storage_mode(base)
+        results["save_state"] = _timed(lambda: storage.save_state(base, events, attendees, registrations), 1, repeat)
+        results["load_state"] = _timed(lambda: storage.load_state(base), 1, repeat)
+
+    built: list = []
+    results["store.build"] = _timed(lambda: built.append(Store(events, attendees, registrations)), 1)
+    store = built[0]
+
+    sample = [attendees[rng.randrange(len(attendees))] for _ in range(ops)]
+    store.directory()
+    results["authenticate_attendee"] = _timed(
+        lambda: [attendees_mod.authenticate_attendee(attendees, a["email"], a["pin"], store) for a in sample],
+        len(sample),
+        repeat,
+    )
+    results["schedule.conflict_report"] = _timed(lambda: schedule.conflict_report(store), 1, repeat)
+    # a repeated report with nothing changed in between is a cache hit
+    reports.aggregate(events, registrations, store)
+    results["reports.aggregate_cached"] = _timed(lambda: reports.aggregate(events, registrations, store), 1, repeat)
+    results["directory.build_search"] = _timed(lambda: store.directory().search("a"), 1)
+    prefixes = [a["name"][: rng.randrange(3, 12)] for a in sample]
+    results["search_attendees"] = _timed(
+        lambda: [attendees_mod.search_attendees(attendees, p, store) for p in prefixes], len(prefixes), repeat
+    )
+
+    # Mutating paths, each timed once on the shared store.
+    confirmed = [r["id"] for r in registrations if r["status"] == "confirmed"]
+    codes = [store.get_registration(rid)["confirmation_code"] for rid in rng.sample(confirmed, min(ops, len(confirmed)))]
+    results["check_in_attendee"] = _timed(
+        lambda: [checkin.check_in_attendee(registrations, code, store) for code in codes], len(codes)
+    )
+
+    new = [
+        {
+            "event_id": events[rng.randrange(len(events))]["id"],
+            "attendee_id": attendees[rng.randrange(len(attendees))]["id"],
+            "ticket_type": "General",
+            "payment_method": "Card",
+        }
+        for _ in range(ops)
+    ]
+    results["create_registration"] = _timed(
+        lambda: [reg_mod.create_registration(registrations, data, events, store) for data in new], len(new)
+    )
+
+    waiting = [e["id"] for e in events if len(store.waitlist(e["id"]))]
+    targets = [waiting[i % len(waiting)] for i in range(ops)] if waiting else []
+    results["promote_waitlist"] = _timed(
+        lambda: [reg_mod.promote_waitlist(registrations, eid, store) for eid in targets], len(targets)
+    )
+
+    # A full 50k-seat venue: each op frees a random seat and takes the
+    # lowest free one again, as a cancellation plus a promotion would.
+    venue = SeatMap()
+    for seat in range(1, 50_001):
+        venue.hold(seat)
+    freed = [rng.randrange(1, 50_001) for _ in range(ops)]
+
+    def churn() -> None:
+        for seat in freed:
+            venue.release(seat)
+            venue.hold(venue.first_free(50_000))
+
+    results["seats.churn_50k"] = _timed(churn, len(freed), repeat)
+
+    # Room checks against 5k back-to-back hour slots in one room.
+    hall = {"id": "V", "location": "Venue", "sessions": []}
+    day = datetime(2030, 1, 1)
+    for i in range(5000):
+        start = day + timedelta(hours=i)
+        end = start + timedelta(hours=1)
+        hall["sessions"].append({"id": f"S{i}", "room": "Hall", "start_time": start.isoformat(), "end_time": end.isoformat()})
+    slots = schedule.Schedule([hall])
+    probes = [
+        {"room": "Hall", "start_time": (day + timedelta(minutes=m)).isoformat(), "end_time": (day + timedelta(minutes=m + 30)).isoformat()}
+        for m in (rng.randrange(5000 * 60) for _ in range(ops))
+    ]
+    results["schedule.check_room_5k"] = _timed(lambda: [slots.room_conflicts(hall, p) for p in probes], len(probes), repeat)
+
+    return {
+        "scale": scale,
+        "events": len(events),
+        "attendees": len(attendees),
+        "registrations": len(registrations),
+        "storage": mode,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def bench_memory(n_registrations: int = 100_000, seed: int = 7) -> dict:
+    # Registrations as they come out of a JSON load, as plain dicts and as
+    # compact records. Measured with tracemalloc after the load, so only
+    # the memory the records keep is counted.
+    text = json.dumps(datagen.generate(n_registrations, seed)[2])
+
+    def measure(build) -> tuple[int, list]:
+        tracemalloc.start()
+        try:
+            kept = build()
+            return tracemalloc.get_traced_memory()[0], kept
+        finally:
+            tracemalloc.stop()
+
+    dict_bytes, _ = measure(lambda: json.loads(text))
+    compact_bytes, kept = measure(lambda: records.compact_all(json.loads(text)))
+    assert kept == json.loads(text)
+    return {
+        "registrations": n_registrations,
+        "dict_bytes": dict_bytes,
+        "compact_bytes": compact_bytes,
+        "dict_bytes_per_record": round(dict_bytes / n_registrations, 1),
+        "compact_bytes_per_record": round(compact_bytes / n_registrations, 1),
+        "saving": round(1 - compact_bytes / dict_bytes, 3),
+    }
+
+
+STARTUP_TARGET_S = 0.2
+
+
+def _wait_for(proc, output: bytearray, marker: bytes, timeout: float) -> float:
+    start = time.perf_counter()
+    while marker not in output:
+        if proc.poll() is not None or time.perf_counter() - start > timeout:
+            raise ValueError(f"main.py never printed {marker.decode()!r}: {bytes(output[-500:]).decode(errors='replace')}")
+        time.sleep(0.001)
+    return time.perf_counter()
+
+
+def bench_startup(scale: str | int = "100k", repeat: int = 3, seed: int = 7, timeout: float = 300.0) -> dict:
+    # Runs main.py against a generated data directory and measures how long
+    # the role prompt takes to appear and how long the staff menu takes once
+    # "2" is entered (events and registrations loaded, attendees not).
+    import threading
+
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    prompt, staff = [], []
+    with tempfile.TemporaryDirectory() as base:
+        storage.save_changes(base, *datagen.generate(scale, seed), None)
+        data_bytes = sum(
+            os.path.getsize(os.path.join(root, n)) for root, _, names in os.walk(base) for n in names
+        )
+        for _ in range(repeat):
+            output = bytearray()
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, "-u", main_py],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env={**os.environ, "EVENT_BASE_DIR": base},
+            )
+
+            def pump(proc=proc, output=output) -> None:
+                for chunk in iter(lambda: proc.stdout.read1(4096), b""):
+                    output.extend(chunk)
+
+            reader = threading.Thread(target=pump)
+            reader.start()
+            try:
+                prompt.append(_wait_for(proc, output, b"Choose role:", timeout) - start)
+                entered = time.perf_counter()
+                proc.stdin.write(b"2\n")
+                proc.stdin.flush()
+                staff.append(_wait_for(proc, output, b"=== Staff Menu ===", timeout) - entered)
+            finally:
+                # killed rather than exited, so nothing is saved or backed up
+                proc.kill()
+                proc.wait()
+                reader.join()
+    return {
+        "scale": scale,
+        "data_bytes": data_bytes,
+        "prompt_s": round(min(prompt), 4),
+        "staff_menu_s": round(min(staff), 4),
+        "target_s": STARTUP_TARGET_S,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = 0.2) -> list[dict]:
+    # A metric regresses when its time per operation grew by more than
+    # `threshold` (0.2 = 20%); metrics present in only one run are skipped.
+    rows = []
+    for name, before in old["results"].items():
+        after = new["results"].get(name)
+        if after is None or not before["seconds"]:
+            continue
+        ratio = (after["seconds"] / max(after["ops"], 1)) / (before["seconds"] / max(before["ops"], 1))
+        rows.append({"name": name, "ratio": round(ratio, 3), "regression": ratio > 1 + threshold})
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks for the registration platform.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="time the hot paths and print JSON")
+    p.add_argument("--scale", default="1k", help="1k, 100k, 1m or a registration count")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--ops", type=int, default=1000)
+    p.add_argument("--out", help="also write the JSON result here")
+    p = sub.add_parser("compare", help="compare two result files and flag regressions")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=0.2)
+    p = sub.add_parser("memory", help="compare memory of dict and compact registrations")
+    p.add_argument("--registrations", type=int, default=100_000)
+    p = sub.add_parser("snapshot", help="compare JSON and snapshot load times")
+    p.add_argument("--registrations", type=int, default=200_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p = sub.add_parser("startup", help="time main.py to the role prompt with large data files present")
+    p.add_argument("--scale", default="100k", help="1k, 100k, 1m or a registration count")
+    p.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        scale = args.scale if args.scale.lower() in datagen.SCALES else int(args.scale)
+        result = json.dumps(bench_hot_paths(scale, args.repeat, args.ops), indent=2)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(result + "\n")
+        print(result)
+        return 0
+    if args.command == "compare":
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        rows = compare(old, new, args.threshold)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['name']:<32} x{row['ratio']:<8}{flag}")
+        return 1 if any(row["regression"] for row in rows) else 0
+    if args.command == "memory":
+        print(json.dumps(bench_memory(args.registrations), indent=2))
+        return 0
+    if args.command == "startup":
+        scale = args.scale if args.scale.lower() in datagen.SCALES else int(args.scale)
+        result = bench_startup(scale, args.repeat)
+        print(json.dumps(result, indent=2))
+        return 0 if result["prompt_s"] <= STARTUP_TARGET_S else 1
+    print(json.dumps(bench_snapshot_load(args.registrations, args.repeat), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+from typing import List, Dict, Any
+
+import registration as reg_mod
+import storage
+from store import Store
+
+
+# CSV header (JSONL rows use the same keys): id, event_id, attendee_id,
+# ticket_type, payment_method, payment_status, price, confirmation_code,
+# sessions. Only the fields in registration.REQUIRED_FIELDS are mandatory;
+# in CSV, sessions are separated by ";". A JSONL line that does not parse
+# becomes a RowError in place of its row, so it is reported like any other
+# bad row instead of stopping the import.
+
+TEXT_FIELDS = ("id", "event_id", "attendee_id", "ticket_type", "payment_method", "payment_status", "confirmation_code")
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path: str) -> list[dict]:
+    if path.lower().endswith(".csv"):
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            rows = []
+            for row in csv.DictReader(f):
+                row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+                row = {k: v for k, v in row.items() if v != ""}
+                if "sessions" in row:
+                    row["sessions"] = [s.strip() for s in row["sessions"].split(";") if s.strip()]
+                rows.append(row)
+            return rows
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                rows.append(RowError(f"Line {lineno} is not valid JSON: {e.msg}."))
+    return rows
+
+
+def _validate(row: dict, store: Store, batch_ids: set, batch_codes: set, batch_sessions: dict) -> dict:
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError(f"Row must be an object, not {type(row).__name__}.")
+    for key in reg_mod.REQUIRED_FIELDS:
+        if not row.get(key):
+            raise ValueError(f"Missing required field '{key}' for registration.")
+    for key in TEXT_FIELDS:
+        if key in row and not isinstance(row[key], str):
+            raise ValueError(f"Field '{key}' must be a string.")
+    data = dict(row)
+    store.find_event(data["event_id"])
+    if "price" in data:
+        try:
+            data["price"] = float(data["price"])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid price '{row['price']}'.")
+        if data["price"] < 0:
+            raise ValueError("Price must be a non-negative number.")
+    sessions = data.get("sessions", [])
+    if not isinstance(sessions, list) or not all(isinstance(s, str) for s in sessions):
+        raise ValueError("sessions must be a list of session ids.")
+    if sessions:
+        # earlier rows of this batch for the same attendee count too
+        held = store.registrations_for_attendee(data["attendee_id"]) + batch_sessions.get(data["attendee_id"], [])
+        store.schedule().check_attendee(held, data["event_id"], sessions)
+
+    rid = data.get("id")
+    if rid and (rid in batch_ids or rid in store.registration_ids()):
+        raise ValueError(f"Registration id '{rid}' already exists.")
+    while not rid or rid in batch_ids or rid in store.registration_ids():
+        rid = os.urandom(5).hex()
+    data["id"] = rid
+
+    code = data.get("confirmation_code")
+    if code and (code in batch_codes or store.find_registration(code) is not None):
+        raise ValueError(f"Confirmation code '{code}' already exists.")
+    while not code or code in batch_codes or store.find_registration(code) is not None:
+        code = os.urandom(4).hex().upper()
+    data["confirmation_code"] = code
+    return data
+
+
+def import_registrations(store: Store, rows: list[dict], dry_run: bool = False) -> dict:
+    # Validate every row first, then give each event's batch its seats and
+    # waitlist positions in one pass. Each batch is allocated and added under
+    # its event lock, like create_registration(), so a registration made at
+    # the same time cannot take the same seat or waitlist position. Rows are
+    # numbered from 1 in errors.
+    errors: list[tuple[int, str]] = []
+    by_event: dict[str, list[dict]] = {}
+    batch_ids: set = set()
+    batch_codes: set = set()
+    batch_sessions: dict[str, list[dict]] = {}
+    for n, row in enumerate(rows, start=1):
+        try:
+            data = _validate(row, store, batch_ids, batch_codes, batch_sessions)
+        except (ValueError, TypeError) as e:
+            errors.append((n, str(e)))
+            continue
+        batch_ids.add(data["id"])
+        batch_codes.add(data["confirmation_code"])
+        if data.get("sessions"):
+            batch_sessions.setdefault(data["attendee_id"], []).append(data)
+        by_event.setdefault(data["event_id"], []).append(data)
+
+    now = reg_mod._now_iso()
+    created: list[dict] = []
+    for eid, batch in by_event.items():
+        event = store.find_event(eid)
+        with store.event_lock(eid):
+            counts = store.event_counters(eid)
+            capacity = int(event.get("capacity", 0))
+            free_seats = store.seats(eid).lowest_free(max(capacity - counts["confirmed"], 0), capacity)
+            free = len(free_seats)
+            position = counts["next_waitlist_position"]
+            # a dry run adds nothing, so later rows see earlier ones through this
+            pending: dict[str, list] | None = {} if dry_run else None
+            for i, data in enumerate(batch):
+                on_waitlist = i >= free
+                reg = reg_mod._build_registration(event, data, data["id"], on_waitlist, now)
+                if on_waitlist:
+                    reg["waitlist_position"] = position
+                    position += 1
+                else:
+                    reg["seat_number"] = free_seats[i]
+                    reg["payment_status"] = data.get("payment_status", "paid")
+                    reg_mod._fit_sessions(store, event, reg, pending)
+                if not dry_run:
+                    store.add_registration(reg)
+                created.append(reg)
+
+    return {
+        "rows": len(rows),
+        "created": created,
+        "confirmed": sum(1 for r in created if r["status"] == "confirmed"),
+        "waitlisted": sum(1 for r in created if r["status"] == "waitlisted"),
+        "errors": errors,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Import registrations from a CSV or JSONL file.")
+    parser.add_argument("path")
+    parser.add_argument("--base-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--dry-run", action="store_true", help="validate and allocate without saving")
+    args = parser.parse_args(argv)
+
+    store = Store(*storage.load_state(args.base_dir))
+    result = import_registrations(store, read_rows(args.path), dry_run=args.dry_run)
+    for n, message in result["errors"]:
+        print(f"row {n}: {message}")
+    print(
+        f"{result['rows']} rows: {result['confirmed']} confirmed, {result['waitlisted']} waitlisted, "
+        f"{len(result['errors'])} errors"
+    )
+    if not args.dry_run and result["created"]:
+        storage.save_state(args.base_dir, store.events, store.attendees, store.registrations, store)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
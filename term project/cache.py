@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+
+# Memoized report and listing results. Every entry remembers the data
+# generation it was computed at (Store.generation(), bumped by Store.touch()
+# on every change), so a lookup at a newer generation recomputes instead of
+# returning a stale result. Entries are evicted least recently used first.
+#
+# Cached results are shared between callers: read them, do not modify them.
+
+CACHE_SIZE = 256
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = CACHE_SIZE) -> None:
+        if maxsize <= 0:
+            raise ValueError("Cache size must be a positive integer.")
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple, tuple[int, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key: tuple, generation: int, compute) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        # computed outside the lock; two threads may both compute a missing
+        # entry, which costs time but never a wrong answer
+        value = compute()
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+def memoize(store, key: tuple, compute, event_id: str | None = None, events=None, registrations=None) -> Any:
+    # Per-event results are keyed on the event's generation, so a change to
+    # one event leaves the other events' entries valid. The generations only
+    # cover the store's own lists: called with any other events or
+    # registrations (a subset, a stream) the result is computed, not cached.
+    if store is None:
+        return compute()
+    if events is not None and events is not store.events:
+        return compute()
+    if registrations is not None and registrations is not store.registrations:
+        return compute()
+    return store.results.get_or_compute(key, store.generation(event_id), compute)
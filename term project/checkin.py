@@ -4,32 +4,46 @@ import os
 from datetime import datetime
 from typing import List, Dict, Any
 
+from cache import memoize
+from store import Store, ensure_store
+
 
 def _now_iso() -> str:
     return datetime.now().isoformat(timespec="seconds")
 
 
-def check_in_attendee(registrations: list, registration_id: str) -> dict:
-    for r in registrations:
-        if r.get("id") == registration_id or r.get("confirmation_code") == registration_id:
-            if r.get("status") in {"cancelled", "waitlisted"}:
-                raise ValueError("Cannot check in cancelled or waitlisted registration.")
+def check_in_attendee(registrations: list, registration_id: str, store: Store | None = None) -> dict:
+    store = ensure_store(store, registrations=registrations)
+    r = store.find_registration(registration_id)
+    if r is None:
+        raise ValueError("Registration not found.")
+    with store.event_lock(r.get("event_id")):
+        if r.get("status") in {"cancelled", "waitlisted"}:
+            raise ValueError("Cannot check in cancelled or waitlisted registration.")
+        with store.updating(r):
             r["status"] = "checked-in"
             r["checkin_timestamp"] = _now_iso()
             r["updated_at"] = r["checkin_timestamp"]
-            return r
-    raise ValueError("Registration not found.")
+    return r
 
 
-def list_checked_in_attendees(registrations: list, event_id: str) -> list:
-    return [
-        r
-        for r in registrations
-        if r.get("event_id") == event_id and r.get("status") == "checked-in"
-    ]
+def list_checked_in_attendees(registrations: list, event_id: str, store: Store | None = None) -> list:
+    # cached per event with a store; the list is shared, copy it before changing it
+    return memoize(
+        store,
+        ("checkin.checked_in", event_id),
+        lambda: [r for r in registrations if r.get("event_id") == event_id and r.get("status") == "checked-in"],
+        event_id,
+        registrations=registrations,
+    )
 
 
-def generate_badge(attendee: dict, registration: dict, directory: str) -> str:
+def generate_badge(
+    attendee: dict,
+    registration: dict,
+    directory: str,
+    session_titles: dict | None = None,
+) -> str:
     os.makedirs(directory, exist_ok=True)
     filename = f"badge_{registration['id']}.txt"
     path = os.path.join(directory, filename)
@@ -48,7 +62,10 @@ def generate_badge(attendee: dict, registration: dict, directory: str) -> str:
     sessions = registration.get("sessions", [])
     if sessions:
         for sid in sessions:
-            lines.append(f"  - Session ID: {sid}")
+            if session_titles and sid in session_titles:
+                lines.append(f"  - {session_titles[sid]}")
+            else:
+                lines.append(f"  - Session ID: {sid}")
     else:
         lines.append("  (None assigned)")
 
@@ -60,21 +77,18 @@ def generate_badge(attendee: dict, registration: dict, directory: str) -> str:
     return path
 
 
-def session_attendance(registrations: list, event_id: str, session_id: str) -> dict:
-    registered = 0
-    checked_in = 0
-    for r in registrations:
-        if r.get("event_id") != event_id:
-            continue
-        sessions = r.get("sessions", [])
-        if session_id in sessions:
-            if r.get("status") in {"confirmed", "checked-in"}:
-                registered += 1
-            if r.get("status") == "checked-in":
-                checked_in += 1
+def session_attendance(
+    registrations: list,
+    event_id: str,
+    session_id: str,
+    store: Store | None = None,
+) -> dict:
+    # O(1) from the store's session roster and counters
+    store = ensure_store(store, registrations=registrations)
     return {
         "event_id": event_id,
         "session_id": session_id,
-        "registered": registered,
-        "checked_in": checked_in,
+        "registered": len(store.session_roster(event_id, session_id)),
+        "checked_in": store.session_counters(event_id, session_id)["checked_in"],
+        "waitlisted": len(store.session_waitlist(event_id, session_id)),
     }
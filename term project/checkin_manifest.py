@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import List, Dict, Any
+
+import storage
+from store import Store
+
+
+# Per-event door manifest: every registration of one event as a fixed-width
+# record sorted by confirmation code, so a desk can mmap the file and
+# binary-search it without loading any JSON.
+#
+#   header  MAGIC, then <HHHHI: event id length, code width, id width,
+#           name width, record count; then the event id (utf-8)
+#   record  code | registration id | status (1 byte) | seat (uint32,
+#           0 = none) | attendee name; text fields NUL-padded utf-8
+#
+# Desks append their check-ins to a side file next to the manifest
+# (<manifest>.checkins, one tab-separated line per scan) which
+# merge_checkins() later applies to the registrations.
+
+MAGIC = b"EVDOOR1\n"
+_HEADER = struct.Struct("<HHHHI")
+_SEAT = struct.Struct("<I")
+STATUSES = ("confirmed", "checked-in", "cancelled", "waitlisted")
+NAME_WIDTH = 48
+
+
+def _fit(text: str, width: int) -> bytes:
+    return text.encode("utf-8")[:width].ljust(width, b"\0")
+
+
+def _text(raw: bytes) -> str:
+    # a name cut mid-character loses that character
+    return raw.rstrip(b"\0").decode("utf-8", errors="ignore")
+
+
+def compile_manifest(store: Store, event_id: str, path: str) -> str:
+    event = store.find_event(event_id)
+    rows = []
+    for r in store.registrations:
+        if r.get("event_id") != event_id or r.get("status") not in STATUSES:
+            continue
+        attendee = store.get_attendee(r.get("attendee_id")) or {}
+        rows.append(
+            (
+                str(r.get("confirmation_code")).encode("utf-8"),
+                str(r.get("id")).encode("utf-8"),
+                STATUSES.index(r["status"]),
+                r.get("seat_number") or 0,
+                attendee.get("name") or "",
+            )
+        )
+    rows.sort()
+    code_w = max((len(row[0]) for row in rows), default=1)
+    id_w = max((len(row[1]) for row in rows), default=1)
+    eid = event["id"].encode("utf-8")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + _HEADER.pack(len(eid), code_w, id_w, NAME_WIDTH, len(rows)) + eid)
+        for code, rid, status, seat, name in rows:
+            f.write(code.ljust(code_w, b"\0") + rid.ljust(id_w, b"\0") + bytes((status,)))
+            f.write(_SEAT.pack(seat) + _fit(name, NAME_WIDTH))
+    os.replace(tmp, path)
+    return path
+
+
+class DoorManifest:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.side_path = path + ".checkins"
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a check-in manifest.")
+        eid_len, self.code_w, self.id_w, self.name_w, self.count = _HEADER.unpack_from(self._mm, len(MAGIC))
+        start = len(MAGIC) + _HEADER.size
+        self.event_id = self._mm[start : start + eid_len].decode("utf-8")
+        self._base = start + eid_len
+        self._size = self.code_w + self.id_w + 1 + _SEAT.size + self.name_w
+        # check-ins from this and other desks sharing the side file: the
+        # first scan's time and its line's offset in the side file
+        self._seen: dict[str, str] = {}
+        self._first: dict[str, int] = {}
+        self._side_offset = 0
+        self._refresh()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "DoorManifest":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _find(self, code: str) -> int | None:
+        key = code.encode("utf-8")
+        if len(key) > self.code_w:
+            return None
+        key = key.ljust(self.code_w, b"\0")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = self._base + mid * self._size
+            probe = self._mm[off : off + self.code_w]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return off
+        return None
+
+    def lookup(self, code: str) -> dict | None:
+        code = code.strip()
+        off = self._find(code)
+        if off is None:
+            return None
+        rec = self._mm[off : off + self._size]
+        pos = self.code_w
+        rid = _text(rec[pos : pos + self.id_w])
+        pos += self.id_w
+        status = STATUSES[rec[pos]]
+        seat = _SEAT.unpack_from(rec, pos + 1)[0]
+        name = _text(rec[pos + 1 + _SEAT.size :])
+        self._refresh()
+        checked_at = self._seen.get(code)
+        return {
+            "confirmation_code": code,
+            "registration_id": rid,
+            "status": "checked-in" if checked_at else status,
+            "attendee_name": name,
+            "seat_number": seat or None,
+            "checkin_timestamp": checked_at,
+        }
+
+    def _refresh(self) -> None:
+        if not os.path.exists(self.side_path):
+            return
+        with open(self.side_path, "rb") as f:
+            f.seek(self._side_offset)
+            chunk = f.read()
+        # only whole lines; a desk may be mid-write
+        end = chunk.rfind(b"\n") + 1
+        offset = self._side_offset
+        for raw in chunk[:end].split(b"\n")[:-1]:
+            code, _, ts, _ = raw.decode("utf-8").split("\t")
+            if code not in self._seen:
+                self._seen[code] = ts
+                self._first[code] = offset
+            offset += len(raw) + 1
+        self._side_offset += end
+
+    def check_in(self, code: str, desk: str = "desk") -> dict:
+        entry = self.lookup(code)
+        if entry is None:
+            raise ValueError("Registration not found.")
+        if entry["status"] in {"cancelled", "waitlisted"}:
+            raise ValueError("Cannot check in cancelled or waitlisted registration.")
+        if entry["status"] == "checked-in":
+            if entry["checkin_timestamp"]:
+                raise ValueError(f"Already checked in at {entry['checkin_timestamp']}.")
+            raise ValueError("Already checked in.")
+        ts = datetime.now().isoformat(timespec="seconds")
+        code = entry["confirmation_code"]
+        line = f"{code}\t{entry['registration_id']}\t{ts}\t{desk}\n".encode("utf-8")
+        # O_APPEND keeps lines from several desks whole. Another desk may have
+        # scanned the same ticket since the lookup above, so the scan only
+        # counts if its line is the first one for the code; a later line
+        # stays in the file and merge_checkins() skips it.
+        fd = os.open(self.side_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            mine = os.lseek(fd, 0, os.SEEK_CUR) - len(line)
+        finally:
+            os.close(fd)
+        self._refresh()
+        if self._first.get(code) != mine:
+            raise ValueError(f"Already checked in at {self._seen[code]}.")
+        entry["status"] = "checked-in"
+        entry["checkin_timestamp"] = self._seen[code]
+        return entry
+
+
+def merge_checkins(store: Store, manifest_path: str) -> dict:
+    # Applies the side file to the registrations with the recorded scan
+    # time; the first scan of a ticket wins. The side file is then renamed
+    # so the same scans are never applied twice.
+    side = manifest_path + ".checkins"
+    result = {"merged": 0, "skipped": 0}
+    if not os.path.exists(side):
+        return result
+    with open(side, "r", encoding="utf-8") as f:
+        lines = [line.rstrip("\n").split("\t") for line in f if line.endswith("\n")]
+    for _, rid, ts, _ in lines:
+        r = store.get_registration(rid)
+        if r is None:
+            result["skipped"] += 1
+            continue
+        with store.event_lock(r["event_id"]):
+            if r.get("status") != "confirmed":
+                result["skipped"] += 1
+                continue
+            with store.updating(r):
+                r["status"] = "checked-in"
+                r["checkin_timestamp"] = ts
+                r["updated_at"] = ts
+        result["merged"] += 1
+    os.replace(side, side + "." + datetime.now().strftime("%Y%m%d-%H%M%S") + ".merged")
+    return result
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Door check-in manifests.")
+    parser.add_argument("--base-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("compile", help="write manifests/<event>.door for one event")
+    p.add_argument("event_id")
+    p.add_argument("--out")
+    p = sub.add_parser("desk", help="check in by confirmation code against a manifest")
+    p.add_argument("manifest")
+    p.add_argument("--desk", default="desk")
+    p = sub.add_parser("merge", help="apply a manifest's side file to the registrations and save")
+    p.add_argument("manifest")
+    args = parser.parse_args(argv)
+
+    if args.command == "desk":
+        with DoorManifest(args.manifest) as door:
+            print(f"Event {door.event_id}: {door.count} registrations.")
+            while True:
+                code = input("Code (blank to quit): ").strip()
+                if not code:
+                    break
+                try:
+                    entry = door.check_in(code, args.desk)
+                    print(f"Checked in {entry['attendee_name']} (seat {entry['seat_number']}).")
+                except ValueError as e:
+                    print(f"Error: {e}")
+        return
+
+    store = Store(*storage.load_state(args.base_dir))
+    try:
+        if args.command == "compile":
+            out = args.out or os.path.join(args.base_dir, "manifests", f"{args.event_id}.door")
+            print(f"Wrote {compile_manifest(store, args.event_id, out)}")
+        else:
+            result = merge_checkins(store, args.manifest)
+            storage.save_state(args.base_dir, store.events, store.attendees, store.registrations, store)
+            print(f"Merged {result['merged']} check-ins, skipped {result['skipped']}.")
+    except ValueError as e:
+        raise SystemExit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
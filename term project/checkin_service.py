@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any
+
+import checkin as checkin_mod
+import storage
+from store import Store
+
+
+# Local check-in service for event-morning desks. Desks connect over TCP on
+# localhost and exchange one JSON object per line:
+#
+#   -> {"code": "5383B6F3", "desk": "door-3"}
+#   <- {"ok": true, "registration_id": "...", "attendee_id": "...", "checkin_timestamp": "..."}
+#   <- {"ok": false, "error": "Already checked in at 2030-05-01T08:31:02."}
+#
+# Each scan is handled on the event loop thread from lookup to check-in with
+# no await in between, so scans never interleave and a ticket scanned at two
+# desks is only checked in once; the store's event lock covers other threads
+# sharing the store. Changes are written in batches by a background flusher
+# instead of after every scan.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class CheckinService:
+    def __init__(
+        self,
+        store: Store,
+        base_dir: str,
+        flush_interval: float = 0.5,
+        flush_batch: int = 500,
+    ) -> None:
+        self.store = store
+        self.base_dir = base_dir
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.checked_in = 0
+        self.rejected = 0
+        self._pending = 0
+        self._flush_now: asyncio.Event | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._flusher: asyncio.Task | None = None
+        self._stopping = False
+        self._server: asyncio.AbstractServer | None = None
+
+    async def check_in(self, code: str) -> dict:
+        r = self.store.find_registration(code)
+        if r is None:
+            return {"ok": False, "error": "Registration not found."}
+        with self.store.event_lock(r["event_id"]):
+            if r.get("status") == "checked-in":
+                self.rejected += 1
+                return {"ok": False, "error": f"Already checked in at {r.get('checkin_timestamp')}."}
+            try:
+                checkin_mod.check_in_attendee(self.store.registrations, code, self.store)
+            except ValueError as e:
+                self.rejected += 1
+                return {"ok": False, "error": str(e)}
+        self.checked_in += 1
+        self._pending += 1
+        if self._pending >= self.flush_batch and self._flush_now is not None:
+            self._flush_now.set()
+        return {
+            "ok": True,
+            "registration_id": r["id"],
+            "attendee_id": r["attendee_id"],
+            "checkin_timestamp": r["checkin_timestamp"],
+        }
+
+    async def flush(self) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # One write at a time, in the order the changes were taken.
+        async with self._flush_lock:
+            changes = self.store.take_dirty()
+            self._pending = 0
+            if not changes:
+                return
+            if storage.writes_changes_only(self.base_dir):
+                # Copied here on the loop thread, the only one changing the
+                # records, so the worker thread writing them while desks keep
+                # being served never sees a record mid-change.
+                changes = [(kind, copy.deepcopy(record)) for kind, record in changes]
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, storage.save_changes, self.base_dir, [], [], [], changes)
+            else:
+                # the other backends rewrite files from the live lists, so
+                # they write here, between scans
+                storage.save_changes(
+                    self.base_dir, self.store.events, self.store.attendees, self.store.registrations, changes
+                )
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    async def _handle_desk(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    response = await self.check_in(str(request["code"]).strip())
+                except (ValueError, KeyError, TypeError):
+                    response = {"ok": False, "error": "Malformed request."}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> int:
+        self._flush_now = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self._server = await asyncio.start_server(self._handle_desk, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Cancelling would abandon a write already running in a worker thread,
+        # so let the flusher finish its round and exit on its own.
+        self._stopping = True
+        if self._flusher is not None:
+            self._flush_now.set()
+            await self._flusher
+        await self.flush()
+
+
+class DeskClient:
+    def __init__(self, desk: str) -> None:
+        self.desk = desk
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def connect(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+
+    async def check_in(self, code: str) -> dict:
+        self._writer.write(json.dumps({"code": code, "desk": self.desk}).encode("utf-8") + b"\n")
+        await self._writer.drain()
+        return json.loads(await self._reader.readline())
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+async def serve(base_dir: str, host: str, port: int) -> None:
+    store = Store(*storage.load_state(base_dir))
+    service = CheckinService(store, base_dir)
+    port = await service.start(host, port)
+    print(f"Check-in service listening on {host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+async def desk(name: str, host: str, port: int) -> None:
+    client = DeskClient(name)
+    await client.connect(host, port)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            code = (await loop.run_in_executor(None, input, "Code (blank to quit): ")).strip()
+            if not code:
+                break
+            result = await client.check_in(code)
+            if result["ok"]:
+                print(f"Checked in {result['registration_id']} for attendee {result['attendee_id']}.")
+            else:
+                print(f"Error: {result['error']}")
+    finally:
+        await client.close()
+
+
+async def load_test(desks: int, registrations: int, duplicates: float = 0.05, mode: str = "journal") -> dict:
+    # Self-contained: builds synthetic data in a temp dir, serves it and
+    # drives it from `desks` concurrent clients, scanning `registrations`
+    # active tickets. A share of the codes is scanned twice at different
+    # desks to check that a ticket is only checked in once.
+    import datagen
+
+    n = registrations
+    while True:
+        events, attendees, regs = datagen.generate(max(n, 1))
+        active = [r for r in regs if r["status"] in {"confirmed", "checked-in"}]
+        if len(active) >= registrations:
+            break
+        n *= 2
+    # the morning of the events: nobody has checked in yet
+    for r in active:
+        r["status"], r["checkin_timestamp"], r["updated_at"] = "confirmed", None, r["created_at"]
+    codes = [r["confirmation_code"] for r in active[:registrations]]
+    codes += codes[: int(len(codes) * duplicates)]
+
+    with tempfile.TemporaryDirectory() as base:
+        with open(os.path.join(base, "config.json"), "w", encoding="utf-8") as f:
+            json.dump({"storage": mode}, f)
+        store = Store(events, attendees, regs)
+        service = CheckinService(store, base)
+        port = await service.start(DEFAULT_HOST, 0)
+
+        async def run_desk(i: int) -> None:
+            client = DeskClient(f"desk-{i}")
+            await client.connect(DEFAULT_HOST, port)
+            for code in codes[i::desks]:
+                await client.check_in(code)
+            await client.close()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_desk(i) for i in range(desks)))
+        elapsed = time.perf_counter() - start
+        await service.stop()
+
+        stored = storage.load_state(base)[2]
+        return {
+            "desks": desks,
+            "storage": storage.storage_mode(base),
+            "scans": len(codes),
+            "checked_in": service.checked_in,
+            "rejected": service.rejected,
+            "double_check_ins": service.checked_in - len({r["id"] for r in stored if r["status"] == "checked-in"}),
+            "seconds": round(elapsed, 3),
+            "check_ins_per_second": round(len(codes) / elapsed, 1),
+        }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Multi-desk check-in service.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="serve check-ins for the data in --base-dir")
+    p.add_argument("--base-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    p.add_argument("--host", default=DEFAULT_HOST)
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p = sub.add_parser("desk", help="interactive desk client")
+    p.add_argument("--name", default="desk")
+    p.add_argument("--host", default=DEFAULT_HOST)
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p = sub.add_parser("loadgen", help="measure sustained check-ins per second on synthetic data")
+    p.add_argument("--desks", type=int, default=10)
+    p.add_argument("--registrations", type=int, default=20_000)
+    p.add_argument("--storage", default="journal", help="storage mode of the synthetic data directory")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "serve":
+            asyncio.run(serve(args.base_dir, args.host, args.port))
+        elif args.command == "desk":
+            asyncio.run(desk(args.name, args.host, args.port))
+        else:
+            print(json.dumps(asyncio.run(load_test(args.desks, args.registrations, mode=args.storage)), indent=2))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+from datetime import date, timedelta
+from typing import List, Dict, Any
+
+import storage
+
+
+# Deterministic synthetic data at a named scale, used by the benchmarks,
+# the check-in load test and the tests. The records are consistent with what
+# the registration code itself would produce: seats and waitlist positions are
+# numbered per event, no event is oversold, registrations only pick sessions
+# of their own event and check-in times fall on the event's first day.
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+_ROOMS = ["Hall A", "Hall B", "Room 101", "Room 102", "Auditorium", "Lab"]
+_ORGS = ["ACME", "Initech", "Globex", "Umbrella", "Hooli", ""]
+_TICKETS = ["General", "General", "General", "VIP", "Student"]
+_TOPICS = ["Keynote", "Workshop", "Panel", "Lightning Talks", "Tutorial", "Fireside Chat"]
+
+
+def sizes(scale: str | int) -> tuple[int, int, int]:
+    n = SCALES[scale.lower()] if isinstance(scale, str) else int(scale)
+    return max(2, n // 500), max(1, n // 2), n
+
+
+def generate(scale: str | int = "1k", seed: int = 7) -> tuple[list, list, list]:
+    n_events, n_attendees, n_registrations = sizes(scale)
+    rng = random.Random(seed)
+    base_day = date(2030, 5, 1)
+
+    events = []
+    for i in range(n_events):
+        start = base_day + timedelta(days=rng.randrange(0, 180))
+        end = start + timedelta(days=rng.randrange(0, 3))
+        eid = f"E{i:06d}"
+        sessions = []
+        for k in range(rng.randrange(2, 7)):
+            day = start + timedelta(days=rng.randrange(0, (end - start).days + 1))
+            hour = rng.randrange(9, 17)
+            sessions.append(
+                {
+                    "id": f"S{k + 1}",
+                    "title": f"{rng.choice(_TOPICS)} {k + 1}",
+                    "speaker": f"Speaker {rng.randrange(1000)}",
+                    "room": rng.choice(_ROOMS),
+                    "capacity": rng.choice([30, 50, 100, 200]),
+                    "start_time": f"{day.isoformat()}T{hour:02d}:00",
+                    "end_time": f"{day.isoformat()}T{hour + 1:02d}:00",
+                }
+            )
+        events.append(
+            {
+                "id": eid,
+                "name": f"Event {i}",
+                "location": rng.choice(["Berlin", "Lisbon", "Online", "Austin"]),
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat(),
+                # a little under the average demand, so every event has a waitlist
+                "capacity": max(1, int(n_registrations / n_events * 0.9)),
+                "price": float(rng.choice([0, 25, 50, 120])),
+                "description": "",
+                "sessions": sessions,
+                "status": "scheduled",
+            }
+        )
+
+    attendees = [
+        {
+            "id": f"A{i:07d}",
+            "name": f"Attendee {i}",
+            "email": f"attendee{i}@example.com",
+            "organization": rng.choice(_ORGS),
+            "dietary": rng.choice(["", "", "vegetarian", "vegan"]),
+            "ticket_type": "General",
+            "pin": f"{rng.randrange(10000):04d}",
+            "communication": {"email_opt_in": rng.random() < 0.8},
+        }
+        for i in range(n_attendees)
+    ]
+
+    seats = {e["id"]: 0 for e in events}
+    active = {e["id"]: 0 for e in events}
+    positions = {e["id"]: 0 for e in events}
+    registrations = []
+    for i in range(n_registrations):
+        event = events[rng.randrange(n_events)]
+        eid = event["id"]
+        ticket = rng.choice(_TICKETS)
+        sessions = [s["id"] for s in event["sessions"] if rng.random() < 0.3]
+        created = f"2030-01-01T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+        seat = position = checkin = None
+        if active[eid] < event["capacity"]:
+            seats[eid] += 1
+            seat = seats[eid]
+            roll = rng.random()
+            if roll < 0.1:
+                status, payment = "cancelled", rng.choice(["refunded", "no_refund"])
+            else:
+                active[eid] += 1
+                status, payment = ("checked-in" if roll < 0.4 else "confirmed"), "paid"
+                if status == "checked-in":
+                    checkin = f"{event['start_date']}T{rng.randrange(7, 11):02d}:{rng.randrange(60):02d}:00"
+        else:
+            positions[eid] += 1
+            position = positions[eid]
+            status, payment = "waitlisted", "pending"
+        registrations.append(
+            {
+                "id": f"R{i:08d}",
+                "event_id": eid,
+                "attendee_id": attendees[rng.randrange(n_attendees)]["id"],
+                "ticket_type": ticket,
+                "seat_number": seat,
+                "confirmation_code": f"{i:08X}",
+                "payment_method": rng.choice(["Card", "Card", "Cash", "Invoice"]),
+                "payment_status": payment,
+                "status": status,
+                "created_at": created,
+                "updated_at": checkin or created,
+                "checkin_timestamp": checkin,
+                "sessions": sessions,
+                "waitlist_position": position,
+                "price": event["price"] * (2 if ticket == "VIP" else 0.5 if ticket == "Student" else 1),
+            }
+        )
+    return events, attendees, registrations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic dataset.")
+    parser.add_argument("scale", help="1k, 100k, 1m or a registration count")
+    parser.add_argument("--base-dir", required=True, help="written with the storage mode configured there")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    scale = args.scale if args.scale.lower() in SCALES else int(args.scale)
+    data = generate(scale, args.seed)
+    os.makedirs(args.base_dir, exist_ok=True)
+    storage.save_changes(args.base_dir, *data, None)
+    print(f"Wrote {len(data[0])} events, {len(data[1])} attendees, {len(data[2])} registrations to {args.base_dir}")
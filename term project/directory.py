@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any
+
+
+SEARCH_FIELDS = ("name", "email", "organization")
+
+
+def normalize(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def _keys(field: str, attendee: dict) -> list[str]:
+    # Names are also indexed by each later word, so "lee" finds "Ann Lee".
+    value = normalize(attendee.get(field))
+    if not value:
+        return []
+    if field != "name":
+        return [value]
+    words = value.split()
+    return [value] + [" ".join(words[i:]) for i in range(1, len(words))]
+
+
+class _SortedIndex:
+    # Two parallel lists sorted by (key, id): a prefix is a bisect plus a
+    # forward scan over the matching run.
+
+    def __init__(self, entries: list[tuple[str, str]]) -> None:
+        entries.sort()
+        self.keys = [k for k, _ in entries]
+        self.ids = [i for _, i in entries]
+
+    def add(self, key: str, aid: str) -> None:
+        lo, hi = bisect_left(self.keys, key), bisect_right(self.keys, key)
+        pos = lo + bisect_left(self.ids[lo:hi], aid)
+        self.keys.insert(pos, key)
+        self.ids.insert(pos, aid)
+
+    def remove(self, key: str, aid: str) -> None:
+        lo, hi = bisect_left(self.keys, key), bisect_right(self.keys, key)
+        for i in range(lo, hi):
+            if self.ids[i] == aid:
+                del self.keys[i]
+                del self.ids[i]
+                return
+
+    def prefix(self, prefix: str):
+        i = bisect_left(self.keys, prefix)
+        keys, ids = self.keys, self.ids
+        while i < len(keys) and keys[i].startswith(prefix):
+            yield ids[i]
+            i += 1
+
+
+class AttendeeDirectory:
+    # Normalized-email hash index for uniqueness and login, plus sorted
+    # prefix indexes for search. The prefix indexes cost a sort of every
+    # name, email and organization, so they are built on the first search.
+
+    def __init__(self, attendees: list) -> None:
+        self._by_id: dict[str, dict] = {}
+        self._by_email: dict[str, dict] = {}
+        # legacy data may hold the same email more than once
+        self._more_by_email: dict[str, list] = {}
+        self._search: dict[str, _SortedIndex] | None = None
+        for a in attendees:
+            self._index_email(a)
+
+    def _index_email(self, attendee: dict) -> None:
+        self._by_id.setdefault(attendee.get("id"), attendee)
+        email = normalize(attendee.get("email"))
+        if self._by_email.setdefault(email, attendee) is not attendee:
+            self._more_by_email.setdefault(email, []).append(attendee)
+
+    def _unindex_email(self, attendee: dict) -> None:
+        email = normalize(attendee.get("email"))
+        more = self._more_by_email.get(email, [])
+        if self._by_email.get(email) is attendee:
+            if more:
+                self._by_email[email] = more.pop(0)
+            else:
+                del self._by_email[email]
+        elif attendee in more:
+            more.remove(attendee)
+        if not more:
+            self._more_by_email.pop(email, None)
+
+    def find_by_email(self, email: str) -> dict | None:
+        return self._by_email.get(normalize(email))
+
+    def find_all_by_email(self, email: str) -> list[dict]:
+        email = normalize(email)
+        first = self._by_email.get(email)
+        return [first] + self._more_by_email.get(email, []) if first is not None else []
+
+    def add(self, attendee: dict) -> None:
+        self._index_email(attendee)
+        if self._search is not None:
+            for field, index in self._search.items():
+                for key in _keys(field, attendee):
+                    index.add(key, attendee.get("id"))
+
+    def remove(self, attendee: dict) -> None:
+        self._unindex_email(attendee)
+        if self._search is not None:
+            for field, index in self._search.items():
+                for key in _keys(field, attendee):
+                    index.remove(key, attendee.get("id"))
+
+    def _search_indexes(self) -> dict[str, _SortedIndex]:
+        if self._search is None:
+            self._search = {
+                field: _SortedIndex([(k, aid) for aid, a in self._by_id.items() for k in _keys(field, a)])
+                for field in SEARCH_FIELDS
+            }
+        return self._search
+
+    def search(self, query: str, fields: tuple = SEARCH_FIELDS, limit: int = 20) -> list[dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        indexes = self._search_indexes()
+        found: dict[str, dict] = {}
+        for field in fields:
+            for aid in indexes[field].prefix(prefix):
+                if aid not in found:
+                    found[aid] = self._by_id[aid]
+                    if len(found) >= limit:
+                        return list(found.values())
+        return list(found.values())
@@ -2,16 +2,17 @@ from __future__ import annotations
 
 import json
 import os
-import uuid
 from datetime import date
 from typing import List, Dict, Any
 
+import schedule as schedule_mod
+import seats as seats_mod
+from store import Store, ensure_store
+
 
 def load_events(path: str) -> list:
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    import storage
+    return list(storage.iter_json_array(path))
 
 
 def save_events(path: str, events: list) -> None:
@@ -31,13 +32,15 @@ def _validate_dates(start_date: str, end_date: str) -> None:
 
 
 def _generate_id(existing_ids: set[str]) -> str:
+    import uuid
+
     while True:
         eid = uuid.uuid4().hex[:8]
         if eid not in existing_ids:
             return eid
 
 
-def create_event(events: list, event_data: dict) -> dict:
+def create_event(events: list, event_data: dict, store: Store | None = None) -> dict:
     required = ["name", "location", "start_date", "end_date", "capacity", "price"]
     for key in required:
         if key not in event_data:
@@ -59,7 +62,8 @@ def create_event(events: list, event_data: dict) -> dict:
     except Exception:
         raise ValueError("Price must be a non-negative number.")
 
-    existing_ids = {e.get("id") for e in events}
+    store = ensure_store(store, events=events)
+    existing_ids = store.event_ids()
     eid = event_data.get("id") or _generate_id(existing_ids)
     if eid in existing_ids:
         raise ValueError(f"Event id '{eid}' already exists.")
@@ -76,19 +80,21 @@ def create_event(events: list, event_data: dict) -> dict:
         "sessions": [],  # list of dicts
         "status": "scheduled",  # scheduled / cancelled
     }
-    events.append(event)
+    store.add_event(event)
     return event
 
 
-def _find_event(events: list, event_id: str) -> dict:
+def _find_event(events: list, event_id: str, store: Store | None = None) -> dict:
+    if store is not None:
+        return store.find_event(event_id)
     for e in events:
         if e.get("id") == event_id:
             return e
     raise ValueError(f"Event with id '{event_id}' not found.")
 
 
-def update_event(events: list, event_id: str, updates: dict) -> dict:
-    event = _find_event(events, event_id)
+def update_event(events: list, event_id: str, updates: dict, store: Store | None = None) -> dict:
+    event = _find_event(events, event_id, store)
 
     if "start_date" in updates or "end_date" in updates:
         start = updates.get("start_date", event["start_date"])
@@ -114,12 +120,27 @@ def update_event(events: list, event_id: str, updates: dict) -> dict:
             raise ValueError("Price must be a non-negative number.")
 
     updates.pop("id", None)
-    event.update(updates)
+    if store is not None:
+        # A capacity change must not interleave with a registration's check.
+        with store.event_lock(event_id):
+            moved = "location" in updates and updates["location"] != event.get("location")
+            if moved:
+                # the sessions move to the new location's rooms, which must be free
+                schedule = store.schedule()
+                relocated = dict(event, location=updates["location"])
+                for s in event.get("sessions", []):
+                    schedule.check_room(relocated, s, ignore=event_id)
+            event.update(updates)
+            if moved:
+                schedule.reindex(event)
+        store.touch("event", event)
+    else:
+        event.update(updates)
     return event
 
 
-def add_session(events: list, event_id: str, session_data: dict) -> dict:
-    event = _find_event(events, event_id)
+def add_session(events: list, event_id: str, session_data: dict, store: Store | None = None) -> dict:
+    event = _find_event(events, event_id, store)
 
     required = ["title", "speaker", "room", "capacity"]
     for key in required:
@@ -160,10 +181,75 @@ def add_session(events: list, event_id: str, session_data: dict) -> dict:
         "start_time": session_data.get("start_time"),
         "end_time": session_data.get("end_time"),
     }
+    start = schedule_mod.parse_time(session["start_time"])
+    end = schedule_mod.parse_time(session["end_time"], end=True)
+    if start is not None and end is not None and end <= start:
+        raise ValueError("Session end_time must be after start_time.")
+
+    schedule = store.schedule() if store is not None else schedule_mod.Schedule(events)
+    schedule.check_room(event, session)
     event.setdefault("sessions", []).append(session)
+    schedule.add(event, session)
+    if store is not None:
+        store.touch("event", event)
     return session
 
 
-def list_sessions(events: list, event_id: str) -> list:
-    event = _find_event(events, event_id)
+def list_sessions(events: list, event_id: str, store: Store | None = None) -> list:
+    event = _find_event(events, event_id, store)
     return event.get("sessions", [])
+
+
+# Reserved seats are kept on the event as "reserved_seats": [[first, last], ...]
+# (see seats.py). They need the store, which knows which seats are held.
+
+
+def reserve_seats(events: list, event_id: str, first: int, last: int, store: Store) -> dict:
+    event = _find_event(events, event_id, store)
+    first, last = int(first), int(last)
+    capacity = int(event.get("capacity", 0))
+    if not 1 <= first <= last <= capacity:
+        raise ValueError(f"Seats {first}-{last} are outside 1-{capacity}.")
+    with store.event_lock(event_id):
+        seats = store.seats(event_id)
+        taken = [s for s in range(first, last + 1) if seats.state(s) & seats_mod.HELD]
+        if taken:
+            raise ValueError(f"Seats already taken: {', '.join(map(str, taken[:10]))}.")
+        event.setdefault("reserved_seats", []).append([first, last])
+        seats.reserve(first, last)
+    store.touch("event", event)
+    return event
+
+
+def reserve_seat_block(events: list, event_id: str, count: int, store: Store) -> list[int]:
+    # the lowest run of `count` adjacent free seats, e.g. for a group or sponsor
+    event = _find_event(events, event_id, store)
+    count = int(count)
+    if count <= 0:
+        raise ValueError("Block size must be a positive integer.")
+    with store.event_lock(event_id):
+        first = store.seats(event_id).find_run(count, int(event.get("capacity", 0)))
+        if first is None:
+            raise ValueError(f"No block of {count} adjacent free seats.")
+        reserve_seats(events, event_id, first, first + count - 1, store)
+    return [first, first + count - 1]
+
+
+def release_reserved_seats(events: list, event_id: str, first: int, last: int, store: Store) -> dict:
+    event = _find_event(events, event_id, store)
+    first, last = int(first), int(last)
+    with store.event_lock(event_id):
+        kept = []
+        for lo, hi in event.get("reserved_seats", []):
+            if hi < first or lo > last:
+                kept.append([lo, hi])
+                continue
+            # keep the parts of an overlapping range outside first-last
+            if lo < first:
+                kept.append([lo, first - 1])
+            if hi > last:
+                kept.append([last + 1, hi])
+        event["reserved_seats"] = kept
+        store.seats(event_id).unreserve(first, last)
+    store.touch("event", event)
+    return event
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+import types
+from collections import deque
+from typing import List, Dict, Any
+
+
+# Call counts and latencies for the public functions of the modules in
+# MODULES, recorded by replacing each function on its module with a timing
+# wrapper. Callers that go through the module attribute (reg_mod.create_...,
+# storage.save_state, ...) are measured; code that imported a function by
+# name keeps the original. Generator functions are left alone, since only
+# their creation would be timed. Latency percentiles come from the most
+# recent SAMPLE_SIZE calls of each function. Listener callbacks the store
+# makes for every registration change (SKIP_METHODS) are not wrapped.
+#
+# Nothing is measured until enable() is called (main.py --timings or
+# EVENT_TIMINGS=1). Bytes written are counted by the storage write sites
+# through add_bytes(), which does nothing while instrumentation is off.
+
+MODULES = ("events", "attendees", "registration", "checkin", "reports", "storage")
+SKIP_METHODS = frozenset({"apply", "reset"})
+SAMPLE_SIZE = 10_000
+
+_lock = threading.Lock()
+_stats: dict[str, list] = {}  # name -> [count, total_s, deque of recent latencies]
+_bytes_written = [0]
+_originals: list[tuple[object, str, object]] = []
+_CO_GENERATOR = 0x20  # inspect.CO_GENERATOR, without importing inspect at startup
+
+
+def _record(name: str, seconds: float) -> None:
+    with _lock:
+        entry = _stats.get(name)
+        if entry is None:
+            entry = _stats[name] = [0, 0.0, deque(maxlen=SAMPLE_SIZE)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2].append(seconds)
+
+
+def enabled() -> bool:
+    return bool(_originals)
+
+
+def add_bytes(count: int) -> None:
+    if _originals:
+        with _lock:
+            _bytes_written[0] += count
+
+
+def _wrap(name: str, fn):
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(name, time.perf_counter() - start)
+
+    timed.__wrapped_by_instrument__ = True
+    return timed
+
+
+def _plain_function(value) -> bool:
+    return isinstance(value, types.FunctionType) and not value.__code__.co_flags & _CO_GENERATOR
+
+
+def enable(modules: tuple = MODULES) -> None:
+    import importlib
+
+    if _originals:
+        return
+    for mod_name in modules:
+        module = importlib.import_module(mod_name)
+        for attr, value in list(vars(module).items()):
+            if attr.startswith("_"):
+                continue
+            if isinstance(value, types.FunctionType) and value.__module__ == mod_name:
+                if not _plain_function(value):
+                    continue
+                setattr(module, attr, _wrap(f"{mod_name}.{attr}", value))
+                _originals.append((module, attr, value))
+            elif isinstance(value, type) and value.__module__ == mod_name:
+                for meth, fn in list(vars(value).items()):
+                    if not meth.startswith("_") and meth not in SKIP_METHODS and _plain_function(fn):
+                        setattr(value, meth, _wrap(f"{mod_name}.{attr}.{meth}", fn))
+                        _originals.append((value, meth, fn))
+
+
+def disable() -> None:
+    while _originals:
+        owner, attr, fn = _originals.pop()
+        setattr(owner, attr, fn)
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _bytes_written[0] = 0
+
+
+def _percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stats() -> dict[str, dict]:
+    with _lock:
+        snapshot = {name: (count, total, sorted(recent)) for name, (count, total, recent) in _stats.items()}
+        written = _bytes_written[0]
+    report = {}
+    for name in sorted(snapshot, key=lambda n: -snapshot[n][1]):
+        count, total, ordered = snapshot[name]
+        report[name] = {
+            "calls": count,
+            "total_ms": round(total * 1000, 3),
+            "mean_ms": round(total / count * 1000, 4),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 4),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 4),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 4),
+        }
+    report["storage.bytes_written"] = {"bytes": written}
+    return report
+
+
+class Profile:
+    # cProfile capture for one menu session; the profile is dumped to
+    # `directory` on exit and can be read with python -m pstats.
+
+    def __init__(self, directory: str, label: str) -> None:
+        self.directory = directory
+        self.label = label
+        self.path: str | None = None
+
+    def __enter__(self) -> "Profile":
+        import cProfile
+
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        from datetime import datetime
+
+        self._profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.directory, f"{self.label}-{stamp}.prof")
+        self._profile.dump_stats(self.path)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import sys
 from typing import List, Dict, Any
 
 import events
@@ -9,9 +10,11 @@ import registration as reg_mod
 import checkin as checkin_mod
 import storage
 import reports as reports_mod
+import instrument
+from store import Store
 
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.environ.get("EVENT_BASE_DIR") or os.path.dirname(os.path.abspath(__file__))
 
 
 def _print_events(events_list: list) -> None:
@@ -69,7 +72,13 @@ def _print_attendees(attendees_list: list) -> None:
         )
 
 
-def organizer_menu(events_list: list, attendees_list: list, registrations_list: list) -> None:
+def organizer_menu(
+    events_list: list,
+    attendees_list: list,
+    registrations_list: list,
+    store: Store,
+    views: reports_mod.ReportViews,
+) -> None:
     while True:
         print("\n=== Organizer Menu ===")
         print("1) Manage events")
@@ -77,31 +86,34 @@ def organizer_menu(events_list: list, attendees_list: list, registrations_list:
         print("3) Manage registrations")
         print("4) Reports & analytics")
         print("5) Backup data")
+        print("6) Operation timings")
         print("0) Back to role selection")
         choice = input("Choose: ").strip()
 
         if choice == "1":
-            manage_events(events_list)
-            storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list)
+            manage_events(events_list, store)
+            storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list, store)
         elif choice == "2":
-            manage_attendees(attendees_list)
-            storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list)
+            manage_attendees(attendees_list, store)
+            storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list, store)
         elif choice == "3":
-            manage_registrations(events_list, attendees_list, registrations_list)
-            storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list)
+            manage_registrations(events_list, attendees_list, registrations_list, store)
+            storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list, store)
         elif choice == "4":
-            run_reports(events_list, registrations_list)
+            run_reports(events_list, registrations_list, views)
         elif choice == "5":
             backups_dir = os.path.join(BASE_DIR, "backups")
             paths = storage.backup_state(BASE_DIR, backups_dir)
             print(f"Created {len(paths)} backup files.")
+        elif choice == "6":
+            show_timings()
         elif choice == "0":
             break
         else:
             print("Invalid choice.")
 
 
-def manage_events(events_list: list) -> None:
+def manage_events(events_list: list, store: Store) -> None:
     while True:
         print("\n--- Event Management ---")
         _print_events(events_list)
@@ -109,6 +121,8 @@ def manage_events(events_list: list) -> None:
         print("2) Update event")
         print("3) Add session")
         print("4) List sessions")
+        print("5) Reserved seats")
+        print("6) Schedule conflicts")
         print("0) Back")
         choice = input("Choose: ").strip()
 
@@ -132,6 +146,7 @@ def manage_events(events_list: list) -> None:
                         "price": price,
                         "description": desc,
                     },
+                    store,
                 )
                 print(f"Created event with id {event['id']}")
             except ValueError as e:
@@ -141,35 +156,34 @@ def manage_events(events_list: list) -> None:
             eid = input("Event ID to update: ").strip()
             updates: dict[str, Any] = {}
             print("Leave blank to keep current value.")
-            for e in events_list:
-                if e.get("id") == eid:
-                    new_name = input(f"Name [{e['name']}]: ").strip()
-                    if new_name:
-                        updates["name"] = new_name
-                    loc = input(f"Location [{e['location']}]: ").strip()
-                    if loc:
-                        updates["location"] = loc
-                    sd = input(f"Start date [{e['start_date']}]: ").strip()
-                    if sd:
-                        updates["start_date"] = sd
-                    ed = input(f"End date [{e['end_date']}]: ").strip()
-                    if ed:
-                        updates["end_date"] = ed
-                    cap = input(f"Capacity [{e['capacity']}]: ").strip()
-                    if cap:
-                        updates["capacity"] = cap
-                    pr = input(f"Price [{e['price']}]: ").strip()
-                    if pr:
-                        updates["price"] = pr
-                    st = input(f"Status [{e.get('status','scheduled')}]: ").strip()
-                    if st:
-                        updates["status"] = st
-                    try:
-                        events.update_event(events_list, eid, updates)
-                        print("Event updated.")
-                    except ValueError as ex:
-                        print(f"Error: {ex}")
-                    break
+            e = store.get_event(eid)
+            if e is not None:
+                new_name = input(f"Name [{e['name']}]: ").strip()
+                if new_name:
+                    updates["name"] = new_name
+                loc = input(f"Location [{e['location']}]: ").strip()
+                if loc:
+                    updates["location"] = loc
+                sd = input(f"Start date [{e['start_date']}]: ").strip()
+                if sd:
+                    updates["start_date"] = sd
+                ed = input(f"End date [{e['end_date']}]: ").strip()
+                if ed:
+                    updates["end_date"] = ed
+                cap = input(f"Capacity [{e['capacity']}]: ").strip()
+                if cap:
+                    updates["capacity"] = cap
+                pr = input(f"Price [{e['price']}]: ").strip()
+                if pr:
+                    updates["price"] = pr
+                st = input(f"Status [{e.get('status','scheduled')}]: ").strip()
+                if st:
+                    updates["status"] = st
+                try:
+                    events.update_event(events_list, eid, updates, store)
+                    print("Event updated.")
+                except ValueError as ex:
+                    print(f"Error: {ex}")
             else:
                 print("Event not found.")
 
@@ -192,7 +206,7 @@ def manage_events(events_list: list) -> None:
             if end_time:
                 sdata["end_time"] = end_time
             try:
-                session = events.add_session(events_list, eid, sdata)
+                session = events.add_session(events_list, eid, sdata, store)
                 print(f"Added session with id {session['id']}")
             except ValueError as e:
                 print(f"Error: {e}")
@@ -200,7 +214,7 @@ def manage_events(events_list: list) -> None:
         elif choice == "4":
             eid = input("Event ID: ").strip()
             try:
-                sessions = events.list_sessions(events_list, eid)
+                sessions = events.list_sessions(events_list, eid, store)
                 if not sessions:
                     print("No sessions.")
                 else:
@@ -218,13 +232,53 @@ def manage_events(events_list: list) -> None:
             except ValueError as e:
                 print(f"Error: {e}")
 
+        elif choice == "5":
+            eid = input("Event ID: ").strip()
+            e = store.get_event(eid)
+            if e is None:
+                print("Event not found.")
+                continue
+            ranges = ", ".join(f"{lo}-{hi}" for lo, hi in e.get("reserved_seats", [])) or "none"
+            print(f"Reserved: {ranges}")
+            action = input("r) Reserve range  b) Reserve block  u) Release range: ").strip().lower()
+            try:
+                if action == "r":
+                    first, last = input("Seats (FIRST-LAST): ").strip().split("-")
+                    events.reserve_seats(events_list, eid, int(first), int(last), store)
+                    print("Seats reserved.")
+                elif action == "b":
+                    block = events.reserve_seat_block(events_list, eid, int(input("Block size: ").strip()), store)
+                    print(f"Reserved seats {block[0]}-{block[1]}.")
+                elif action == "u":
+                    first, last = input("Seats (FIRST-LAST): ").strip().split("-")
+                    events.release_reserved_seats(events_list, eid, int(first), int(last), store)
+                    print("Seats released.")
+            except ValueError as ex:
+                print(f"Error: {ex}")
+
+        elif choice == "6":
+            import schedule as schedule_mod
+
+            eid = input("Event ID (blank for all): ").strip() or None
+            try:
+                report = schedule_mod.conflict_report(store, eid)
+            except ValueError as ex:
+                print(f"Error: {ex}")
+                continue
+            for c in report["rooms"]:
+                print(f"Room {c['room']} ({c['location']}): {c['first']} and {c['second']} overlap {c['from']} to {c['to']}")
+            for c in report["attendees"]:
+                print(f"Attendee {c['attendee_id']}: {c['first']} and {c['second']} overlap {c['from']} to {c['to']}")
+            if not report["rooms"] and not report["attendees"]:
+                print("No conflicts.")
+
         elif choice == "0":
             break
         else:
             print("Invalid choice.")
 
 
-def manage_attendees(attendees_list: list) -> None:
+def manage_attendees(attendees_list: list, store: Store) -> None:
     while True:
         print("\n--- Attendee Management ---")
         _print_attendees(attendees_list)
@@ -249,6 +303,7 @@ def manage_attendees(attendees_list: list) -> None:
                         "dietary": diet,
                         "ticket_type": ticket_type,
                     },
+                    store,
                 )
                 print(f"Registered attendee {attendee['name']} with id {attendee['id']} and pin {attendee['pin']}")
             except ValueError as e:
@@ -256,33 +311,32 @@ def manage_attendees(attendees_list: list) -> None:
 
         elif choice == "2":
             aid = input("Attendee ID: ").strip()
-            for a in attendees_list:
-                if a.get("id") == aid:
-                    print("Leave blank to keep current.")
-                    new_name = input(f"Name [{a['name']}]: ").strip()
-                    email = input(f"Email [{a['email']}]: ").strip()
-                    org = input(f"Organization [{a['organization']}]: ").strip()
-                    diet = input(f"Dietary [{a['dietary']}]: ").strip()
-                    ticket_type = input(f"Ticket type [{a['ticket_type']}]: ").strip()
-
-                    updates: dict[str, Any] = {}
-                    if new_name:
-                        updates["name"] = new_name
-                    if email:
-                        updates["email"] = email
-                    if org:
-                        updates["organization"] = org
-                    if diet:
-                        updates["dietary"] = diet
-                    if ticket_type:
-                        updates["ticket_type"] = ticket_type
-
-                    try:
-                        attendees_mod.update_attendee(attendees_list, aid, updates)
-                        print("Attendee updated.")
-                    except ValueError as e:
-                        print(f"Error: {e}")
-                    break
+            a = store.get_attendee(aid)
+            if a is not None:
+                print("Leave blank to keep current.")
+                new_name = input(f"Name [{a['name']}]: ").strip()
+                email = input(f"Email [{a['email']}]: ").strip()
+                org = input(f"Organization [{a['organization']}]: ").strip()
+                diet = input(f"Dietary [{a['dietary']}]: ").strip()
+                ticket_type = input(f"Ticket type [{a['ticket_type']}]: ").strip()
+
+                updates: dict[str, Any] = {}
+                if new_name:
+                    updates["name"] = new_name
+                if email:
+                    updates["email"] = email
+                if org:
+                    updates["organization"] = org
+                if diet:
+                    updates["dietary"] = diet
+                if ticket_type:
+                    updates["ticket_type"] = ticket_type
+
+                try:
+                    attendees_mod.update_attendee(attendees_list, aid, updates, store)
+                    print("Attendee updated.")
+                except ValueError as e:
+                    print(f"Error: {e}")
             else:
                 print("Attendee not found.")
 
@@ -292,7 +346,7 @@ def manage_attendees(attendees_list: list) -> None:
             print("Invalid choice.")
 
 
-def manage_registrations(events_list: list, attendees_list: list, registrations_list: list) -> None:
+def manage_registrations(events_list: list, attendees_list: list, registrations_list: list, store: Store) -> None:
     while True:
         print("\n--- Registration Management ---")
         _print_registrations(registrations_list)
@@ -333,10 +387,10 @@ def manage_registrations(events_list: list, attendees_list: list, registrations_
                 reg_data["price"] = price
 
             try:
-                reg = reg_mod.create_registration(registrations_list, reg_data, events_list)
+                reg = reg_mod.create_registration(registrations_list, reg_data, events_list, store)
                 if reg["status"] == "waitlisted":
                     print(
-                        f"Event full. Registration waitlisted at position {reg['waitlist_position']} "
+                        f"Event full. Registration waitlisted at position {reg_mod.waitlist_position(reg, store)} "
                         f"with confirmation {reg['confirmation_code']}."
                     )
                 else:
@@ -344,6 +398,11 @@ def manage_registrations(events_list: list, attendees_list: list, registrations_
                         f"Registration confirmed with id {reg['id']}, seat {reg['seat_number']}, "
                         f"confirmation {reg['confirmation_code']}."
                     )
+                    for sid in reg.get("session_waitlist", {}):
+                        print(
+                            f"Session {sid} is full: waitlisted at position "
+                            f"{reg_mod.session_waitlist_position(reg, sid, store)}."
+                        )
             except ValueError as e:
                 print(f"Error: {e}")
 
@@ -352,13 +411,13 @@ def manage_registrations(events_list: list, attendees_list: list, registrations_
             confirm = input("Are you sure? (y/N): ").strip().lower()
             if confirm == "y":
                 try:
-                    cancelled = reg_mod.cancel_registration(registrations_list, rid, events_list)
+                    cancelled = reg_mod.cancel_registration(registrations_list, rid, events_list, store)
                     print(
                         f"Cancelled registration. Payment status is now {cancelled.get('payment_status')}."
                     )
                     # After cancellation, try promoting waitlist
                     eid = cancelled["event_id"]
-                    promoted = reg_mod.promote_waitlist(registrations_list, eid)
+                    promoted = reg_mod.promote_waitlist(registrations_list, eid, store)
                     if promoted:
                         print(
                             f"Waitlisted registration {promoted['id']} has been promoted to confirmed seat "
@@ -374,14 +433,14 @@ def manage_registrations(events_list: list, attendees_list: list, registrations_
             confirm = input("Confirm transfer? (y/N): ").strip().lower()
             if confirm == "y":
                 try:
-                    reg_mod.transfer_ticket(registrations_list, rid, new_aid)
+                    reg_mod.transfer_ticket(registrations_list, rid, new_aid, store)
                     print("Ticket transferred.")
                 except ValueError as e:
                     print(f"Error: {e}")
 
         elif choice == "4":
             eid = input("Event ID: ").strip()
-            promoted = reg_mod.promote_waitlist(registrations_list, eid)
+            promoted = reg_mod.promote_waitlist(registrations_list, eid, store)
             if promoted:
                 print(
                     f"Promoted registration {promoted['id']} to confirmed seat {promoted['seat_number']}."
@@ -395,7 +454,7 @@ def manage_registrations(events_list: list, attendees_list: list, registrations_
             print("Invalid choice.")
             
 
-def run_reports(events_list: list, registrations_list: list) -> None:
+def run_reports(events_list: list, registrations_list: list, views: reports_mod.ReportViews) -> None:
     while True:
         print("\n--- Reports & Analytics ---")
         print("1) Attendance report")
@@ -406,7 +465,7 @@ def run_reports(events_list: list, registrations_list: list) -> None:
         choice = input("Choose: ").strip()
 
         if choice == "1":
-            rep = reports_mod.attendance_report(events_list, registrations_list)
+            rep = views.attendance_report()
             for eid, row in rep.items():
                 print(
                     f"{eid}: {row['event_name']} | cap={row['capacity']} "
@@ -414,12 +473,12 @@ def run_reports(events_list: list, registrations_list: list) -> None:
                 )
 
         elif choice == "2":
-            rep = reports_mod.revenue_report(events_list, registrations_list)
+            rep = views.revenue_report()
             for eid, row in rep.items():
                 print(f"{eid}: {row['event_name']} | revenue={row['revenue']}")
 
         elif choice == "3":
-            rep = reports_mod.session_popularity(events_list, registrations_list)
+            rep = views.session_popularity()
             for eid, sessions in rep.items():
                 print(f"Event {eid}:")
                 if not sessions:
@@ -431,7 +490,7 @@ def run_reports(events_list: list, registrations_list: list) -> None:
                     )
 
         elif choice == "4":
-            rep = reports_mod.attendance_report(events_list, registrations_list)
+            rep = views.attendance_report()
             path = os.path.join(BASE_DIR, "reports", "attendance.json")
             out = reports_mod.export_report(rep, path)
             print(f"Attendance report exported to {out}")
@@ -444,31 +503,35 @@ def run_reports(events_list: list, registrations_list: list) -> None:
 
 
 
-def staff_menu(events_list: list, attendees_list: list, registrations_list: list) -> None:
+def staff_menu(events_list: list, attendees_list: list | None, registrations_list: list, store: Store) -> None:
+    checkins = None
     while True:
         print("\n=== Staff Menu ===")
         print("1) Check in by confirmation code or registration ID")
         print("2) List checked-in attendees for event")
         print("3) Session attendance stats")
+        print("4) Print all badges for an event")
+        print("5) Search attendees")
+        print("6) Check-in analytics")
         print("0) Back to role selection")
         choice = input("Choose: ").strip()
 
         if choice == "1":
             code = input("Confirmation code or registration ID: ").strip()
             try:
-                checked = checkin_mod.check_in_attendee(registrations_list, code)
+                checked = checkin_mod.check_in_attendee(registrations_list, code, store)
                 print(
                     f"Checked in registration {checked['id']} "
                     f"for attendee {checked['attendee_id']} at {checked['checkin_timestamp']}."
                 )
-                storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list)
+                storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list, store)
             except ValueError as e:
                 print(f"Error: {e}")
 
         elif choice == "2":
             _print_events(events_list)
             eid = input("Event ID: ").strip()
-            checked = checkin_mod.list_checked_in_attendees(registrations_list, eid)
+            checked = checkin_mod.list_checked_in_attendees(registrations_list, eid, store)
             print(f"{len(checked)} attendees checked in.")
             for r in checked:
                 print(
@@ -480,19 +543,83 @@ def staff_menu(events_list: list, attendees_list: list, registrations_list: list
             _print_events(events_list)
             eid = input("Event ID: ").strip()
             sid = input("Session ID: ").strip()
-            stats = checkin_mod.session_attendance(registrations_list, eid, sid)
+            stats = checkin_mod.session_attendance(registrations_list, eid, sid, store)
             print(
                 f"Session {stats['session_id']} | registered={stats['registered']} "
-                f"checked-in={stats['checked_in']}"
+                f"checked-in={stats['checked_in']} waitlisted={stats['waitlisted']}"
             )
 
+        elif choice == "4":
+            _print_events(events_list)
+            eid = input("Event ID: ").strip()
+            fmt = input("Output (zip/spool/printers) [zip]: ").strip().lower() or "zip"
+            ext = ".zip" if fmt == "zip" else ".txt"
+            out = os.path.join(BASE_DIR, "badges", f"{eid}{ext}")
+            try:
+                printers = 1
+                if fmt == "printers":
+                    printers = int(input("Number of printers: ").strip() or "1")
+                import badges as badges_mod
+
+                paths = badges_mod.generate_event_badges(store, eid, out, fmt=fmt, printers=printers)
+                for p in paths:
+                    print(f"Badges written to {p}")
+            except ValueError as e:
+                print(f"Error: {e}")
+
+        elif choice == "5":
+            query = input("Name, email or organization starts with: ").strip()
+            found = attendees_mod.search_attendees(attendees_list, query, store)
+            if not found:
+                print("No matching attendees.")
+            for a in found:
+                print(f"{a['id']} | {a.get('name')} | {a.get('email')} | {a.get('organization', '')}")
+
+        elif choice == "6":
+            _print_events(events_list)
+            eid = input("Event ID: ").strip()
+            if store.get_event(eid) is None:
+                print("Event not found.")
+                continue
+            import analytics
+
+            if checkins is None:
+                # kept current by check-ins from here on; detached when leaving the menu
+                checkins = analytics.CheckinAnalytics(store)
+            doors = input("Doors open (YYYY-MM-DDTHH:MM, blank for start date 08:00): ").strip() or None
+            try:
+                summary = checkins.summary(eid, doors_open=doors)
+            except ValueError as e:
+                print(f"Error: {e}")
+                continue
+            print(
+                f"Checked in {summary['checked_in']} | now {summary['per_minute_now']}/min | "
+                f"peak {summary['peak_per_minute']}/min at {summary['peak_minute']} | "
+                f"expected so far {summary['expected_so_far']} | queue {summary['queue_now']}"
+            )
+            for minute, row in list(summary["arrivals"].items())[-15:]:
+                print(f"  {minute[11:]} {'#' * min(row['checked_in'], 60):<60} {row['checked_in']:>4}  queue {row['queue']}")
+            if summary["before_window"] or summary["after_window"]:
+                print(
+                    f"  Outside the arrival window: {summary['before_window']} before doors-open, "
+                    f"{summary['after_window']} after it"
+                )
+            for ticket, row in summary["no_show"].items():
+                print(f"  {ticket}: {row['no_show']} of {row['registered']} not checked in ({row['no_show_rate']:.0%})")
+            fmt = input("Export? (json/csv, blank to skip): ").strip().lower()
+            if fmt in {"json", "csv"}:
+                path = os.path.join(BASE_DIR, "reports", f"checkins_{eid}.{fmt}")
+                print(f"Exported to {analytics.export(checkins, eid, path, doors_open=doors)}")
+
         elif choice == "0":
+            if checkins is not None:
+                checkins.close()
             break
         else:
             print("Invalid choice.")
 
 
-def attendee_menu(events_list: list, attendees_list: list, registrations_list: list) -> None:
+def attendee_menu(events_list: list, attendees_list: list, registrations_list: list, store: Store) -> None:
     while True:
         print("\n=== Attendee Menu ===")
         print("1) Register as new attendee")
@@ -516,8 +643,9 @@ def attendee_menu(events_list: list, attendees_list: list, registrations_list: l
                         "dietary": diet,
                         "ticket_type": ticket_type,
                     },
+                    store,
                 )
-                storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list)
+                storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list, store)
                 print(
                     f"Welcome {attendee['name']}! Your attendee ID is {attendee['id']} "
                     f"and your PIN for login is {attendee['pin']}."
@@ -528,12 +656,12 @@ def attendee_menu(events_list: list, attendees_list: list, registrations_list: l
         elif choice == "2":
             email = input("Email: ").strip()
             pin = input("PIN (4 digits): ").strip()
-            user = attendees_mod.authenticate_attendee(attendees_list, email, pin)
+            user = attendees_mod.authenticate_attendee(attendees_list, email, pin, store)
             if not user:
                 print("Invalid credentials.")
             else:
-                attendee_logged_in_menu(user, events_list, registrations_list)
-                storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list)
+                attendee_logged_in_menu(user, events_list, registrations_list, store)
+                storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list, store)
 
         elif choice == "0":
             break
@@ -541,7 +669,7 @@ def attendee_menu(events_list: list, attendees_list: list, registrations_list: l
             print("Invalid choice.")
 
 
-def attendee_logged_in_menu(attendee: dict, events_list: list, registrations_list: list) -> None:
+def attendee_logged_in_menu(attendee: dict, events_list: list, registrations_list: list, store: Store) -> None:
     aid = attendee["id"]
     while True:
         print(f"\n--- Attendee: {attendee['name']} ---")
@@ -551,15 +679,18 @@ def attendee_logged_in_menu(attendee: dict, events_list: list, registrations_lis
         print("0) Log out")
         choice = input("Choose: ").strip()
 
-        my_regs = [r for r in registrations_list if r.get("attendee_id") == aid]
+        my_regs = store.registrations_for_attendee(aid)
 
         if choice == "1":
             if not my_regs:
                 print("You have no registrations.")
             else:
                 for r in my_regs:
+                    status = r["status"]
+                    if status == "waitlisted":
+                        status = f"waitlisted #{reg_mod.waitlist_position(r, store)}"
                     print(
-                        f"Reg {r['id']} | Event {r['event_id']} | status={r['status']} "
+                        f"Reg {r['id']} | Event {r['event_id']} | status={status} "
                         f"| confirmation={r['confirmation_code']} | payment={r['payment_status']}"
                     )
 
@@ -581,10 +712,10 @@ def attendee_logged_in_menu(attendee: dict, events_list: list, registrations_lis
                 "sessions": sessions,
             }
             try:
-                reg = reg_mod.create_registration(registrations_list, reg_data, events_list)
+                reg = reg_mod.create_registration(registrations_list, reg_data, events_list, store)
                 if reg["status"] == "waitlisted":
                     print(
-                        f"You are waitlisted at position {reg['waitlist_position']} "
+                        f"You are waitlisted at position {reg_mod.waitlist_position(reg, store)} "
                         f"with confirmation {reg['confirmation_code']}."
                     )
                 else:
@@ -592,6 +723,11 @@ def attendee_logged_in_menu(attendee: dict, events_list: list, registrations_lis
                         f"Registration confirmed! ID {reg['id']}, seat {reg['seat_number']}, "
                         f"confirmation {reg['confirmation_code']}."
                     )
+                    for sid in reg.get("session_waitlist", {}):
+                        print(
+                            f"Session {sid} is full: waitlisted at position "
+                            f"{reg_mod.session_waitlist_position(reg, sid, store)}."
+                        )
             except ValueError as e:
                 print(f"Error: {e}")
 
@@ -608,7 +744,10 @@ def attendee_logged_in_menu(attendee: dict, events_list: list, registrations_lis
             for r in my_regs:
                 if r.get("id") == rid:
                     badges_dir = os.path.join(BASE_DIR, "badges")
-                    path = checkin_mod.generate_badge(attendee, r, badges_dir)
+                    import badges as badges_mod
+
+                    titles = badges_mod.session_index(events_list).get(r["event_id"])
+                    path = checkin_mod.generate_badge(attendee, r, badges_dir, titles)
                     print(f"Badge generated at {path}")
                     break
             else:
@@ -622,8 +761,57 @@ def attendee_logged_in_menu(attendee: dict, events_list: list, registrations_lis
 
 
 
-def main() -> None:
-    events_list, attendees_list, registrations_list = storage.load_state(BASE_DIR)
+def show_timings() -> None:
+    if not instrument.enabled():
+        print("Timings are off; start with --timings or EVENT_TIMINGS=1.")
+        return
+    stats = instrument.stats()
+    print("{:<44} {:>7} {:>10} {:>9} {:>9} {:>9}".format("Operation", "Calls", "Total ms", "p50 ms", "p95 ms", "p99 ms"))
+    print("-" * 92)
+    for name, row in stats.items():
+        if "calls" in row:
+            print(
+                "{:<44} {:>7} {:>10} {:>9} {:>9} {:>9}".format(
+                    name[:44], row["calls"], row["total_ms"], row["p50_ms"], row["p95_ms"], row["p99_ms"]
+                )
+            )
+    print(f"Bytes written by saves: {stats['storage.bytes_written']['bytes']}")
+    if input("Export to JSON? (y/N): ").strip().lower() == "y":
+        path = os.path.join(BASE_DIR, "reports", "timings.json")
+        print(f"Timings exported to {reports_mod.export_report(stats, path)}")
+
+
+def _parse_args(argv: list[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Event registration platform.")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="all",
+        choices=("organizer", "staff", "attendee", "all"),
+        help="write a cProfile dump to profiles/ for each session of this menu",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="count and time calls for organizer menu option 6 (also EVENT_TIMINGS=1)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    # argparse only costs startup time when there is something to parse
+    args = _parse_args(argv) if argv else None
+    profile_role = args.profile if args else None
+    if (args and args.timings) or os.environ.get("EVENT_TIMINGS") == "1":
+        instrument.enable()
+
+    # Events and registrations keep parsing while the role menu waits for
+    # input; attendees are only read once a menu needs them.
+    state = storage.LazyState(BASE_DIR)
+    store: Store | None = None
 
     while True:
         print("\n=== Event Platform ===")
@@ -633,15 +821,31 @@ def main() -> None:
         print("0) Exit")
         role = input("Choose role: ").strip()
 
-        if role == "1":
-            organizer_menu(events_list, attendees_list, registrations_list)
-        elif role == "2":
-            staff_menu(events_list, attendees_list, registrations_list)
-        elif role == "3":
-            attendee_menu(events_list, attendees_list, registrations_list)
+        if store is None and role in {"1", "2", "3", "0"}:
+            if not state.loaded("registrations"):
+                print("Loading data...")
+            store = Store(state.get("events"), lambda: state.get("attendees"), state.get("registrations"))
+            views = reports_mod.ReportViews(store, verify=os.environ.get("EVENT_VERIFY_VIEWS") == "1")
+            events_list, registrations_list = store.events, store.registrations
+
+        if role in {"1", "2", "3"}:
+            label, menu, extra = {
+                "1": ("organizer", organizer_menu, (views,)),
+                "2": ("staff", staff_menu, ()),
+                "3": ("attendee", attendee_menu, ()),
+            }[role]
+            # the staff desk works from registrations; anything it does with
+            # attendees goes through the store, which reads them on demand
+            attendees_list = store.loaded_attendees() if label == "staff" else store.attendees
+            if profile_role in (label, "all"):
+                with instrument.Profile(os.path.join(BASE_DIR, "profiles"), label) as profile:
+                    menu(events_list, attendees_list, registrations_list, store, *extra)
+                print(f"Profile written to {profile.path}")
+            else:
+                menu(events_list, attendees_list, registrations_list, store, *extra)
         elif role == "0":
             # auto-save + backup
-            storage.save_state(BASE_DIR, events_list, attendees_list, registrations_list)
+            storage.save_state(BASE_DIR, events_list, store.loaded_attendees(), registrations_list, store)
             backups_dir = os.path.join(BASE_DIR, "backups")
             storage.backup_state(BASE_DIR, backups_dir)
             print("Goodbye!")
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import MutableMapping
+from typing import List, Dict, Any
+
+
+# Compact in-memory registrations. A Registration keeps the usual fields in
+# __slots__ instead of a per-record hash table, and interns the categorical
+# strings and session ids so a million records share one "confirmed", one
+# "paid", one copy of each event id. It behaves like the dict it replaces (r["status"],
+# r.get(...), "sessions" in r, r.items(), dict(r), == with a dict) and keeps
+# the key order, so it writes out as the same JSON. Keys outside FIELDS go to
+# a small per-record dict.
+
+FIELDS = (
+    "id",
+    "event_id",
+    "attendee_id",
+    "ticket_type",
+    "seat_number",
+    "confirmation_code",
+    "payment_method",
+    "payment_status",
+    "status",
+    "created_at",
+    "updated_at",
+    "checkin_timestamp",
+    "sessions",
+    "waitlist_position",
+    "price",
+)
+# Timestamps have second resolution and repeat heavily (updated_at usually
+# equals created_at), so they are interned like the categorical fields.
+INTERNED = frozenset(
+    {
+        "event_id",
+        "ticket_type",
+        "payment_method",
+        "payment_status",
+        "status",
+        "created_at",
+        "updated_at",
+        "checkin_timestamp",
+    }
+)
+
+_FIELD_SET = frozenset(FIELDS)
+_MISSING = object()
+
+
+class Registration(MutableMapping):
+    __slots__ = FIELDS + ("_order", "_extra")
+
+    def __init__(self, data: dict | None = None) -> None:
+        # _order is None while the keys are exactly FIELDS in FIELDS order,
+        # which is every record create_registration() builds.
+        self._order = None if data is not None and tuple(data) == FIELDS else []
+        self._extra = None
+        if data is not None:
+            for k, v in data.items():
+                self[k] = v
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        return default if self._extra is None else self._extra.get(key, default)
+
+    def __setitem__(self, key, value) -> None:
+        if key in _FIELD_SET:
+            if key in INTERNED and type(value) is str:
+                value = sys.intern(value)
+            elif key == "sessions" and type(value) is list:
+                value = [sys.intern(v) if type(v) is str else v for v in value]
+            if self._order is not None and not hasattr(self, key):
+                self._order.append(key)
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        if key not in self._extra:
+            self._order = self._materialized_order() if self._order is None else self._order
+            self._order.append(key)
+        self._extra[key] = value
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._order = self._materialized_order() if self._order is None else self._order
+        self._order.remove(key)
+        if key in _FIELD_SET:
+            delattr(self, key)
+        else:
+            del self._extra[key]
+
+    def _materialized_order(self) -> list:
+        return [k for k in FIELDS if hasattr(self, k)]
+
+    def __contains__(self, key) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        return iter(FIELDS if self._order is None else list(self._order))
+
+    def __len__(self) -> int:
+        return len(FIELDS) if self._order is None else len(self._order)
+
+    def to_dict(self) -> dict:
+        return {k: self[k] for k in self}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (dict, Registration)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Registration({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return (Registration, (self.to_dict(),))
+
+
+def compact(registration) -> Registration:
+    return registration if isinstance(registration, Registration) else Registration(registration)
+
+
+def compact_all(registrations: list) -> list:
+    # in place, so callers holding the list see compact records
+    for i, r in enumerate(registrations):
+        registrations[i] = compact(r)
+    return registrations
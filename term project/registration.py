@@ -1,130 +1,239 @@
 from __future__ import annotations
 
-import uuid
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional
 
+import seats as seats_mod
+from cache import memoize
+from store import Store, ensure_store
+
+
+def _random_hex(length: int) -> str:
+    # uuid pulls in platform at import time, so it is only loaded when an id is needed
+    import uuid
+
+    return uuid.uuid4().hex[:length]
+
 
 def _now_iso() -> str:
     return datetime.now().isoformat(timespec="seconds")
 
 
-def _find_event(events: list, event_id: str) -> dict:
+def _find_event(events: list, event_id: str, store: Store | None = None) -> dict:
+    if store is not None:
+        return store.find_event(event_id)
     for e in events:
         if e.get("id") == event_id:
             return e
     raise ValueError(f"Event with id '{event_id}' not found.")
 
 
-def _event_confirmed_registrations(registrations: list, event_id: str) -> list:
-    return [
-        r
-        for r in registrations
-        if r.get("event_id") == event_id and r.get("status") in {"confirmed", "checked-in"}
-    ]
-
-
-def _event_waitlist(registrations: list, event_id: str) -> list:
-    return [
-        r
-        for r in registrations
-        if r.get("event_id") == event_id and r.get("status") == "waitlisted"
-    ]
-
-
-def create_registration(
-    registrations: list,
-    registration_data: dict,
-    events: list,
-) -> dict:
-    required = ["event_id", "attendee_id", "ticket_type", "payment_method"]
-    for key in required:
-        if key not in registration_data:
-            raise ValueError(f"Missing required field '{key}' for registration.")
-
-    event = _find_event(events, registration_data["event_id"])
-
-    confirmed = _event_confirmed_registrations(registrations, event["id"])
-    capacity = int(event.get("capacity", 0))
-    on_waitlist = len(confirmed) >= capacity
+REQUIRED_FIELDS = ["event_id", "attendee_id", "ticket_type", "payment_method"]
 
-    reg_id = registration_data.get("id") or uuid.uuid4().hex[:10]
-    existing_ids = {r.get("id") for r in registrations}
-    if reg_id in existing_ids:
-        raise ValueError(f"Registration id '{reg_id}' already exists.")
 
-    base = {
+def _build_registration(event: dict, registration_data: dict, reg_id: str, on_waitlist: bool, now: str) -> dict:
+    return {
         "id": reg_id,
         "event_id": event["id"],
         "attendee_id": registration_data["attendee_id"],
         "ticket_type": registration_data["ticket_type"],
         "seat_number": None,
-        "confirmation_code": registration_data.get("confirmation_code") or uuid.uuid4().hex[:8].upper(),
+        "confirmation_code": registration_data.get("confirmation_code") or _random_hex(8).upper(),
         "payment_method": registration_data["payment_method"],
         "payment_status": registration_data.get("payment_status", "pending"),
         "status": "waitlisted" if on_waitlist else "confirmed",
-        "created_at": _now_iso(),
-        "updated_at": _now_iso(),
+        "created_at": now,
+        "updated_at": now,
         "checkin_timestamp": None,
         "sessions": registration_data.get("sessions", []),
         "waitlist_position": None,
         "price": float(registration_data.get("price", event.get("price", 0.0))),
     }
 
-    if on_waitlist:
-        waitlist = _event_waitlist(registrations, event["id"])
-        next_pos = 1
-        if waitlist:
-            next_pos = max(r.get("waitlist_position", 0) for r in waitlist) + 1
-        base["waitlist_position"] = next_pos
-    else:
-        base["seat_number"] = len(confirmed) + 1
-        base["payment_status"] = registration_data.get("payment_status", "paid")
-
-    registrations.append(base)
-    return base
 
+def create_registration(
+    registrations: list,
+    registration_data: dict,
+    events: list,
+    store: Store | None = None,
+) -> dict:
+    for key in REQUIRED_FIELDS:
+        if key not in registration_data:
+            raise ValueError(f"Missing required field '{key}' for registration.")
+
+    store = ensure_store(store, events=events, registrations=registrations)
+    event = store.find_event(registration_data["event_id"])
+
+    # The capacity check, seat/position assignment and insert happen under
+    # the event's lock so concurrent registrations cannot oversell, and the
+    # session overlap check under the attendee's too, as it spans events.
+    with store.event_lock(event["id"]), store.attendee_lock(registration_data["attendee_id"]):
+        if registration_data.get("sessions"):
+            store.schedule().check_attendee(
+                store.registrations_for_attendee(registration_data["attendee_id"]),
+                event["id"],
+                registration_data["sessions"],
+            )
+        counts = store.event_counters(event["id"])
+        capacity = int(event.get("capacity", 0))
+        seats = store.seats(event["id"])
+        if registration_data.get("seat_number") is not None:
+            seat = _requested_seat(registration_data["seat_number"], capacity, seats)
+            if counts["confirmed"] >= capacity:
+                raise ValueError(f"Seat {seat} cannot be assigned: the event is full.")
+        else:
+            # reserved seats count against capacity but are not handed out
+            seat = seats.first_free(capacity)
+        on_waitlist = counts["confirmed"] >= capacity or seat is None
+
+        reg_id = registration_data.get("id") or _random_hex(10)
+        if reg_id in store.registration_ids():
+            raise ValueError(f"Registration id '{reg_id}' already exists.")
+
+        base = _build_registration(event, registration_data, reg_id, on_waitlist, _now_iso())
+        if on_waitlist:
+            base["waitlist_position"] = counts["next_waitlist_position"]
+        else:
+            base["seat_number"] = seat
+            base["payment_status"] = registration_data.get("payment_status", "paid")
+            _fit_sessions(store, event, base)
+
+        store.add_registration(base)
+    return base
 
-def promote_waitlist(registrations: list, event_id: str) -> dict | None:
-    waitlist = sorted(
-        _event_waitlist(registrations, event_id),
-        key=lambda r: (r.get("waitlist_position") or 0, r.get("created_at", "")),
-    )
-    if not waitlist:
-        return None
 
-    candidate = waitlist[0]
-    confirmed = _event_confirmed_registrations(registrations, event_id)
+def _requested_seat(value, capacity: int, seats) -> int:
+    try:
+        seat = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Seat number must be an integer.")
+    if not 1 <= seat <= capacity:
+        raise ValueError(f"Seat {seat} is outside 1-{capacity}.")
+    if seats.state(seat) & seats_mod.HELD:
+        raise ValueError(f"Seat {seat} is already taken.")
+    return seat
+
+
+def _session_capacity(event: dict, session_id: str) -> int | None:
+    for s in event.get("sessions", []):
+        if s.get("id") == session_id:
+            return int(s.get("capacity") or 0) or None
+    # sessions the event does not list have no limit
+    return None
+
+
+def _fit_sessions(store: Store, event: dict, r: dict, pending: dict | None = None) -> None:
+    # Called under the event lock just before r becomes confirmed: sessions
+    # that are already full move from r["sessions"] to r["session_waitlist"]
+    # ({session id: queue position}). A dry run passes `pending` (session id
+    # -> [places taken, queued]) for its earlier rows, which are not in the
+    # store.
+    kept = []
+    waiting = dict(r.get("session_waitlist") or {})
+    for sid in r.get("sessions") or []:
+        capacity = _session_capacity(event, sid)
+        taken, queued = pending.get(sid, (0, 0)) if pending is not None else (0, 0)
+        if capacity is not None and len(store.session_roster(event["id"], sid)) + taken >= capacity:
+            waiting[sid] = store.session_counters(event["id"], sid)["next_waitlist_position"] + queued
+            queued += 1
+        else:
+            kept.append(sid)
+            taken += 1
+        if pending is not None:
+            pending[sid] = [taken, queued]
+    r["sessions"] = kept
+    if waiting:
+        r["session_waitlist"] = waiting
+
+
+def promote_session_waitlist(
+    registrations: list,
+    event_id: str,
+    session_id: str,
+    events: list,
+    store: Store | None = None,
+) -> dict | None:
+    store = ensure_store(store, events=events, registrations=registrations)
+    event = store.find_event(event_id)
+    with store.event_lock(event_id):
+        capacity = _session_capacity(event, session_id)
+        if capacity is not None and len(store.session_roster(event_id, session_id)) >= capacity:
+            return None
+        rid = store.session_waitlist(event_id, session_id).peek()
+        if rid is None:
+            return None
+        r = store.get_registration(rid)
+        with store.updating(r):
+            waiting = dict(r["session_waitlist"])
+            del waiting[session_id]
+            if waiting:
+                r["session_waitlist"] = waiting
+            else:
+                del r["session_waitlist"]
+            r["sessions"] = list(r.get("sessions") or []) + [session_id]
+            r["updated_at"] = _now_iso()
+    return r
 
-    candidate["status"] = "confirmed"
-    candidate["seat_number"] = len(confirmed) + 1
-    candidate["waitlist_position"] = None
-    candidate["updated_at"] = _now_iso()
 
-    pos = 1
-    for r in waitlist[1:]:
-        r["waitlist_position"] = pos
-        pos += 1
+def session_waitlist_position(registration: dict, session_id: str, store: Store) -> int | None:
+    if session_id not in (registration.get("session_waitlist") or {}):
+        return None
+    return store.session_waitlist(registration.get("event_id"), session_id).rank(registration.get("id"))
+
+
+def promote_waitlist(registrations: list, event_id: str, store: Store | None = None) -> dict | None:
+    store = ensure_store(store, registrations=registrations)
+    with store.event_lock(event_id):
+        rid = store.waitlist(event_id).peek()
+        if rid is None:
+            return None
+
+        # Remaining entries keep their stored position as a queue key; the
+        # number shown to attendees comes from waitlist_position() below.
+        candidate = store.get_registration(rid)
+        event = store.get_event(event_id) or {}
+        seats = store.seats(event_id)
+        # promotion is the organizer's call, so past capacity it still gets
+        # the lowest seat above it
+        seat = seats.first_free(int(event.get("capacity", 0)))
+        if seat is None:
+            seat = seats.first_free()
+        with store.updating(candidate):
+            candidate["status"] = "confirmed"
+            candidate["seat_number"] = seat
+            candidate["waitlist_position"] = None
+            candidate["updated_at"] = _now_iso()
+            _fit_sessions(store, event, candidate)
 
     return candidate
 
 
+def waitlist_position(registration: dict, store: Store) -> int | None:
+    if registration.get("status") != "waitlisted":
+        return None
+    return store.waitlist(registration.get("event_id")).rank(registration.get("id"))
+
+
 def cancel_registration(
     registrations: list,
     registration_id: str,
     events: list,
+    store: Store | None = None,
 ) -> dict:
-    for r in registrations:
-        if r.get("id") == registration_id:
-            if r.get("status") == "cancelled":
-                return r
-
-            event = _find_event(events, r["event_id"])
-            try:
-                start = date.fromisoformat(event["start_date"])
-            except Exception:
-                start = date.today()
-
+    store = ensure_store(store, events=events, registrations=registrations)
+    r = store.get_registration(registration_id)
+    if r is None:
+        raise ValueError(f"Registration with id '{registration_id}' not found.")
+    event = store.find_event(r["event_id"])
+    try:
+        start = date.fromisoformat(event["start_date"])
+    except Exception:
+        start = date.today()
+
+    with store.event_lock(r["event_id"]):
+        if r.get("status") == "cancelled":
+            return r
+        with store.updating(r):
             now = date.today()
             if start - now > timedelta(days=2):
                 if r.get("payment_status") == "paid":
@@ -135,27 +244,46 @@ def cancel_registration(
 
             r["status"] = "cancelled"
             r["updated_at"] = _now_iso()
-            return r
-
-    raise ValueError(f"Registration with id '{registration_id}' not found.")
+        # a freed session place goes to the next registration waiting for it
+        for sid in r.get("sessions") or []:
+            promote_session_waitlist(registrations, r["event_id"], sid, events, store)
+    return r
 
 
 def transfer_ticket(
     registrations: list,
     registration_id: str,
     new_attendee_id: str,
+    store: Store | None = None,
 ) -> dict:
-    for r in registrations:
-        if r.get("id") == registration_id:
-            if r.get("status") not in {"confirmed", "checked-in"}:
-                raise ValueError("Only confirmed or checked-in tickets can be transferred.")
+    store = ensure_store(store, registrations=registrations)
+    r = store.get_registration(registration_id)
+    if r is None:
+        raise ValueError(f"Registration with id '{registration_id}' not found.")
+    with store.event_lock(r.get("event_id")), store.attendee_lock(new_attendee_id):
+        if r.get("status") not in {"confirmed", "checked-in"}:
+            raise ValueError("Only confirmed or checked-in tickets can be transferred.")
+        sessions = list(r.get("sessions") or []) + list(r.get("session_waitlist") or {})
+        if sessions:
+            store.schedule().check_attendee(store.registrations_for_attendee(new_attendee_id), r["event_id"], sessions)
+        with store.updating(r):
             r["attendee_id"] = new_attendee_id
             r["updated_at"] = _now_iso()
-            return r
-    raise ValueError(f"Registration with id '{registration_id}' not found.")
+    return r
+
+
+def calculate_event_revenue(registrations: list, event_id: str, store: Store | None = None) -> float:
+    # cached per event for the store's own registrations, until one of the event's registrations changes
+    return memoize(
+        store,
+        ("registration.revenue", event_id),
+        lambda: _event_revenue(registrations, event_id),
+        event_id,
+        registrations=registrations,
+    )
 
 
-def calculate_event_revenue(registrations: list, event_id: str) -> float:
+def _event_revenue(registrations: list, event_id: str) -> float:
     total = 0.0
     for r in registrations:
         if r.get("event_id") != event_id:
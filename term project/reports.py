@@ -1,80 +1,189 @@
 from __future__ import annotations
 
-import csv
 import json
 import os
 from typing import List, Dict, Any
 
+from cache import memoize
 
-def attendance_report(events: list, registrations: list) -> dict:
-    report: dict[str, dict] = {}
 
-    for e in events:
-        eid = e.get("id")
-        capacity = int(e.get("capacity", 0))
-        registered = len([r for r in registrations if r.get("event_id") == eid and r.get("status") != "cancelled"])
-        checked_in = len([r for r in registrations if r.get("event_id") == eid and r.get("status") == "checked-in"])
-
-        report[eid] = {
-            "event_name": e.get("name"),
-            "capacity": capacity,
-            "registered": registered,
-            "checked_in": checked_in,
-            "remaining": max(capacity - registered, 0),
-        }
-
-    return report
+PAID_STATUSES = {"paid", "no_refund"}
 
 
-def revenue_report(events: list, registrations: list) -> dict:
-    per_event: dict[str, dict] = {}
+def _cents(r) -> int:
+    # Revenue is summed in whole cents: integer sums are exact in any order,
+    # so the live views below always equal a fresh recompute.
+    return round(float(r.get("price", 0.0)) * 100)
 
-    for e in events:
-        per_event[e["id"]] = {
-            "event_name": e.get("name"),
-            "revenue": 0.0,
-        }
-
-    for r in registrations:
-        eid = r.get("event_id")
-        if eid not in per_event:
-            continue
-        if r.get("payment_status") in {"paid", "no_refund"}:
-            per_event[eid]["revenue"] += float(r.get("price", 0.0))
 
-    return per_event
+def aggregate(events: list, registrations, store=None) -> dict:
+    # One pass over registrations fills every metric the report functions
+    # below return; registrations may be any iterable, e.g. a stream from
+    # storage.iter_registrations(). Given the store's own lists and the
+    # store, the result is cached until the next change.
+    return memoize(
+        store, ("reports.aggregate",), lambda: _aggregate(events, registrations), events=events, registrations=registrations
+    )
 
 
-def session_popularity(events: list, registrations: list) -> dict:
-    result: dict[str, dict] = {}
+def _aggregate(events: list, registrations) -> dict:
+    counts: dict[str, list] = {}
+    sessions: dict[str, dict] = {}
     session_titles: dict[tuple[str, str], str] = {}
     for e in events:
         eid = e.get("id")
+        counts[eid] = [0, 0, 0]  # registered, checked_in, revenue in cents
+        sessions[eid] = {}
         for s in e.get("sessions", []):
             session_titles[(eid, s["id"])] = s.get("title", s["id"])
 
-    for e in events:
-        eid = e["id"]
-        result[eid] = {}
-
     for r in registrations:
         eid = r.get("event_id")
-        if eid not in result:
+        row = counts.get(eid)
+        if row is None:
             continue
-        sessions = r.get("sessions", [])
-        for sid in sessions:
-            key = (eid, sid)
-            title = session_titles.get(key, sid)
-            stats = result[eid].setdefault(
-                sid,
-                {"session_title": title, "registered": 0, "checked_in": 0},
-            )
-            if r.get("status") in {"confirmed", "checked-in"}:
+        status = r.get("status")
+        if status != "cancelled":
+            row[0] += 1
+        if status == "checked-in":
+            row[1] += 1
+        if r.get("payment_status") in PAID_STATUSES:
+            row[2] += _cents(r)
+
+        for sid in r.get("sessions", []):
+            stats = sessions[eid].get(sid)
+            if stats is None:
+                stats = sessions[eid][sid] = {
+                    "session_title": session_titles.get((eid, sid), sid),
+                    "registered": 0,
+                    "checked_in": 0,
+                }
+            if status in {"confirmed", "checked-in"}:
                 stats["registered"] += 1
-            if r.get("status") == "checked-in":
+            if status == "checked-in":
                 stats["checked_in"] += 1
 
-    return result
+    return _build_views(events, counts, sessions)
+
+
+def _build_views(events: list, counts: dict, sessions: dict) -> dict:
+    attendance: dict[str, dict] = {}
+    revenue: dict[str, dict] = {}
+    for e in events:
+        eid = e.get("id")
+        registered, checked_in, cents = counts.get(eid, (0, 0, 0))
+        capacity = int(e.get("capacity", 0))
+        attendance[eid] = {
+            "event_name": e.get("name"),
+            "capacity": capacity,
+            "registered": registered,
+            "checked_in": checked_in,
+            "remaining": max(capacity - registered, 0),
+        }
+        revenue[eid] = {
+            "event_name": e.get("name"),
+            "revenue": cents / 100,
+        }
+    return {
+        "attendance": attendance,
+        "revenue": revenue,
+        "sessions": {e.get("id"): sessions.get(e.get("id"), {}) for e in events},
+    }
+
+
+class ReportViews:
+    # Attendance, revenue and session figures kept current by the store: each
+    # registration change arrives as apply(r, -1) before and apply(r, +1)
+    # after, so reading a report is O(E + sessions) with no registration scan.
+    # Event names, capacities and session titles are read from the events at
+    # query time, so event updates need no delta of their own.
+
+    def __init__(self, store, verify: bool = False) -> None:
+        self.store = store
+        self.verify_reads = verify
+        self.reset()
+        store.add_listener(self)
+
+    def reset(self) -> None:
+        self._counts: dict[str, list] = {}
+        self._sessions: dict[str, dict[str, list]] = {}
+
+    def apply(self, r: dict, delta: int) -> None:
+        eid = r.get("event_id")
+        row = self._counts.get(eid)
+        if row is None:
+            row = self._counts[eid] = [0, 0, 0]
+        status = r.get("status")
+        if status != "cancelled":
+            row[0] += delta
+        if status == "checked-in":
+            row[1] += delta
+        if r.get("payment_status") in PAID_STATUSES:
+            row[2] += delta * _cents(r)
+
+        sids = r.get("sessions", [])
+        if sids:
+            per_event = self._sessions.setdefault(eid, {})
+            for sid in sids:
+                stats = per_event.get(sid)
+                if stats is None:
+                    stats = per_event[sid] = [0, 0, 0]  # references, registered, checked_in
+                stats[0] += delta
+                if status in {"confirmed", "checked-in"}:
+                    stats[1] += delta
+                if status == "checked-in":
+                    stats[2] += delta
+                if not stats[0]:
+                    del per_event[sid]
+
+    def aggregate(self) -> dict:
+        result = memoize(self.store, ("reports.views",), self._live)
+        if self.verify_reads:
+            self.verify(result)
+        return result
+
+    def _live(self) -> dict:
+        events = self.store.events
+        sessions: dict[str, dict] = {}
+        for e in events:
+            eid = e.get("id")
+            live = self._sessions.get(eid)
+            if not live:
+                continue
+            titles = {s["id"]: s.get("title", s["id"]) for s in e.get("sessions", [])}
+            sessions[eid] = {
+                sid: {"session_title": titles.get(sid, sid), "registered": reg, "checked_in": chk}
+                for sid, (_, reg, chk) in live.items()
+            }
+        return _build_views(events, self._counts, sessions)
+
+    def verify(self, result: dict | None = None) -> None:
+        live = result if result is not None else self._live()
+        full = _aggregate(self.store.events, self.store.registrations)
+        assert live["attendance"] == full["attendance"], "attendance view drifted from recompute"
+        assert live["sessions"] == full["sessions"], "session view drifted from recompute"
+        assert live["revenue"] == full["revenue"], "revenue view drifted from recompute"
+
+    def attendance_report(self) -> dict:
+        return self.aggregate()["attendance"]
+
+    def revenue_report(self) -> dict:
+        return self.aggregate()["revenue"]
+
+    def session_popularity(self) -> dict:
+        return self.aggregate()["sessions"]
+
+
+def attendance_report(events: list, registrations, aggregates: dict | None = None, store=None) -> dict:
+    return (aggregates or aggregate(events, registrations, store))["attendance"]
+
+
+def revenue_report(events: list, registrations, aggregates: dict | None = None, store=None) -> dict:
+    return (aggregates or aggregate(events, registrations, store))["revenue"]
+
+
+def session_popularity(events: list, registrations, aggregates: dict | None = None, store=None) -> dict:
+    return (aggregates or aggregate(events, registrations, store))["sessions"]
 
 
 def export_report(report: dict, filename: str) -> str:
@@ -89,6 +198,8 @@ def export_report(report: dict, filename: str) -> str:
             if isinstance(item, dict):
                 keys.update(item.keys())
         keys = sorted(keys)
+        import csv
+
         with open(filename, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(["key"] + keys)
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import heapq
+import os
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import List, Dict, Any
+
+
+# Room and attendee conflicts. A session occupies [start_time, end_time); a
+# date without a time covers the whole day, and a session missing either
+# time never conflicts. Rooms are keyed by the event's location and the room
+# name, so two events at one venue share "Hall A" while two venues do not.
+# Sessions of cancelled events are ignored.
+
+
+def parse_time(value, end: bool = False) -> datetime | None:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if end and len(str(value)) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+def session_interval(session: dict) -> tuple[datetime, datetime] | None:
+    start = parse_time(session.get("start_time"))
+    end = parse_time(session.get("end_time"), end=True)
+    if start is None or end is None or end <= start:
+        return None
+    return start, end
+
+
+def room_key(event: dict, session: dict) -> tuple[str, str]:
+    return (str(event.get("location") or "").strip().lower(), str(session.get("room") or "").strip().lower())
+
+
+class IntervalIndex:
+    # Intervals in lists sorted by start. An overlap with [start, end) can
+    # only come from an interval that starts before `end` and no earlier than
+    # start - (longest duration), so a query is a bisect plus a backward
+    # scan over that window, which is empty or one entry when the index
+    # holds no overlaps.
+
+    def __init__(self) -> None:
+        self.starts: list[datetime] = []
+        self._entries: list[tuple[datetime, datetime, tuple]] = []
+        self._longest = timedelta(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, start: datetime, end: datetime, key: tuple) -> None:
+        pos = bisect_left(self.starts, start)
+        self.starts.insert(pos, start)
+        self._entries.insert(pos, (start, end, key))
+        self._longest = max(self._longest, end - start)
+
+    def remove(self, key: tuple) -> None:
+        for i, (_, _, k) in enumerate(self._entries):
+            if k == key:
+                del self.starts[i]
+                del self._entries[i]
+                return
+
+    def overlapping(self, start: datetime, end: datetime) -> list[tuple[datetime, datetime, tuple]]:
+        found = []
+        i = bisect_left(self.starts, end) - 1
+        while i >= 0 and self.starts[i] + self._longest > start:
+            entry = self._entries[i]
+            if entry[1] > start:
+                found.append(entry)
+            i -= 1
+        return found
+
+
+class Schedule:
+    def __init__(self, events: list) -> None:
+        self._events = {e.get("id"): e for e in events}
+        self._rooms: dict[tuple[str, str], IntervalIndex] = {}
+        self._sessions: dict[tuple[str, str], tuple[datetime, datetime]] = {}
+        self._room_of: dict[tuple[str, str], tuple[str, str]] = {}
+        for e in events:
+            for s in e.get("sessions", []):
+                self.add(e, s)
+
+    def add(self, event: dict, session: dict) -> None:
+        self._events.setdefault(event.get("id"), event)
+        interval = session_interval(session)
+        if interval is None:
+            return
+        key = (event.get("id"), session.get("id"))
+        self._sessions[key] = interval
+        if session.get("room"):
+            rk = self._room_of[key] = room_key(event, session)
+            self._rooms.setdefault(rk, IntervalIndex()).add(*interval, key)
+
+    def reindex(self, event: dict) -> None:
+        # after a change to the event's location, which moves its sessions to other rooms
+        for key in [k for k in self._sessions if k[0] == event.get("id")]:
+            del self._sessions[key]
+            rk = self._room_of.pop(key, None)
+            if rk is not None:
+                self._rooms[rk].remove(key)
+        self._events[event.get("id")] = event
+        for s in event.get("sessions", []):
+            self.add(event, s)
+
+    def interval(self, event_id: str, session_id: str) -> tuple[datetime, datetime] | None:
+        return self._sessions.get((event_id, session_id))
+
+    def is_active(self, key: tuple) -> bool:
+        return (self._events.get(key[0]) or {}).get("status") != "cancelled"
+
+    def room_conflicts(self, event: dict, session: dict, ignore: str | None = None) -> list[tuple]:
+        # (event id, session id) of the active sessions booked in the same
+        # room, leaving out the sessions of event `ignore`
+        interval = session_interval(session)
+        index = self._rooms.get(room_key(event, session))
+        if interval is None or index is None or not session.get("room"):
+            return []
+        return [k for _, _, k in index.overlapping(*interval) if k[0] != ignore and self.is_active(k)]
+
+    def check_room(self, event: dict, session: dict, ignore: str | None = None) -> None:
+        clash = self.room_conflicts(event, session, ignore)
+        if clash:
+            eid, sid = clash[0]
+            start, end = self._sessions[clash[0]]
+            raise ValueError(
+                f"Room '{session.get('room')}' is already booked by session {sid} of event {eid} "
+                f"({start.isoformat(timespec='minutes')} to {end.isoformat(timespec='minutes')})."
+            )
+
+    def attendee_index(self, registrations: list) -> IntervalIndex:
+        # the sessions an attendee holds or waits for across their active registrations
+        index = IntervalIndex()
+        for r in registrations:
+            if r.get("status") == "cancelled":
+                continue
+            for sid in list(r.get("sessions") or []) + list(r.get("session_waitlist") or {}):
+                key = (r.get("event_id"), sid)
+                interval = self._sessions.get(key)
+                if interval is not None and self.is_active(key):
+                    index.add(*interval, key)
+        return index
+
+    def check_attendee(self, registrations: list, event_id: str, session_ids: list) -> None:
+        index = self.attendee_index(registrations)
+        for sid in session_ids:
+            key = (event_id, sid)
+            interval = self._sessions.get(key)
+            if interval is None:
+                continue
+            clash = [k for _, _, k in index.overlapping(*interval) if k != key]
+            if clash:
+                raise ValueError(f"Session {sid} overlaps session {clash[0][1]} of event {clash[0][0]}.")
+            index.add(*interval, key)
+
+
+def _sweep(items: list[tuple[datetime, datetime, Any]]) -> list[tuple[Any, Any, datetime, datetime]]:
+    # Sweep line over intervals sorted by start: a heap of the ends still
+    # open when the next interval starts holds exactly the ones it overlaps.
+    items = sorted(items, key=lambda x: (x[0], x[1]))
+    open_: list[tuple[datetime, int]] = []
+    pairs = []
+    for n, (start, end, key) in enumerate(items):
+        while open_ and open_[0][0] <= start:
+            heapq.heappop(open_)
+        for other_end, m in open_:
+            pairs.append((items[m][2], key, start, min(end, other_end)))
+        heapq.heappush(open_, (end, n))
+    return pairs
+
+
+def conflict_report(store, event_id: str | None = None) -> dict:
+    # Room double bookings and attendees booked into overlapping sessions,
+    # for one event or for every event. Rooms shared with other events of
+    # the same location count.
+    schedule = store.schedule()
+    wanted = [store.find_event(event_id)] if event_id is not None else store.events
+    wanted = [e for e in wanted if e.get("status") != "cancelled"]
+
+    rooms_used = {room_key(e, s) for e in wanted for s in e.get("sessions", []) if s.get("room")}
+    by_room: dict[tuple, list] = {}
+    for e in store.events:
+        if e.get("status") == "cancelled":
+            continue
+        for s in e.get("sessions", []):
+            rk = room_key(e, s)
+            interval = session_interval(s)
+            if s.get("room") and rk in rooms_used and interval is not None:
+                by_room.setdefault(rk, []).append((*interval, (e.get("id"), s.get("id"))))
+    ids = {e.get("id") for e in wanted}
+    rooms = []
+    for rk, items in sorted(by_room.items()):
+        for a, b, start, end in _sweep(items):
+            if a[0] in ids or b[0] in ids:
+                rooms.append(
+                    {
+                        "location": rk[0],
+                        "room": rk[1],
+                        "first": list(a),
+                        "second": list(b),
+                        "from": start.isoformat(),
+                        "to": end.isoformat(),
+                    }
+                )
+
+    attendees = []
+    checked: set = set()
+    for r in store.registrations:
+        aid = r.get("attendee_id")
+        if r.get("event_id") not in ids or r.get("status") == "cancelled" or aid in checked:
+            continue
+        checked.add(aid)
+        items = []
+        for other in store.registrations_for_attendee(aid):
+            if other.get("status") == "cancelled":
+                continue
+            for sid in list(other.get("sessions") or []) + list(other.get("session_waitlist") or {}):
+                interval = schedule.interval(other.get("event_id"), sid)
+                if interval is not None and schedule.is_active((other.get("event_id"), sid)):
+                    items.append((*interval, (other.get("event_id"), sid)))
+        for a, b, start, end in _sweep(items):
+            attendees.append(
+                {"attendee_id": aid, "first": list(a), "second": list(b), "from": start.isoformat(), "to": end.isoformat()}
+            )
+    return {"rooms": rooms, "attendees": attendees}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    import storage
+    from store import Store
+
+    parser = argparse.ArgumentParser(description="Report room and attendee schedule conflicts.")
+    parser.add_argument("event_id", nargs="?", help="one event; all events when omitted")
+    parser.add_argument("--base-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+    report = conflict_report(Store(*storage.load_state(args.base_dir)), args.event_id)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import heapq
+from typing import List, Dict, Any, Optional
+
+
+# Seats of one event. A byte per seat records whether it is held by an
+# active registration and whether it is reserved; seats are handed out
+# lowest first. Seats above a high-water mark have never been given out and
+# are free unless marked; seats below it that become free again go on a
+# min-heap, so finding the lowest free seat is a heap peek. Heap entries for
+# seats that were taken again are dropped when they reach the top.
+#
+# Reserved ranges live on the event as "reserved_seats": [[first, last], ...]
+# and are never handed out automatically; a registration can still be given
+# one of them explicitly (registration_data["seat_number"]).
+
+HELD = 1
+RESERVED = 2
+
+
+class SeatMap:
+    def __init__(self, reserved: list | None = None) -> None:
+        self._state = bytearray(1)  # index 0 unused, seats start at 1
+        self._extra: dict[int, int] = {}  # seat -> holders beyond the first (legacy duplicates)
+        self._free: list[int] = []
+        self._next = 1
+        for first, last in reserved or ():
+            self.reserve(first, last)
+
+    def _grow(self, seat: int) -> None:
+        if seat >= len(self._state):
+            self._state.extend(bytes(max(seat + 1, 2 * len(self._state)) - len(self._state)))
+
+    def state(self, seat: int) -> int:
+        return self._state[seat] if 0 < seat < len(self._state) else 0
+
+    def is_free(self, seat: int) -> bool:
+        return seat > 0 and not self.state(seat)
+
+    def _freed(self, seat: int) -> None:
+        # seats at or above the mark are found by the walk in first_free()
+        if not self._state[seat] and seat < self._next:
+            heapq.heappush(self._free, seat)
+
+    def hold(self, seat: int) -> None:
+        self._grow(seat)
+        if self._state[seat] & HELD:
+            self._extra[seat] = self._extra.get(seat, 0) + 1
+        self._state[seat] |= HELD
+
+    def release(self, seat: int) -> None:
+        if not self.state(seat) & HELD:
+            return
+        extra = self._extra.get(seat)
+        if extra:
+            if extra == 1:
+                del self._extra[seat]
+            else:
+                self._extra[seat] = extra - 1
+            return
+        self._state[seat] &= ~HELD
+        self._freed(seat)
+
+    def reserve(self, first: int, last: int) -> None:
+        self._grow(last)
+        for seat in range(max(first, 1), last + 1):
+            self._state[seat] |= RESERVED
+
+    def unreserve(self, first: int, last: int) -> None:
+        for seat in range(max(first, 1), min(last, len(self._state) - 1) + 1):
+            if self._state[seat] & RESERVED:
+                self._state[seat] &= ~RESERVED
+                self._freed(seat)
+
+    def first_free(self, limit: int | None = None) -> int | None:
+        # lowest seat that is neither held nor reserved, up to `limit`
+        free, state = self._free, self._state
+        while free and free[0] < len(state) and state[free[0]]:
+            heapq.heappop(free)
+        if free:
+            return free[0] if limit is None or free[0] <= limit else None
+        while self._next < len(state) and state[self._next]:
+            self._next += 1
+        return self._next if limit is None or self._next <= limit else None
+
+    def lowest_free(self, count: int, limit: int | None = None) -> list[int]:
+        # the `count` lowest free seats without taking them, for batches
+        found = sorted({s for s in self._free if self.is_free(s)})[:count]
+        seat = self._next
+        while len(found) < count and (limit is None or seat <= limit):
+            if self.is_free(seat):
+                found.append(seat)
+            seat += 1
+        return [s for s in found if limit is None or s <= limit]
+
+    def find_run(self, count: int, limit: int) -> int | None:
+        # first seat of the lowest run of `count` free seats within 1..limit
+        run = 0
+        for seat in range(1, limit + 1):
+            run = run + 1 if self.is_free(seat) else 0
+            if run == count:
+                return seat - count + 1
+        return None
+
+    def duplicates(self) -> list[int]:
+        return sorted(self._extra)
+
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any
+from urllib.parse import quote, unquote
+
+import storage
+
+
+# Registrations partitioned by event in data/shards/: one JSON array per
+# event (e_<quoted event id>.json) plus manifest.json recording the event
+# order and per-shard counts. events.json and attendees.json stay where they
+# are. A save rewrites only the shards of events whose registrations changed.
+# Shard files are named from the event id, so a shard written just before a
+# crash is still found even if the manifest was not updated.
+
+SHARD_DIR = "shards"
+MANIFEST = "manifest.json"
+_PREFIX = "e_"
+
+
+def shard_dir(base_dir: str) -> str:
+    return os.path.join(storage._data_dir(base_dir), SHARD_DIR)
+
+
+def shard_path(base_dir: str, event_id: str) -> str:
+    return os.path.join(shard_dir(base_dir), f"{_PREFIX}{quote(event_id or '', safe='')}.json")
+
+
+def _event_id_from_name(name: str) -> str | None:
+    if not (name.startswith(_PREFIX) and name.endswith(".json")):
+        return None
+    return unquote(name[len(_PREFIX) : -len(".json")])
+
+
+def read_manifest(base_dir: str) -> dict:
+    path = os.path.join(shard_dir(base_dir), MANIFEST)
+    if not os.path.exists(path):
+        return {"shards": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(base_dir: str, manifest: dict) -> None:
+    storage._write_json(os.path.join(shard_dir(base_dir), MANIFEST), manifest)
+
+
+class ShardSet:
+    # Lazy view of the shards on disk: nothing is read until a shard is asked
+    # for, and each shard is read at most once.
+
+    def __init__(self, base_dir: str) -> None:
+        self.base_dir = base_dir
+        self.manifest = read_manifest(base_dir)
+        self._loaded: dict[str, list] = {}
+
+    def event_ids(self) -> list[str]:
+        ids = list(self.manifest["shards"])
+        known = set(ids)
+        if os.path.isdir(shard_dir(self.base_dir)):
+            for name in sorted(os.listdir(shard_dir(self.base_dir))):
+                eid = _event_id_from_name(name)
+                if eid is not None and eid not in known:
+                    ids.append(eid)
+        return ids
+
+    def count(self, event_id: str) -> int:
+        entry = self.manifest["shards"].get(event_id)
+        return entry["count"] if entry is not None else len(self.load(event_id))
+
+    def load(self, event_id: str) -> list:
+        regs = self._loaded.get(event_id)
+        if regs is None:
+            regs = self._loaded[event_id] = storage._read_json(shard_path(self.base_dir, event_id))
+        return regs
+
+    def iter_registrations(self):
+        # Streams shard by shard without keeping earlier shards around.
+        for eid in self.event_ids():
+            if eid in self._loaded:
+                yield from self._loaded[eid]
+            else:
+                yield from storage.iter_json_array(shard_path(self.base_dir, eid))
+
+
+def exists(base_dir: str) -> bool:
+    return os.path.exists(os.path.join(shard_dir(base_dir), MANIFEST))
+
+
+def load_state(base_dir: str) -> tuple[list, list, list]:
+    # First start after switching modes reads the JSON files once.
+    if not exists(base_dir):
+        return storage.load_snapshot(base_dir)
+    ddir = storage._data_dir(base_dir)
+    events = storage._read_json(os.path.join(ddir, "events.json"))
+    attendees = storage._read_json(os.path.join(ddir, "attendees.json"))
+    return events, attendees, load_registrations(base_dir)
+
+
+def load_registrations(base_dir: str) -> list:
+    if not exists(base_dir):
+        return storage._read_json(os.path.join(storage._data_dir(base_dir), "registrations.json"))
+    shard_set = ShardSet(base_dir)
+    registrations = []
+    for eid in shard_set.event_ids():
+        registrations.extend(shard_set.load(eid))
+    return registrations
+
+
+def _read_events(base_dir: str) -> list:
+    return storage._read_json(os.path.join(storage._data_dir(base_dir), "events.json"))
+
+
+def iter_registrations(base_dir: str):
+    if not exists(base_dir):
+        yield from storage.iter_json_array(os.path.join(storage._data_dir(base_dir), "registrations.json"))
+        return
+    yield from ShardSet(base_dir).iter_registrations()
+
+
+def _group(registrations: list, event_ids: set | None = None) -> dict[str, list]:
+    groups: dict[str, list] = {}
+    for r in registrations:
+        eid = r.get("event_id") or ""
+        if event_ids is None or eid in event_ids:
+            groups.setdefault(eid, []).append(r)
+    return groups
+
+
+def save_changes(
+    base_dir: str,
+    events: list,
+    attendees: list,
+    registrations: list,
+    changes: list[tuple[str, dict]] | None,
+) -> None:
+    ddir = storage._data_dir(base_dir)
+    os.makedirs(shard_dir(base_dir), exist_ok=True)
+    full = changes is None or not exists(base_dir)
+    kinds = {kind for kind, _ in changes or ()}
+
+    if full or "event" in kinds:
+        storage._write_json(os.path.join(ddir, "events.json"), events)
+    if full or "attendee" in kinds:
+        storage._write_json(os.path.join(ddir, "attendees.json"), attendees)
+
+    manifest = {"shards": {}} if full else read_manifest(base_dir)
+    if full:
+        groups = _group(registrations)
+    else:
+        dirty = {(r.get("event_id") or "") for kind, r in changes if kind == "registration"}
+        if not dirty:
+            return
+        groups = _group(registrations, dirty)
+    for eid, regs in groups.items():
+        storage._write_json(shard_path(base_dir, eid), regs)
+        manifest["shards"][eid] = {"count": len(regs)}
+    _write_manifest(base_dir, manifest)
+
+    if full:
+        # drop shards of events that no longer have registrations
+        for name in os.listdir(shard_dir(base_dir)):
+            eid = _event_id_from_name(name)
+            if eid is not None and eid not in groups:
+                os.remove(os.path.join(shard_dir(base_dir), name))
+
+
+def split(base_dir: str) -> int:
+    events, attendees, registrations = storage.load_snapshot(base_dir)
+    save_changes(base_dir, events, attendees, registrations, None)
+    return len(read_manifest(base_dir)["shards"])
+
+
+# Process-pool fan-out. Each worker reads one shard file itself, so only the
+# small per-shard results cross process boundaries.
+
+
+def _aggregate_shard(path: str, event: dict) -> dict:
+    import reports
+
+    return reports.aggregate([event], storage.iter_json_array(path))
+
+
+def _check_shard(path: str, event_id: str) -> dict:
+    result = {"registrations": 0, "invalid": [], "ids": [], "codes": [], "unknown_event": []}
+    for r in storage.iter_json_array(path):
+        result["registrations"] += 1
+        if not storage.validate_registration(r):
+            result["invalid"].append(r.get("id") if isinstance(r, dict) else None)
+            continue
+        result["ids"].append(r["id"])
+        result["codes"].append(r["confirmation_code"])
+        if r["event_id"] != event_id:
+            result["unknown_event"].append(r["id"])
+    return result
+
+
+def _run(fn, jobs: list[tuple], workers: int | None) -> list:
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        return [fn(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(fn, *job) for job in jobs]
+        return [f.result() for f in futures]
+
+
+def aggregate(base_dir: str, workers: int | None = None) -> dict:
+    # Same result as reports.aggregate() over all registrations; events never
+    # share a shard, so the per-shard results merge by plain dict update.
+    events = _read_events(base_dir)
+    present = set(ShardSet(base_dir).event_ids())
+    jobs = [(shard_path(base_dir, e.get("id")), e) for e in events if e.get("id") in present]
+    merged = {"attendance": {}, "revenue": {}, "sessions": {}}
+    for part in _run(_aggregate_shard, jobs, workers):
+        for view, rows in part.items():
+            merged[view].update(rows)
+
+    import reports
+
+    empty = reports.aggregate([e for e in events if e.get("id") not in present], ())
+    for view, rows in empty.items():
+        merged[view].update(rows)
+    # keep the events.json order, as reports.aggregate() does
+    return {view: {e.get("id"): merged[view][e.get("id")] for e in events} for view in merged}
+
+
+def check_integrity(base_dir: str, workers: int | None = None) -> dict:
+    event_ids = {e.get("id") for e in _read_events(base_dir)}
+    jobs = [(shard_path(base_dir, eid), eid) for eid in ShardSet(base_dir).event_ids()]
+    result = {"registrations": 0, "invalid": [], "duplicate_ids": [], "duplicate_codes": [], "unknown_event": []}
+    seen_ids: set = set()
+    seen_codes: set = set()
+    for (_, eid), part in zip(jobs, _run(_check_shard, jobs, workers)):
+        result["registrations"] += part["registrations"]
+        result["invalid"] += part["invalid"]
+        for rid in part["ids"]:
+            if rid in seen_ids:
+                result["duplicate_ids"].append(rid)
+            seen_ids.add(rid)
+        for code in part["codes"]:
+            if code in seen_codes:
+                result["duplicate_codes"].append(code)
+            seen_codes.add(code)
+        # a registration filed under the wrong shard, or a shard for an
+        # event that is gone, is reported like an unknown event
+        result["unknown_event"] += part["ids"] if eid not in event_ids else part["unknown_event"]
+    return result
+
+
+if __name__ == "__main__":
+    commands = {"split", "report", "check"}
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print("usage: python shards.py split|report|check [BASE_DIR]")
+        sys.exit(2)
+    base = sys.argv[2] if len(sys.argv) > 2 else os.path.dirname(os.path.abspath(__file__))
+    if sys.argv[1] == "split":
+        print(f"Wrote {split(base)} shards to {shard_dir(base)}")
+    elif sys.argv[1] == "report":
+        print(json.dumps(aggregate(base), indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(check_integrity(base), indent=2))
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import gc
+import marshal
+import os
+import sys
+from array import array
+from typing import List, Dict, Any
+
+import instrument
+import storage
+
+
+# Column-oriented snapshot of all three collections in data/state.snap.
+#
+# Each collection is stored as one column per key. String columns with few
+# distinct values (status, payment_status, event_id, ticket_type, ...) are
+# dictionary-encoded: a table of distinct strings plus an array of small
+# integer codes, so a load builds each repeated string once. Other string
+# columns (ids, confirmation codes) are joined into one string and split on
+# load, and columns holding a single repeated value are stored once. The payload is
+# written with marshal, which only handles plain data types, and the header
+# records the marshal version so a snapshot from another interpreter is
+# rejected instead of misread.
+
+SNAPSHOT_NAME = "state.snap"
+MAGIC = b"EVSNAP1\n"
+
+_MISSING_CODE = 0
+_SEP = "\x1f"
+
+
+def snapshot_path(base_dir: str) -> str:
+    return os.path.join(storage._data_dir(base_dir), SNAPSHOT_NAME)
+
+
+def _encode_column(values: list) -> tuple:
+    n = len(values)
+    if n and all(type(v) is list and not v for v in values):
+        return ("empty_lists", n)
+    if n and type(values[0]) in (type(None), bool, int, float, str) and values.count(values[0]) == n:
+        # count() uses ==, so also check types to keep 1 and 1.0 apart
+        if all(type(v) is type(values[0]) for v in values):
+            return ("const", values[0], n)
+    if n >= 16 and all(v is None or type(v) is str for v in values):
+        table: dict = {}
+        codes = [table.setdefault(v, len(table)) for v in values]
+        if len(table) <= n // 4:
+            typecode = "B" if len(table) <= 0xFF else "H" if len(table) <= 0xFFFF else "I"
+            return ("cat", list(table), typecode, array(typecode, codes).tobytes())
+        if None not in table and not any(_SEP in v for v in table):
+            return ("joined", _SEP.join(values))
+    return ("raw", values)
+
+
+def _decode_column(column: tuple) -> list:
+    kind = column[0]
+    if kind == "cat":
+        _, table, typecode, raw = column
+        table = [sys.intern(v) if v is not None else None for v in table]
+        codes = array(typecode)
+        codes.frombytes(raw)
+        return list(map(table.__getitem__, codes))
+    if kind == "joined":
+        return column[1].split(_SEP)
+    if kind == "const":
+        return [column[1]] * column[2]
+    if kind == "empty_lists":
+        return [[] for _ in range(column[1])]
+    return column[1]
+
+
+def encode_records(records: list) -> dict:
+    first = tuple(records[0]) if records else ()
+    keys = list(first)
+    seen = set(first)
+    uniform = True
+    for r in records:
+        if uniform and tuple(r) == first:
+            continue
+        uniform = False
+        for k in r:
+            if k not in seen:
+                seen.add(k)
+                keys.append(k)
+
+    columns = []
+    present = []
+    for k in keys:
+        columns.append(_encode_column([r.get(k) for r in records]))
+        present.append(None if uniform else bytes(1 if k in r else _MISSING_CODE for r in records))
+    return {"count": len(records), "keys": keys, "columns": columns, "present": present}
+
+
+def decode_records(block: dict) -> list:
+    keys = block["keys"]
+    if not keys:
+        return [{} for _ in range(block["count"])]
+    columns = [_decode_column(c) for c in block["columns"]]
+    records = [dict(zip(keys, row)) for row in zip(*columns)]
+    for k, mask in zip(keys, block["present"]):
+        if mask is None:
+            continue
+        for i, flag in enumerate(mask):
+            if flag == _MISSING_CODE:
+                del records[i][k]
+    return records
+
+
+def dumps(events: list, attendees: list, registrations: list) -> bytes:
+    payload = {
+        "events": encode_records(events),
+        "attendees": encode_records(attendees),
+        "registrations": encode_records(registrations),
+    }
+    return MAGIC + marshal.version.to_bytes(2, "little") + marshal.dumps(payload)
+
+
+def loads(data: bytes) -> tuple[list, list, list]:
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a snapshot file.")
+    version = int.from_bytes(data[len(MAGIC) : len(MAGIC) + 2], "little")
+    if version != marshal.version:
+        raise ValueError(f"Snapshot was written with marshal version {version}, this Python uses {marshal.version}.")
+    # The decoded records are all new containers; pausing the cyclic GC while
+    # they are built avoids repeated full-heap passes that find nothing.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        payload = marshal.loads(memoryview(data)[len(MAGIC) + 2 :])
+        return (
+            decode_records(payload["events"]),
+            decode_records(payload["attendees"]),
+            decode_records(payload["registrations"]),
+        )
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def write(base_dir: str, events: list, attendees: list, registrations: list) -> str:
+    path = snapshot_path(base_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    data = dumps(events, attendees, registrations)
+    with open(tmp, "wb") as f:
+        f.write(data)
+    instrument.add_bytes(len(data))
+    os.replace(tmp, path)
+    return path
+
+
+def load(base_dir: str) -> tuple[list, list, list]:
+    with open(snapshot_path(base_dir), "rb") as f:
+        return loads(f.read())
+
+
+def load_state(base_dir: str) -> tuple[list, list, list]:
+    # First start after switching modes reads the JSON files once.
+    if not os.path.exists(snapshot_path(base_dir)):
+        return storage.load_snapshot(base_dir)
+    return load(base_dir)
+
+
+def export_json(base_dir: str, out_base_dir: str | None = None) -> list[str]:
+    events, attendees, registrations = load(base_dir)
+    out = out_base_dir or base_dir
+    storage.write_snapshot(out, events, attendees, registrations)
+    ddir = storage._data_dir(out)
+    return [os.path.join(ddir, f"{name}.json") for name in ("events", "attendees", "registrations")]
+
+
+if __name__ == "__main__":
+    commands = {"export-json", "import-json"}
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print("usage: python snapshot.py export-json|import-json [BASE_DIR]")
+        sys.exit(2)
+    base = sys.argv[2] if len(sys.argv) > 2 else os.path.dirname(os.path.abspath(__file__))
+    if sys.argv[1] == "export-json":
+        for p in export_json(base):
+            print(f"Wrote {p}")
+    else:
+        print(f"Wrote {write(base, *storage.load_snapshot(base))}")
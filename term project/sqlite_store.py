@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+from typing import List, Dict, Any
+
+import instrument
+import storage
+
+
+DB_NAME = "platform.db"
+
+# Column order follows the key order of the dicts built in events.py,
+# attendees.py and registration.py so a load gives back the same records.
+EVENT_COLUMNS = ("id", "name", "location", "start_date", "end_date", "capacity", "price", "description", "status")
+SESSION_COLUMNS = ("id", "title", "speaker", "room", "capacity", "start_time", "end_time")
+ATTENDEE_COLUMNS = ("id", "name", "email", "organization", "dietary", "ticket_type", "pin", "communication")
+REGISTRATION_COLUMNS = (
+    "id",
+    "event_id",
+    "attendee_id",
+    "ticket_type",
+    "seat_number",
+    "confirmation_code",
+    "payment_method",
+    "payment_status",
+    "status",
+    "created_at",
+    "updated_at",
+    "checkin_timestamp",
+    "sessions",
+    "waitlist_position",
+    "price",
+)
+JSON_COLUMNS = {"communication", "sessions"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    location TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    capacity INTEGER,
+    price REAL,
+    description TEXT,
+    status TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    event_id TEXT NOT NULL REFERENCES events(id),
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT,
+    speaker TEXT,
+    room TEXT,
+    capacity INTEGER,
+    start_time TEXT,
+    end_time TEXT,
+    extra TEXT,
+    PRIMARY KEY (event_id, id)
+);
+CREATE TABLE IF NOT EXISTS attendees (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    organization TEXT,
+    dietary TEXT,
+    ticket_type TEXT,
+    pin TEXT,
+    communication TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attendees_email ON attendees(email);
+CREATE TABLE IF NOT EXISTS registrations (
+    id TEXT PRIMARY KEY,
+    event_id TEXT,
+    attendee_id TEXT,
+    ticket_type TEXT,
+    seat_number INTEGER,
+    confirmation_code TEXT,
+    payment_method TEXT,
+    payment_status TEXT,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    checkin_timestamp TEXT,
+    sessions TEXT,
+    waitlist_position INTEGER,
+    price REAL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_registrations_event ON registrations(event_id);
+CREATE INDEX IF NOT EXISTS idx_registrations_attendee ON registrations(attendee_id);
+CREATE INDEX IF NOT EXISTS idx_registrations_code ON registrations(confirmation_code);
+CREATE INDEX IF NOT EXISTS idx_registrations_status ON registrations(event_id, status);
+"""
+
+_connections: dict[str, sqlite3.Connection] = {}
+
+
+def db_path(base_dir: str) -> str:
+    return os.path.join(storage._data_dir(base_dir), DB_NAME)
+
+
+def connect(base_dir: str) -> sqlite3.Connection:
+    path = db_path(base_dir)
+    conn = _connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _connections[path] = conn
+    return conn
+
+
+def close(base_dir: str) -> None:
+    conn = _connections.pop(db_path(base_dir), None)
+    if conn is not None:
+        conn.close()
+
+
+def _to_row(record: dict, columns: tuple) -> tuple:
+    row = []
+    for col in columns:
+        value = record.get(col)
+        if col in JSON_COLUMNS and value is not None:
+            value = json.dumps(value, ensure_ascii=False)
+        row.append(value)
+    extra = {k: v for k, v in record.items() if k not in columns}
+    row.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+    return tuple(row)
+
+
+def _from_row(row: tuple, columns: tuple) -> dict:
+    record = {}
+    for col, value in zip(columns, row):
+        if col in JSON_COLUMNS and value is not None:
+            value = json.loads(value)
+        record[col] = value
+    if row[len(columns)]:
+        record.update(json.loads(row[len(columns)]))
+    return record
+
+
+def _upsert_sql(table: str, columns: tuple, key: tuple) -> str:
+    cols = columns + ("extra",)
+    updates = ", ".join(f"{c}=excluded.{c}" for c in cols if c not in key)
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+        f"ON CONFLICT({', '.join(key)}) DO UPDATE SET {updates}"
+    )
+
+
+_EVENT_UPSERT = _upsert_sql("events", EVENT_COLUMNS, ("id",))
+_SESSION_INSERT = _upsert_sql("sessions", ("event_id", "position") + SESSION_COLUMNS, ("event_id", "id"))
+_ATTENDEE_UPSERT = _upsert_sql("attendees", ATTENDEE_COLUMNS, ("id",))
+_REGISTRATION_UPSERT = _upsert_sql("registrations", REGISTRATION_COLUMNS, ("id",))
+
+
+def _write(conn: sqlite3.Connection, events: list, attendees: list, registrations: list) -> None:
+    event_rows = []
+    session_rows = []
+    for e in events:
+        event_rows.append(_to_row({k: v for k, v in e.items() if k != "sessions"}, EVENT_COLUMNS))
+        for pos, s in enumerate(e.get("sessions", [])):
+            session_rows.append((e.get("id"), pos) + _to_row(s, SESSION_COLUMNS))
+
+    attendee_rows = [_to_row(a, ATTENDEE_COLUMNS) for a in attendees]
+    registration_rows = [_to_row(r, REGISTRATION_COLUMNS) for r in registrations]
+
+    conn.execute("BEGIN")
+    try:
+        if event_rows:
+            conn.executemany(_EVENT_UPSERT, event_rows)
+            conn.executemany("DELETE FROM sessions WHERE event_id = ?", [(e.get("id"),) for e in events])
+            conn.executemany(_SESSION_INSERT, session_rows)
+        if attendee_rows:
+            conn.executemany(_ATTENDEE_UPSERT, attendee_rows)
+        if registration_rows:
+            conn.executemany(_REGISTRATION_UPSERT, registration_rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    if instrument.enabled():
+        # the row payload handed to SQLite; its page writes are not visible here
+        rows = (event_rows, session_rows, attendee_rows, registration_rows)
+        payload = sum(len(str(v).encode("utf-8")) for group in rows for row in group for v in row if v is not None)
+        instrument.add_bytes(payload)
+
+
+def save_changes(base_dir: str, changes: list[tuple[str, dict]]) -> None:
+    grouped: dict[str, list] = {"event": [], "attendee": [], "registration": []}
+    for kind, record in changes:
+        grouped[kind].append(record)
+    if changes:
+        _write(connect(base_dir), grouped["event"], grouped["attendee"], grouped["registration"])
+
+
+def save_all(base_dir: str, events: list, attendees: list, registrations: list) -> None:
+    _write(connect(base_dir), events, attendees, registrations)
+
+
+def load_state(base_dir: str) -> tuple[list, list, list]:
+    conn = connect(base_dir)
+    sessions: dict[str, list] = {}
+    cur = conn.execute(
+        f"SELECT event_id, {', '.join(SESSION_COLUMNS)}, extra FROM sessions ORDER BY event_id, position"
+    )
+    for row in cur:
+        sessions.setdefault(row[0], []).append(_from_row(row[1:], SESSION_COLUMNS))
+
+    events = []
+    for row in conn.execute(f"SELECT {', '.join(EVENT_COLUMNS)}, extra FROM events ORDER BY rowid"):
+        e = _from_row(row, EVENT_COLUMNS)
+        e["sessions"] = sessions.get(e["id"], [])
+        events.append(e)
+
+    attendees = [
+        _from_row(row, ATTENDEE_COLUMNS)
+        for row in conn.execute(f"SELECT {', '.join(ATTENDEE_COLUMNS)}, extra FROM attendees ORDER BY rowid")
+    ]
+    return events, attendees, list(iter_registrations(base_dir))
+
+
+def iter_registrations(base_dir: str):
+    cur = connect(base_dir).execute(
+        f"SELECT {', '.join(REGISTRATION_COLUMNS)}, extra FROM registrations ORDER BY rowid"
+    )
+    for row in cur:
+        yield _from_row(row, REGISTRATION_COLUMNS)
+
+
+def backup(base_dir: str, dest: str) -> str:
+    target = sqlite3.connect(dest)
+    try:
+        connect(base_dir).backup(target)
+    finally:
+        target.close()
+    return dest
+
+
+def migrate(base_dir: str) -> tuple[int, int, int]:
+    events, attendees, registrations = storage.load_snapshot(base_dir)
+    save_all(base_dir, events, attendees, registrations)
+    return len(events), len(attendees), len(registrations)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("usage: python sqlite_store.py migrate [BASE_DIR]")
+        sys.exit(2)
+    base = sys.argv[2] if len(sys.argv) > 2 else os.path.dirname(os.path.abspath(__file__))
+    counts = migrate(base)
+    print(f"Migrated {counts[0]} events, {counts[1]} attendees, {counts[2]} registrations into {db_path(base)}")
@@ -2,71 +2,391 @@ from __future__ import annotations
 
 import json
 import os
-import shutil
+import threading
+from collections.abc import Mapping
 from typing import List, Dict, Any, Tuple
 
+import instrument
+
 
 def _data_dir(base_dir: str) -> str:
     return os.path.join(base_dir, "data")
 
 
-def load_state(base_dir: str) -> tuple[list, list, list]:
-    ddir = _data_dir(base_dir)
-    events_path = os.path.join(ddir, "events.json")
-    attendees_path = os.path.join(ddir, "attendees.json")
-    registrations_path = os.path.join(ddir, "registrations.json")
+# config.json parsed once per version of the file: entries are keyed on its
+# mtime and size, so an edited config is read again on the next call. The
+# returned dict is shared, read it without modifying it.
+_CONFIG_CACHE: dict[str, tuple[tuple[int, int], dict]] = {}
+
+
+def load_config(base_dir: str) -> dict:
+    path = os.path.join(base_dir, "config.json")
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _CONFIG_CACHE.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = _CONFIG_CACHE[path] = (stamp, json.load(f))
+    return cached[1]
+
+
+def storage_mode(base_dir: str, config: dict | None = None) -> str:
+    # "json" (default): rewrite the three files on every save
+    # "journal": append changed records to data/journal.log, see journal.py
+    # "sqlite": upsert changed rows into data/platform.db, see sqlite_store.py
+    # "snapshot": rewrite the columnar data/state.snap, see snapshot.py
+    # "sharded": one registrations file per event in data/shards/, see shards.py
+    if config is None:
+        config = load_config(base_dir)
+    return os.environ.get("EVENT_STORAGE") or config.get("storage", "json")
+
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16):
+    # Yields the items of a top-level JSON array one at a time, holding only
+    # the current chunk and item in memory. An item is only taken once the
+    # "," or "]" after it is in the buffer too, so a number cut at a chunk
+    # boundary ("12." then "5") is read again whole instead of half-decoded.
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos = "", 0
+
+        def more() -> bool:
+            nonlocal buf, pos
+            chunk = f.read(chunk_size)
+            buf, pos = buf[pos:] + chunk, 0
+            return bool(chunk)
+
+        expect = "["  # then "first" (an item or "]"), "next" ("," or "]"), "item"
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buf):
+                if not more():
+                    raise ValueError(f"{path}: unexpected end of JSON array.")
+                continue
+            c = buf[pos]
+            if expect == "[":
+                if c != "[":
+                    raise ValueError(f"{path}: expected a JSON array.")
+                pos, expect = pos + 1, "first"
+                continue
+            if expect == "next" or (expect == "first" and c == "]"):
+                if c == "]":
+                    return
+                if c != ",":
+                    raise ValueError(f"{path}: expected ',' or ']' between array items.")
+                pos, expect = pos + 1, "item"
+                continue
+            try:
+                item, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            after = end
+            while after < len(buf) and buf[after] in _WHITESPACE:
+                after += 1
+            if (after >= len(buf) or buf[after] not in ",]") and more():
+                continue
+            yield item
+            pos, expect = end, "next"
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def iter_registrations(base_dir: str):
+    mode = storage_mode(base_dir)
+    if mode == "sqlite":
+        import sqlite_store
+        yield from sqlite_store.iter_registrations(base_dir)
+    elif mode == "json":
+        yield from iter_json_array(os.path.join(_data_dir(base_dir), "registrations.json"))
+    elif mode == "sharded":
+        import shards
+        yield from shards.iter_registrations(base_dir)
+    else:
+        # journal and snapshot files only make sense fully replayed/decoded
+        yield from load_state(base_dir)[2]
+
+
+def check_integrity(base_dir: str) -> dict:
+    mode = storage_mode(base_dir)
+    if mode == "sharded":
+        import shards
+        if shards.exists(base_dir):
+            return shards.check_integrity(base_dir)
+    if mode in ("json", "sharded"):
+        event_ids = {e.get("id") for e in iter_json_array(os.path.join(_data_dir(base_dir), "events.json"))}
+    else:
+        event_ids = {e.get("id") for e in load_state(base_dir)[0]}
+    seen_ids: set = set()
+    seen_codes: set = set()
+    result = {"registrations": 0, "invalid": [], "duplicate_ids": [], "duplicate_codes": [], "unknown_event": []}
+    for r in iter_registrations(base_dir):
+        result["registrations"] += 1
+        if not validate_registration(r):
+            result["invalid"].append(r.get("id") if isinstance(r, Mapping) else None)
+            continue
+        if r["id"] in seen_ids:
+            result["duplicate_ids"].append(r["id"])
+        seen_ids.add(r["id"])
+        if r["confirmation_code"] in seen_codes:
+            result["duplicate_codes"].append(r["confirmation_code"])
+        seen_codes.add(r["confirmation_code"])
+        if r["event_id"] not in event_ids:
+            result["unknown_event"].append(r["id"])
+    return result
+
+
+COLLECTIONS = ("events", "attendees", "registrations")
+
+
+class LazyState:
+    # Per-collection loading for the interactive menus. Events and
+    # registrations are read by a background thread while the role prompt
+    # waits for input; attendees are read on the first get("attendees").
+    # json and sharded keep each collection in its own file(s); the other
+    # modes read everything at once and hand out the parts.
+
+    def __init__(self, base_dir: str, prefetch: tuple = ("events", "registrations")) -> None:
+        self.base_dir = base_dir
+        self._split = storage_mode(base_dir) in ("json", "sharded")
+        self._loaded: dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._prefetch, args=(prefetch,), name="load-state", daemon=True)
+        self._thread.start()
+
+    def _prefetch(self, names: tuple) -> None:
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                # get() in the caller's thread retries and raises
+                return
+
+    def loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def get(self, name: str) -> list:
+        if name not in COLLECTIONS:
+            raise ValueError(f"Unknown collection '{name}'.")
+        # one reader at a time; a caller that asks for what the prefetch is
+        # reading waits here for that result instead of reading it twice
+        with self._lock:
+            if name not in self._loaded:
+                if self._split:
+                    self._loaded[name] = load_collection(self.base_dir, name)
+                else:
+                    self._loaded.update(zip(COLLECTIONS, load_state(self.base_dir)))
+            return self._loaded[name]
+
 
-    events: list = []
-    attendees: list = []
-    registrations: list = []
+def _read_json(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    if os.path.exists(events_path):
-        with open(events_path, "r", encoding="utf-8") as f:
-            events = json.load(f)
 
-    if os.path.exists(attendees_path):
-        with open(attendees_path, "r", encoding="utf-8") as f:
-            attendees = json.load(f)
+def json_default(value):
+    # compact records (records.Registration) serialize as the dicts they replace
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return to_dict()
 
-    if os.path.exists(registrations_path):
-        with open(registrations_path, "r", encoding="utf-8") as f:
-            registrations = json.load(f)
 
+def _write_json(path: str, data: list) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
+        instrument.add_bytes(f.tell())
+    os.replace(tmp, path)
+
+
+def load_snapshot(base_dir: str) -> tuple[list, list, list]:
+    ddir = _data_dir(base_dir)
+    events = _read_json(os.path.join(ddir, "events.json"))
+    attendees = _read_json(os.path.join(ddir, "attendees.json"))
+    registrations = _read_json(os.path.join(ddir, "registrations.json"))
     return events, attendees, registrations
 
 
-def save_state(base_dir: str, events: list, attendees: list, registrations: list) -> None:
+def write_snapshot(base_dir: str, events: list, attendees: list, registrations: list) -> None:
     ddir = _data_dir(base_dir)
     os.makedirs(ddir, exist_ok=True)
+    _write_json(os.path.join(ddir, "events.json"), events)
+    if attendees is not None:
+        _write_json(os.path.join(ddir, "attendees.json"), attendees)
+    _write_json(os.path.join(ddir, "registrations.json"), registrations)
+
+
+def _compact_if_configured(registrations: list, config: dict) -> list:
+    if config.get("compact_records"):
+        import records
+        records.compact_all(registrations)
+    return registrations
+
+
+def load_state(base_dir: str) -> tuple[list, list, list]:
+    config = load_config(base_dir)
+    state = _load_state(base_dir, config)
+    _compact_if_configured(state[2], config)
+    return state
+
+
+def load_collection(base_dir: str, name: str) -> list:
+    # One collection without the others. Only json and sharded store them
+    # separately; the other modes have to read the full state.
+    config = load_config(base_dir)
+    mode = storage_mode(base_dir, config)
+    index = COLLECTIONS.index(name)
+    if mode == "sharded" and name == "registrations":
+        import shards
+        return _compact_if_configured(shards.load_registrations(base_dir), config)
+    if mode not in ("json", "sharded"):
+        return load_state(base_dir)[index]
+    data = _read_json(os.path.join(_data_dir(base_dir), f"{name}.json"))
+    return _compact_if_configured(data, config) if name == "registrations" else data
+
+
+def _load_state(base_dir: str, config: dict) -> tuple[list, list, list]:
+    mode = storage_mode(base_dir, config)
+    if mode == "journal":
+        import journal
+        return journal.load_state(base_dir)
+    if mode == "sqlite":
+        import sqlite_store
+        return sqlite_store.load_state(base_dir)
+    if mode == "snapshot":
+        import snapshot
+        return snapshot.load_state(base_dir)
+    if mode == "sharded":
+        import shards
+        return shards.load_state(base_dir)
+    return load_snapshot(base_dir)
+
 
-    events_path = os.path.join(ddir, "events.json")
-    attendees_path = os.path.join(ddir, "attendees.json")
-    registrations_path = os.path.join(ddir, "registrations.json")
+def save_state(
+    base_dir: str,
+    events: list,
+    attendees: list,
+    registrations: list,
+    store=None,
+) -> None:
+    changes = store.take_dirty() if store is not None else None
+    config = load_config(base_dir)
+    if attendees is None:
+        # the store has not read them yet (see Store.loaded_attendees), so
+        # they are unchanged; only a full rewrite needs them
+        if store is None:
+            raise ValueError("Attendees are required without a store.")
+        if changes is None or not _keeps_unchanged_attendees(base_dir, config):
+            attendees = store.attendees
+    save_changes(base_dir, events, attendees, registrations, changes, config=config)
 
-    with open(events_path, "w", encoding="utf-8") as f:
-        json.dump(events, f, indent=2, ensure_ascii=False)
 
-    with open(attendees_path, "w", encoding="utf-8") as f:
-        json.dump(attendees, f, indent=2, ensure_ascii=False)
+def writes_changes_only(base_dir: str) -> bool:
+    # the journal and sqlite backends write the changed records and never
+    # read the full lists when given the changes
+    return storage_mode(base_dir) in ("journal", "sqlite")
 
-    with open(registrations_path, "w", encoding="utf-8") as f:
-        json.dump(registrations, f, indent=2, ensure_ascii=False)
+
+def _keeps_unchanged_attendees(base_dir: str, config: dict) -> bool:
+    mode = storage_mode(base_dir, config)
+    if mode == "sharded":
+        import shards
+        return shards.exists(base_dir)
+    return mode in ("json", "journal", "sqlite")
+
+
+def save_changes(
+    base_dir: str,
+    events: list,
+    attendees: list,
+    registrations: list,
+    changes: list[tuple[str, dict]] | None,
+    config: dict | None = None,
+) -> None:
+    # changes=None means "unknown", so backends that write deltas fall back
+    # to writing everything. config is the already loaded config.json, if
+    # the caller has it.
+    if config is None:
+        config = load_config(base_dir)
+    mode = storage_mode(base_dir, config)
+
+    if mode == "sqlite":
+        import sqlite_store
+        if changes is None:
+            sqlite_store.save_all(base_dir, events, attendees, registrations)
+        else:
+            sqlite_store.save_changes(base_dir, changes)
+        return
+
+    if mode == "snapshot":
+        import snapshot
+        snapshot.write(base_dir, events, attendees, registrations)
+        return
+
+    if mode == "sharded":
+        import shards
+        shards.save_changes(base_dir, events, attendees, registrations, changes)
+        return
+
+    if mode == "journal":
+        import journal
+        if changes is None:
+            changes = (
+                [("event", e) for e in events]
+                + [("attendee", a) for a in attendees]
+                + [("registration", r) for r in registrations]
+            )
+        journal.append(base_dir, changes, config)
+        journal.maybe_compact(base_dir, config)
+        return
+
+    write_snapshot(base_dir, events, attendees, registrations)
 
 
 def backup_state(base_dir: str, backup_dir: str) -> list[str]:
+    import shutil
+
     os.makedirs(backup_dir, exist_ok=True)
     ddir = _data_dir(base_dir)
 
     from datetime import datetime
     stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
 
+    names = ["events.json", "attendees.json", "registrations.json", "state.snap"]
+    if os.path.isdir(ddir):
+        names += sorted(n for n in os.listdir(ddir) if n.startswith("journal") and n.endswith(".log"))
+
     created: list[str] = []
-    for name in ("events.json", "attendees.json", "registrations.json"):
+    if storage_mode(base_dir) == "sqlite":
+        import sqlite_store
+        dest = os.path.join(backup_dir, f"{stamp}-{sqlite_store.DB_NAME}")
+        created.append(sqlite_store.backup(base_dir, dest))
+
+    for name in names:
         src = os.path.join(ddir, name)
         if os.path.exists(src):
             dest = os.path.join(backup_dir, f"{stamp}-{name}")
             shutil.copy2(src, dest)
             created.append(dest)
+
+    src = os.path.join(ddir, "shards")
+    if os.path.isdir(src):
+        dest = os.path.join(backup_dir, f"{stamp}-shards")
+        shutil.copytree(src, dest, dirs_exist_ok=True)
+        created.append(dest)
     return created
 
 
@@ -82,7 +402,7 @@ def validate_registration(registration: dict) -> bool:
         "status",
         "created_at",
     }
-    if not isinstance(registration, dict):
+    if not isinstance(registration, Mapping):
         return False
     if not required_keys.issubset(registration.keys()):
         return False
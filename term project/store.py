@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+from cache import ResultCache
+from directory import AttendeeDirectory
+from schedule import Schedule
+from seats import SeatMap
+from waitlist import Waitlist
+
+
+class Store:
+    def __init__(
+        self,
+        events: list | None = None,
+        attendees=None,
+        registrations: list | None = None,
+    ) -> None:
+        self.events = [] if events is None else events
+        # attendees may also be a zero-argument loader, called on first use
+        # so a staff desk that never looks at profiles never reads them
+        self._attendees_loader = attendees if callable(attendees) else None
+        self._attendees = None if callable(attendees) else [] if attendees is None else attendees
+        self.registrations = [] if registrations is None else registrations
+        self._dirty: dict[tuple[str, str], dict] = {}
+        self._listeners: list = []
+        # Per-event locks guard each event's counters, waitlist and seats;
+        # per-attendee locks guard checks that span an attendee's events
+        # (session overlaps); the index lock guards id allocation and the
+        # indexes shared by all events. Take an event lock, then an attendee
+        # lock, then the index lock, never the other way round.
+        self._event_locks: dict[str, threading.RLock] = {}
+        self._attendee_locks: dict[str, threading.RLock] = {}
+        self._index_lock = threading.RLock()
+        self._dirty_lock = threading.Lock()
+        # Data generations for cached results (see cache.py): touch() bumps
+        # the global one and stamps the changed event with it, so an event's
+        # generation only moves when that event or one of its registrations
+        # changes. Both are drawn from one counter and never repeat.
+        self._generation = 0
+        self._event_generations: dict[str, int] = {}
+        self.results = ResultCache()
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        with self._dirty_lock:
+            self._generation += 1
+            self._rebuilt_at = self._generation
+            self._event_generations = {}
+        # first match wins, like the linear scans these indexes replace
+        self._events_by_id: dict[str, dict] = {}
+        for e in self.events:
+            self._events_by_id.setdefault(e.get("id"), e)
+        self._schedule: Schedule | None = None
+
+        self._attendees_by_id: dict[str, dict] | None = None
+        self._directory: AttendeeDirectory | None = None
+
+        self._registrations_by_id: dict[str, dict] = {}
+        self._registrations_by_code: dict[str, dict] = {}
+        self._registrations_by_attendee: dict[str, dict[str, dict]] = {}
+        self._counters: dict[str, dict] = {}
+        self._waitlists: dict[str, Waitlist] = {}
+        self._seat_maps: dict[str, SeatMap] = {}
+        # per (event id, session id): active registrations by id, counters and
+        # the queue of registrations waiting for a place in the session
+        self._session_rosters: dict[tuple[str, str], dict[str, dict]] = {}
+        self._session_counters: dict[tuple[str, str], dict] = {}
+        self._session_waitlists: dict[tuple[str, str], Waitlist] = {}
+        for listener in self._listeners:
+            listener.reset()
+        for r in self.registrations:
+            self._index_registration(r)
+            self._account(r)
+
+    # events
+
+    def event_ids(self):
+        return self._events_by_id.keys()
+
+    def get_event(self, event_id: str) -> dict | None:
+        return self._events_by_id.get(event_id)
+
+    def find_event(self, event_id: str) -> dict:
+        event = self._events_by_id.get(event_id)
+        if event is None:
+            raise ValueError(f"Event with id '{event_id}' not found.")
+        return event
+
+    def add_event(self, event: dict) -> dict:
+        with self._index_lock:
+            if event.get("id") in self._events_by_id:
+                raise ValueError(f"Event id '{event.get('id')}' already exists.")
+            self.events.append(event)
+            self._events_by_id[event.get("id")] = event
+        self.touch("event", event)
+        return event
+
+    def schedule(self) -> Schedule:
+        # room and session time indexes, built on first use
+        if self._schedule is None:
+            with self._index_lock:
+                if self._schedule is None:
+                    self._schedule = Schedule(self.events)
+        return self._schedule
+
+    def event_lock(self, event_id: str) -> threading.RLock:
+        lock = self._event_locks.get(event_id)
+        if lock is None:
+            with self._index_lock:
+                lock = self._event_locks.setdefault(event_id, threading.RLock())
+        return lock
+
+    # attendees
+
+    def attendee_lock(self, attendee_id: str) -> threading.RLock:
+        lock = self._attendee_locks.get(attendee_id)
+        if lock is None:
+            with self._index_lock:
+                lock = self._attendee_locks.setdefault(attendee_id, threading.RLock())
+        return lock
+
+    def _attendee_index(self) -> dict[str, dict]:
+        if self._attendees_by_id is None:
+            with self._index_lock:
+                if self._attendees is None:
+                    self._attendees = self._attendees_loader()
+                if self._attendees_by_id is None:
+                    index: dict[str, dict] = {}
+                    for a in self._attendees:
+                        index.setdefault(a.get("id"), a)
+                    self._attendees_by_id = index
+        return self._attendees_by_id
+
+    @property
+    def attendees(self) -> list:
+        self._attendee_index()
+        return self._attendees
+
+    def loaded_attendees(self) -> list | None:
+        # the attendee list if it has been read, without reading it
+        return self._attendees
+
+    def attendee_ids(self):
+        return self._attendee_index().keys()
+
+    def get_attendee(self, attendee_id: str) -> dict | None:
+        return self._attendee_index().get(attendee_id)
+
+    def add_attendee(self, attendee: dict) -> dict:
+        with self._index_lock:
+            index = self._attendee_index()
+            self._attendees.append(attendee)
+            index.setdefault(attendee.get("id"), attendee)
+            if self._directory is not None:
+                self._directory.add(attendee)
+        self.touch("attendee", attendee)
+        return attendee
+
+    def directory(self) -> AttendeeDirectory:
+        # built on first use: email lookups, then prefix search on demand
+        if self._directory is None:
+            with self._index_lock:
+                if self._directory is None:
+                    self._directory = AttendeeDirectory(self.attendees)
+        return self._directory
+
+    @contextmanager
+    def updating_attendee(self, attendee: dict):
+        with self._index_lock:
+            if self._directory is not None:
+                self._directory.remove(attendee)
+            try:
+                yield attendee
+            finally:
+                if self._directory is not None:
+                    self._directory.add(attendee)
+                self.touch("attendee", attendee)
+
+    # registrations
+
+    def registration_ids(self):
+        return self._registrations_by_id.keys()
+
+    def get_registration(self, registration_id: str) -> dict | None:
+        return self._registrations_by_id.get(registration_id)
+
+    def find_registration(self, key: str) -> dict | None:
+        r = self._registrations_by_id.get(key)
+        if r is None:
+            r = self._registrations_by_code.get(key)
+        return r
+
+    def registrations_for_attendee(self, attendee_id: str) -> list:
+        return list(self._registrations_by_attendee.get(attendee_id, {}).values())
+
+    def add_registration(self, registration: dict) -> dict:
+        # Callers hold the registration's event lock.
+        with self._index_lock:
+            if registration.get("id") in self._registrations_by_id:
+                raise ValueError(f"Registration id '{registration.get('id')}' already exists.")
+            self.registrations.append(registration)
+            self._index_registration(registration)
+        self._account(registration)
+        self.touch("registration", registration)
+        return registration
+
+    @contextmanager
+    def updating(self, registration: dict):
+        # Every in-place change to a registration goes through here so the
+        # attendee index and the per-event counters never drift. Callers hold
+        # the registration's event lock.
+        self._unaccount(registration)
+        with self._index_lock:
+            self._unindex_attendee(registration)
+        try:
+            yield registration
+        finally:
+            with self._index_lock:
+                self._registrations_by_attendee.setdefault(registration.get("attendee_id"), {})[
+                    registration.get("id")
+                ] = registration
+            self._account(registration)
+            self.touch("registration", registration)
+
+    # Listeners get apply(registration, delta) with delta=+1 when a
+    # registration is added or has just changed and delta=-1 right before it
+    # changes, so they can keep derived figures up to date with small deltas.
+
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+        for r in self.registrations:
+            listener.apply(r, 1)
+
+    def remove_listener(self, listener) -> None:
+        self._listeners.remove(listener)
+
+    # change tracking, consumed by storage.save_state
+
+    def touch(self, kind: str, record: dict) -> None:
+        with self._dirty_lock:
+            self._dirty[(kind, record.get("id"))] = record
+            self._generation += 1
+            if kind == "registration":
+                self._event_generations[record.get("event_id")] = self._generation
+            elif kind == "event":
+                self._event_generations[record.get("id")] = self._generation
+
+    def generation(self, event_id: str | None = None) -> int:
+        if event_id is None:
+            return self._generation
+        return self._event_generations.get(event_id, self._rebuilt_at)
+
+    def take_dirty(self) -> list[tuple[str, dict]]:
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, {}
+        return [(kind, record) for (kind, _), record in dirty.items()]
+
+    def event_counters(self, event_id: str) -> dict:
+        counts = self._counters.get(event_id)
+        if counts is None:
+            counts = self._counters.setdefault(
+                event_id,
+                {
+                    "confirmed": 0,
+                    "checked_in": 0,
+                    "waitlisted": 0,
+                    "next_waitlist_position": 1,
+                },
+            )
+        return counts
+
+    def waitlist(self, event_id: str) -> Waitlist:
+        wl = self._waitlists.get(event_id)
+        if wl is None:
+            wl = self._waitlists.setdefault(event_id, Waitlist())
+        return wl
+
+    def session_roster(self, event_id: str, session_id: str) -> dict[str, dict]:
+        return self._session_rosters.get((event_id, session_id), {})
+
+    def session_counters(self, event_id: str, session_id: str) -> dict:
+        key = (event_id, session_id)
+        counts = self._session_counters.get(key)
+        if counts is None:
+            counts = self._session_counters.setdefault(key, {"checked_in": 0, "next_waitlist_position": 1})
+        return counts
+
+    def session_waitlist(self, event_id: str, session_id: str) -> Waitlist:
+        key = (event_id, session_id)
+        wl = self._session_waitlists.get(key)
+        if wl is None:
+            wl = self._session_waitlists.setdefault(key, Waitlist())
+        return wl
+
+    def seats(self, event_id: str) -> SeatMap:
+        seats = self._seat_maps.get(event_id)
+        if seats is None:
+            event = self._events_by_id.get(event_id) or {}
+            seats = self._seat_maps.setdefault(event_id, SeatMap(event.get("reserved_seats")))
+        return seats
+
+    def _index_registration(self, r: dict) -> None:
+        self._registrations_by_id.setdefault(r.get("id"), r)
+        code = r.get("confirmation_code")
+        if code:
+            self._registrations_by_code.setdefault(code, r)
+        self._registrations_by_attendee.setdefault(r.get("attendee_id"), {}).setdefault(r.get("id"), r)
+
+    def _unindex_attendee(self, r: dict) -> None:
+        regs = self._registrations_by_attendee.get(r.get("attendee_id"))
+        if regs is not None:
+            regs.pop(r.get("id"), None)
+            if not regs:
+                del self._registrations_by_attendee[r.get("attendee_id")]
+
+    def _account(self, r: dict, delta: int = 1) -> None:
+        status = r.get("status")
+        counts = self.event_counters(r.get("event_id"))
+        if status in {"confirmed", "checked-in"}:
+            counts["confirmed"] += delta
+            if status == "checked-in":
+                counts["checked_in"] += delta
+            seat = r.get("seat_number")
+            if isinstance(seat, int) and seat > 0:
+                if delta > 0:
+                    self.seats(r.get("event_id")).hold(seat)
+                else:
+                    self.seats(r.get("event_id")).release(seat)
+            if r.get("sessions") or r.get("session_waitlist"):
+                self._account_sessions(r, status, delta)
+        elif status == "waitlisted":
+            counts["waitlisted"] += delta
+            if delta > 0:
+                pos = r.get("waitlist_position") or 0
+                if pos >= counts["next_waitlist_position"]:
+                    counts["next_waitlist_position"] = pos + 1
+                self.waitlist(r.get("event_id")).add(r)
+            else:
+                self.waitlist(r.get("event_id")).remove(r.get("id"))
+        for listener in self._listeners:
+            listener.apply(r, delta)
+
+    def _account_sessions(self, r: dict, status: str, delta: int) -> None:
+        # only confirmed and checked-in registrations hold or wait for a place
+        eid, rid = r.get("event_id"), r.get("id")
+        for sid in r.get("sessions") or ():
+            key = (eid, sid)
+            if delta > 0:
+                self._session_rosters.setdefault(key, {})[rid] = r
+            else:
+                roster = self._session_rosters.get(key, {})
+                roster.pop(rid, None)
+                if not roster:
+                    self._session_rosters.pop(key, None)
+            if status == "checked-in":
+                self.session_counters(eid, sid)["checked_in"] += delta
+        for sid, pos in (r.get("session_waitlist") or {}).items():
+            if delta > 0:
+                counts = self.session_counters(eid, sid)
+                if pos >= counts["next_waitlist_position"]:
+                    counts["next_waitlist_position"] = pos + 1
+                self.session_waitlist(eid, sid).add(r, pos)
+            else:
+                self.session_waitlist(eid, sid).remove(rid)
+
+    def _unaccount(self, r: dict) -> None:
+        self._account(r, -1)
+
+
+def ensure_store(
+    store: Store | None,
+    events: list | None = None,
+    attendees: list | None = None,
+    registrations: list | None = None,
+) -> Store:
+    # Callers that still pass bare lists get a throwaway index built in one
+    # pass, which costs the same as the scan it replaces.
+    if store is not None:
+        return store
+    return Store(events, attendees, registrations)
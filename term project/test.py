@@ -1,9 +1,11 @@
 import os
 import tempfile
 
+import checkin
 import events
 import registration as reg_mod
 import storage
+from store import Store
 
 
 def test_capacity_and_waitlist():
@@ -50,3 +52,1367 @@ def test_capacity_and_waitlist():
         assert promoted is not None
         assert promoted["id"] == r2["id"]
         assert promoted["status"] == "confirmed"
+
+
+def test_store_indexes_follow_mutations():
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {
+            "name": "IndexConf",
+            "location": "X",
+            "start_date": "2030-01-01",
+            "end_date": "2030-01-02",
+            "capacity": 5,
+            "price": 10.0,
+        },
+        store,
+    )
+    assert store.find_event(e["id"]) is e
+    r = reg_mod.create_registration(
+        store.registrations,
+        {
+            "event_id": e["id"],
+            "attendee_id": "A1",
+            "ticket_type": "General",
+            "payment_method": "Card",
+        },
+        store.events,
+        store,
+    )
+    assert store.get_registration(r["id"]) is r
+    assert store.find_registration(r["confirmation_code"]) is r
+
+    checked = checkin.check_in_attendee(store.registrations, r["confirmation_code"], store)
+    assert checked is r and r["status"] == "checked-in"
+
+    reg_mod.transfer_ticket(store.registrations, r["id"], "A2", store)
+    assert store.registrations_for_attendee("A1") == []
+    assert store.registrations_for_attendee("A2") == [r]
+
+    reg_mod.cancel_registration(store.registrations, r["id"], store.events, store)
+    assert store.get_registration(r["id"])["status"] == "cancelled"
+
+
+def test_event_counters_match_rebuild():
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {
+            "name": "CountConf",
+            "location": "X",
+            "start_date": "2030-01-01",
+            "end_date": "2030-01-02",
+            "capacity": 2,
+            "price": 10.0,
+        },
+        store,
+    )
+    regs = [
+        reg_mod.create_registration(
+            store.registrations,
+            {
+                "event_id": e["id"],
+                "attendee_id": f"A{i}",
+                "ticket_type": "General",
+                "payment_method": "Card",
+            },
+            store.events,
+            store,
+        )
+        for i in range(5)
+    ]
+    assert [r["status"] for r in regs].count("waitlisted") == 3
+    checkin.check_in_attendee(store.registrations, regs[0]["id"], store)
+    reg_mod.cancel_registration(store.registrations, regs[1]["id"], store.events, store)
+    promoted = reg_mod.promote_waitlist(store.registrations, e["id"], store)
+    assert promoted["id"] == regs[2]["id"]
+    assert promoted["seat_number"] == 2
+
+    counts = store.event_counters(e["id"])
+    assert counts["confirmed"] == 2
+    assert counts["checked_in"] == 1
+    assert counts["waitlisted"] == 2
+    assert Store(store.events, [], store.registrations).event_counters(e["id"]) == counts
+
+
+def test_waitlist_positions_are_computed_on_demand():
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {
+            "name": "QueueConf",
+            "location": "X",
+            "start_date": "2030-01-01",
+            "end_date": "2030-01-02",
+            "capacity": 1,
+            "price": 10.0,
+        },
+        store,
+    )
+    regs = [
+        reg_mod.create_registration(
+            store.registrations,
+            {
+                "event_id": e["id"],
+                "attendee_id": f"A{i}",
+                "ticket_type": "General",
+                "payment_method": "Card",
+            },
+            store.events,
+            store,
+        )
+        for i in range(5)
+    ]
+    assert [reg_mod.waitlist_position(r, store) for r in regs] == [None, 1, 2, 3, 4]
+
+    reg_mod.cancel_registration(store.registrations, regs[2]["id"], store.events, store)
+    assert [reg_mod.waitlist_position(r, store) for r in regs[3:]] == [2, 3]
+
+    reg_mod.cancel_registration(store.registrations, regs[0]["id"], store.events, store)
+    promoted = reg_mod.promote_waitlist(store.registrations, e["id"], store)
+    assert promoted["id"] == regs[1]["id"]
+    assert [reg_mod.waitlist_position(r, store) for r in regs[3:]] == [1, 2]
+
+    # a store rebuilt from the saved records agrees with the live one
+    reloaded = Store(store.events, [], store.registrations)
+    assert [reg_mod.waitlist_position(r, reloaded) for r in regs[3:]] == [1, 2]
+    assert reg_mod.promote_waitlist(store.registrations, e["id"])["id"] == regs[3]["id"]
+
+
+def test_journal_mode_replays_and_compacts(monkeypatch):
+    import journal
+
+    monkeypatch.setenv("EVENT_STORAGE", "journal")
+    with tempfile.TemporaryDirectory() as base:
+        store = Store()
+        e = events.create_event(
+            store.events,
+            {
+                "name": "LogConf",
+                "location": "X",
+                "start_date": "2030-01-01",
+                "end_date": "2030-01-02",
+                "capacity": 5,
+                "price": 10.0,
+            },
+            store,
+        )
+        r = reg_mod.create_registration(
+            store.registrations,
+            {
+                "event_id": e["id"],
+                "attendee_id": "A1",
+                "ticket_type": "General",
+                "payment_method": "Card",
+            },
+            store.events,
+            store,
+        )
+        storage.save_state(base, store.events, store.attendees, store.registrations, store)
+        checkin.check_in_attendee(store.registrations, r["id"], store)
+        storage.save_state(base, store.events, store.attendees, store.registrations, store)
+
+        data_dir = os.path.join(base, "data")
+        assert not os.path.exists(os.path.join(data_dir, "registrations.json"))
+        with open(os.path.join(data_dir, "journal.log"), encoding="utf-8") as f:
+            assert len(f.read().splitlines()) == 3
+
+        _, _, regs = storage.load_state(base)
+        assert [x["status"] for x in regs] == ["checked-in"]
+
+        journal.compact(base, background=False)
+        assert not os.path.exists(os.path.join(data_dir, "journal.log"))
+        assert storage.load_state(base) == (store.events, store.attendees, store.registrations)
+
+
+def test_config_is_parsed_once_per_version(monkeypatch):
+    import json
+
+    monkeypatch.delenv("EVENT_STORAGE", raising=False)
+    parsed = []
+    load = json.load
+    monkeypatch.setattr(json, "load", lambda f: parsed.append(f.name) or load(f))
+    with tempfile.TemporaryDirectory() as base:
+        path = os.path.join(base, "config.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"storage": "journal", "journal_fsync": true}')
+        store = Store()
+        e = events.create_event(
+            store.events,
+            {
+                "name": "CfgConf",
+                "location": "X",
+                "start_date": "2030-01-01",
+                "end_date": "2030-01-02",
+                "capacity": 5,
+                "price": 10.0,
+            },
+            store,
+        )
+        for capacity in (6, 7, 8):
+            events.update_event(store.events, e["id"], {"capacity": capacity}, store)
+            storage.save_state(base, store.events, None, store.registrations, store)
+        assert parsed.count(path) == 1
+        assert [x["capacity"] for x in storage.load_state(base)[0]] == [8]
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"storage": "json", "journal_fsync": false}')
+        os.utime(path, ns=(0, 0))
+        assert storage.storage_mode(base) == "json"
+        assert parsed.count(path) == 2
+
+
+def test_sqlite_mode_round_trip(monkeypatch):
+    import sqlite_store
+
+    with tempfile.TemporaryDirectory() as base:
+        store = Store()
+        e = events.create_event(
+            store.events,
+            {
+                "name": "SqlConf",
+                "location": "X",
+                "start_date": "2030-01-01",
+                "end_date": "2030-01-02",
+                "capacity": 5,
+                "price": 10.0,
+            },
+            store,
+        )
+        events.add_session(store.events, e["id"], {"title": "Intro", "speaker": "S", "room": "R1", "capacity": 3}, store)
+        r = reg_mod.create_registration(
+            store.registrations,
+            {
+                "event_id": e["id"],
+                "attendee_id": "A1",
+                "ticket_type": "General",
+                "payment_method": "Card",
+            },
+            store.events,
+            store,
+        )
+        storage.save_state(base, store.events, store.attendees, store.registrations, store)
+
+        monkeypatch.setenv("EVENT_STORAGE", "sqlite")
+        assert sqlite_store.migrate(base) == (1, 0, 1)
+        checkin.check_in_attendee(store.registrations, r["id"], store)
+        storage.save_state(base, store.events, store.attendees, store.registrations, store)
+        sqlite_store.close(base)
+
+        assert storage.load_state(base) == (store.events, store.attendees, store.registrations)
+        sqlite_store.close(base)
+
+
+def test_snapshot_round_trip_preserves_records():
+    import snapshot
+
+    regs = [
+        {
+            "id": f"R{i}",
+            "event_id": "E1" if i % 3 else "E2",
+            "status": "confirmed",
+            "seat_number": i,
+            "sessions": [],
+            "price": 10.0 if i % 2 else 10,
+            "checkin_timestamp": None,
+        }
+        for i in range(40)
+    ]
+    regs[5]["note"] = "late"
+    del regs[7]["sessions"]
+    evts = [{"id": "E1", "name": "One", "sessions": [{"id": "S1", "title": "T"}]}]
+    attendees_list = [{"id": "A1", "email": "a@x", "communication": {"email_opt_in": True}}]
+
+    loaded = snapshot.loads(snapshot.dumps(evts, attendees_list, regs))
+    assert loaded == (evts, attendees_list, regs)
+    assert [type(r["price"]) for r in loaded[2]] == [type(r["price"]) for r in regs]
+    assert list(loaded[2][5]) == list(regs[5])
+
+    with tempfile.TemporaryDirectory() as base:
+        snapshot.write(base, evts, attendees_list, regs)
+        snapshot.export_json(base)
+        assert storage.load_snapshot(base) == (evts, attendees_list, regs)
+
+
+def test_streaming_loader_and_integrity_check():
+    with tempfile.TemporaryDirectory() as base:
+        evts = [{"id": "E1", "name": "One", "sessions": []}]
+        regs = [
+            {
+                "id": f"R{i}",
+                "event_id": "E1" if i != 3 else "E9",
+                "attendee_id": "A1",
+                "ticket_type": "General",
+                "confirmation_code": f"C{i % 4}",
+                "payment_method": "Card",
+                "payment_status": "paid",
+                "status": "confirmed",
+                "created_at": "2030-01-01T00:00:00",
+            }
+            for i in range(6)
+        ]
+        regs.append({"id": "broken"})
+        storage.write_snapshot(base, evts, [], regs)
+
+        path = os.path.join(base, "data", "registrations.json")
+        assert list(storage.iter_json_array(path, chunk_size=16)) == regs
+
+        # items split at every possible chunk boundary, and arrays that are not JSON
+        import json
+        import random
+
+        rng = random.Random(5)
+        values = [12.5, 3.25e10, 7, -0.5, 1e-3, True, None, "a,]b", {"k": [1, 2.5]}, [], "é"]
+        tricky = os.path.join(base, "tricky.json")
+        for trial in range(40):
+            items = [rng.choice(values) for _ in range(rng.randrange(8))]
+            text = json.dumps(items, indent=rng.choice([None, 1]))
+            with open(tricky, "w", encoding="utf-8") as f:
+                f.write(text)
+            for size in range(1, 21):
+                assert list(storage.iter_json_array(tricky, chunk_size=size)) == items, (text, size)
+        for bad in ("[,1]", "[1 2]", "[1,]", "[1,,2]", "[1", "{}"):
+            with open(tricky, "w", encoding="utf-8") as f:
+                f.write(bad)
+            for size in (1, 3, 64):
+                try:
+                    list(storage.iter_json_array(tricky, chunk_size=size))
+                    assert False, f"{bad!r} accepted"
+                except ValueError:
+                    pass
+        assert events.load_events(os.path.join(base, "data", "events.json")) == evts
+
+        report = storage.check_integrity(base)
+        assert report["registrations"] == 7
+        assert report["invalid"] == ["broken"]
+        assert report["duplicate_codes"] == ["C0", "C1"]
+        assert report["unknown_event"] == ["R3"]
+
+
+def test_reports_share_one_aggregation_pass():
+    import reports
+
+    evts = [
+        {"id": "E1", "name": "One", "capacity": 3, "sessions": [{"id": "S1", "title": "Keynote"}]},
+        {"id": "E2", "name": "Two", "capacity": 1, "sessions": []},
+    ]
+    regs = [
+        {"event_id": "E1", "status": "confirmed", "payment_status": "paid", "price": 10.0, "sessions": ["S1"]},
+        {"event_id": "E1", "status": "checked-in", "payment_status": "paid", "price": 5.0, "sessions": ["S1", "S9"]},
+        {"event_id": "E1", "status": "cancelled", "payment_status": "no_refund", "price": 7.0, "sessions": ["S1"]},
+        {"event_id": "E2", "status": "waitlisted", "payment_status": "pending", "price": 3.0, "sessions": []},
+        {"event_id": "E3", "status": "confirmed", "payment_status": "paid", "price": 99.0, "sessions": []},
+    ]
+    agg = reports.aggregate(evts, iter(regs))
+
+    assert reports.attendance_report(evts, regs) == agg["attendance"]
+    assert agg["attendance"]["E1"] == {
+        "event_name": "One",
+        "capacity": 3,
+        "registered": 2,
+        "checked_in": 1,
+        "remaining": 1,
+    }
+    assert agg["attendance"]["E2"]["registered"] == 1
+    assert reports.revenue_report(evts, regs, agg) == {
+        "E1": {"event_name": "One", "revenue": 22.0},
+        "E2": {"event_name": "Two", "revenue": 0.0},
+    }
+    assert reports.session_popularity(evts, regs) == {
+        "E1": {
+            "S1": {"session_title": "Keynote", "registered": 2, "checked_in": 1},
+            "S9": {"session_title": "S9", "registered": 1, "checked_in": 1},
+        },
+        "E2": {},
+    }
+
+
+def test_live_report_views_match_recompute():
+    import random
+    import reports
+
+    rng = random.Random(3)
+    store = Store()
+    views = reports.ReportViews(store, verify=True)
+    evts = [
+        events.create_event(
+            store.events,
+            {
+                "name": f"Conf {i}",
+                "location": "X",
+                "start_date": "2030-01-01",
+                "end_date": "2030-01-02",
+                "capacity": 3,
+                "price": 19.99,
+            },
+            store,
+        )
+        for i in range(3)
+    ]
+    for e in evts:
+        events.add_session(
+        store.events, e["id"], {"id": "S1", "title": "Talk", "speaker": "S", "room": "R", "capacity": 9}, store)
+
+    for step in range(200):
+        op = rng.random()
+        live = [r for r in store.registrations if r["status"] != "cancelled"]
+        if op < 0.4 or not live:
+            e = rng.choice(evts)
+            reg_mod.create_registration(
+                store.registrations,
+                {
+                    "event_id": e["id"],
+                    "attendee_id": f"A{step}",
+                    "ticket_type": "General",
+                    "payment_method": "Card",
+                    "sessions": rng.choice([[], ["S1"], ["S1", "S2"]]),
+                },
+                store.events,
+                store,
+            )
+        elif op < 0.6:
+            r = rng.choice(live)
+            reg_mod.cancel_registration(store.registrations, r["id"], store.events, store)
+            reg_mod.promote_waitlist(store.registrations, r["event_id"], store)
+        elif op < 0.8:
+            r = rng.choice(live)
+            if r["status"] != "waitlisted":
+                checkin.check_in_attendee(store.registrations, r["confirmation_code"], store)
+        elif op < 0.9:
+            r = rng.choice(live)
+            if r["status"] != "waitlisted":
+                reg_mod.transfer_ticket(store.registrations, r["id"], f"B{step}", store)
+        else:
+            events.update_event(store.events, rng.choice(evts)["id"], {"capacity": rng.randint(1, 6)}, store)
+        views.verify()
+
+    assert views.attendance_report() == reports.attendance_report(store.events, store.registrations)
+    revenue = views.revenue_report()
+    assert revenue == reports.revenue_report(store.events, store.registrations)
+    for e in evts:
+        paid = sum(1 for r in store.registrations if r["event_id"] == e["id"] and r.get("payment_status") in reports.PAID_STATUSES)
+        assert revenue[e["id"]]["revenue"] == paid * 1999 / 100
+
+
+def test_bulk_import_allocates_per_event_and_reports_row_errors():
+    import bulk_import
+
+    with tempfile.TemporaryDirectory() as base:
+        store = Store()
+        e = events.create_event(
+            store.events,
+            {
+                "name": "BulkConf",
+                "location": "X",
+                "start_date": "2030-01-01",
+                "end_date": "2030-01-02",
+                "capacity": 2,
+                "price": 10.0,
+            },
+            store,
+        )
+        reg_mod.create_registration(
+            store.registrations,
+            {"event_id": e["id"], "attendee_id": "A0", "ticket_type": "General", "payment_method": "Card"},
+            store.events,
+            store,
+        )
+        storage.save_state(base, store.events, store.attendees, store.registrations, store)
+
+        path = os.path.join(base, "rows.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("event_id,attendee_id,ticket_type,payment_method,price,sessions\n")
+            f.write(f"{e['id']},A1,General,Card,,S1;S2\n")
+            f.write(f"{e['id']},A2,VIP,Card,25,\n")
+            f.write("missing,A3,General,Card,,\n")
+            f.write(f"{e['id']},A4,General,Card,abc,\n")
+            f.write(f"{e['id']},A5,General,,,\n")
+            f.write(f"{e['id']},A6,General,Card,,\n")
+
+        assert bulk_import.main([path, "--base-dir", base]) == 1
+        _, _, regs = storage.load_state(base)
+        imported = {r["attendee_id"]: r for r in regs}
+        assert imported["A1"]["seat_number"] == 2 and imported["A1"]["sessions"] == ["S1", "S2"]
+        assert imported["A2"]["status"] == "waitlisted" and imported["A2"]["price"] == 25.0
+        assert imported["A6"]["waitlist_position"] == imported["A2"]["waitlist_position"] + 1
+        assert {"A3", "A4", "A5"}.isdisjoint(imported)
+
+        result = bulk_import.import_registrations(Store(*storage.load_state(base)), bulk_import.read_rows(path))
+        assert [n for n, _ in result["errors"]] == [3, 4, 5]
+
+        # in JSONL each bad line is one row error, whatever is wrong with it
+        import json
+
+        good = {"event_id": e["id"], "attendee_id": "J1", "ticket_type": "General", "payment_method": "Card"}
+        path = os.path.join(base, "rows.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(good) + "\n\n")
+            f.write('{"event_id": "\n')
+            f.write("[1, 2]\n")
+            f.write(json.dumps(dict(good, attendee_id=5, sessions=["S1"])) + "\n")
+            f.write(json.dumps(dict(good, attendee_id="J2", sessions=[["S1"]])) + "\n")
+            f.write(json.dumps(dict(good, attendee_id="J3")) + "\n")
+        rows = bulk_import.read_rows(path)
+        result = bulk_import.import_registrations(Store(*storage.load_state(base)), rows, dry_run=True)
+        assert [n for n, _ in result["errors"]] == [2, 3, 4, 5]
+        assert "line 3" in result["errors"][0][1].lower() and len(result["created"]) == 2
+
+
+def test_checkin_service_never_checks_in_twice():
+    import asyncio
+    import checkin_service
+
+    result = asyncio.run(checkin_service.load_test(desks=4, registrations=300, duplicates=0.5))
+    assert result["checked_in"] == 300
+    assert result["rejected"] == 150
+    assert result["double_check_ins"] == 0
+
+    # the worker thread writes copies, never the records desks keep changing
+    import datagen
+
+    written = []
+    store = Store(*datagen.generate(50))
+    r = next(x for x in store.registrations if x["status"] == "confirmed")
+    with tempfile.TemporaryDirectory() as base:
+        with open(os.path.join(base, "config.json"), "w", encoding="utf-8") as f:
+            f.write('{"storage": "journal"}')
+        service = checkin_service.CheckinService(store, base)
+        store.take_dirty()
+        asyncio.run(service.check_in(r["confirmation_code"]))
+        save = storage.save_changes
+        storage.save_changes = lambda *args: written.append(args[-1]) or save(*args)
+        try:
+            asyncio.run(service.flush())
+        finally:
+            storage.save_changes = save
+    [[(kind, saved)]] = written
+    assert saved == r and saved is not r
+
+
+def test_concurrent_registrations_never_oversell():
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = Store()
+    eids = [
+        events.create_event(
+            store.events,
+            {
+                "name": f"Rush{i}",
+                "location": "X",
+                "start_date": "2030-01-01",
+                "end_date": "2030-01-02",
+                "capacity": 25,
+                "price": 10.0,
+            },
+            store,
+        )["id"]
+        for i in range(4)
+    ]
+
+    def register(n):
+        r = reg_mod.create_registration(
+            store.registrations,
+            {
+                "event_id": eids[n % len(eids)],
+                "attendee_id": f"A{n}",
+                "ticket_type": "General",
+                "payment_method": "Card",
+            },
+            store.events,
+            store,
+        )
+        if r["status"] == "confirmed" and n % 3 == 0:
+            checkin.check_in_attendee(store.registrations, r["confirmation_code"], store)
+        return r
+
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            created = list(pool.map(register, range(400)))
+    finally:
+        sys.setswitchinterval(old)
+
+    assert len({r["id"] for r in created}) == 400
+    for eid in eids:
+        mine = [r for r in created if r["event_id"] == eid]
+        seated = sorted(r["seat_number"] for r in mine if r["status"] != "waitlisted")
+        assert seated == list(range(1, 26))
+        positions = sorted(r["waitlist_position"] for r in mine if r["status"] == "waitlisted")
+        assert positions == list(range(1, 76))
+        assert Store(store.events, [], store.registrations).event_counters(eid) == store.event_counters(eid)
+
+    # bulk imports racing single registrations for one event
+    import bulk_import
+
+    eid = events.create_event(
+        store.events,
+        {"name": "RushBulk", "location": "X", "start_date": "2030-01-01", "end_date": "2030-01-02", "capacity": 40, "price": 0},
+        store,
+    )["id"]
+    rows = [{"event_id": eid, "attendee_id": f"B{i}", "ticket_type": "General", "payment_method": "Card"} for i in range(5)]
+
+    def single(n):
+        data = {"event_id": eid, "attendee_id": f"C{n}", "ticket_type": "General", "payment_method": "Card"}
+        return reg_mod.create_registration(store.registrations, data, store.events, store)
+
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            jobs = [pool.submit(bulk_import.import_registrations, store, rows) for _ in range(12)]
+            jobs += [pool.submit(single, n) for n in range(60)]
+            for job in jobs:
+                job.result()
+    finally:
+        sys.setswitchinterval(old)
+    mine = [r for r in store.registrations if r["event_id"] == eid]
+    assert sorted(r["seat_number"] for r in mine if r["status"] != "waitlisted") == list(range(1, 41))
+    assert sorted(r["waitlist_position"] for r in mine if r["status"] == "waitlisted") == list(range(1, 81))
+
+
+def test_sharded_mode_rewrites_only_changed_events(monkeypatch):
+    import datagen
+    import reports
+    import shards
+
+    monkeypatch.setenv("EVENT_STORAGE", "sharded")
+    with tempfile.TemporaryDirectory() as base:
+        store = Store(*datagen.generate(60))
+        storage.save_state(base, store.events, store.attendees, store.registrations)
+        paths = {e["id"]: shards.shard_path(base, e["id"]) for e in store.events}
+        before = {eid: os.stat(p).st_mtime_ns for eid, p in paths.items()}
+
+        r = next(x for x in store.registrations if x["status"] == "confirmed")
+        checkin.check_in_attendee(store.registrations, r["id"], store)
+        os.utime(paths[r["event_id"]], ns=(0, 0))
+        storage.save_state(base, store.events, store.attendees, store.registrations, store)
+        after = {eid: os.stat(p).st_mtime_ns for eid, p in paths.items()}
+        assert after[r["event_id"]] != 0
+        assert all(after[eid] == before[eid] for eid in paths if eid != r["event_id"])
+
+        events_, attendees_, regs = storage.load_state(base)
+        assert (events_, attendees_) == (store.events, store.attendees)
+        assert sorted(regs, key=lambda x: x["id"]) == sorted(store.registrations, key=lambda x: x["id"])
+        assert shards.aggregate(base, workers=2) == reports.aggregate(store.events, store.registrations)
+        result = storage.check_integrity(base)
+        assert result["registrations"] == 60
+        assert not (result["invalid"] or result["duplicate_ids"] or result["unknown_event"])
+
+
+def test_badge_batch_matches_single_badges_and_resolves_titles():
+    import zipfile
+    import badges
+
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {
+            "name": "PrintConf",
+            "location": "X",
+            "start_date": "2030-01-01",
+            "end_date": "2030-01-02",
+            "capacity": 3,
+            "price": 10.0,
+        },
+        store,
+    )
+    events.add_session(
+        store.events, e["id"], {"id": "S1", "title": "Keynote", "speaker": "Ada", "room": "Hall", "capacity": 10}, store
+    )
+    for i in range(4):
+        store.add_attendee({"id": f"A{i}", "name": f"Name {3 - i}", "organization": "Org"})
+        reg_mod.create_registration(
+            store.registrations,
+            {
+                "event_id": e["id"],
+                "attendee_id": f"A{i}",
+                "ticket_type": "VIP" if i == 0 else "General",
+                "payment_method": "Card",
+                "sessions": ["S1", "S9"] if i == 0 else [],
+            },
+            store.events,
+            store,
+        )
+
+    with tempfile.TemporaryDirectory() as d:
+        plain = badges.render_all(store, badges.select(store, e["id"]), badges.BadgeTemplate(), workers=1)
+        titled = dict(badges.render_all(store, badges.select(store, e["id"]), workers=2, chunk_size=1))
+        # waitlisted A3 is left out, the rest are sorted by attendee name
+        assert [rid for rid, _ in plain] == [r["id"] for r in store.registrations[2::-1]]
+
+        first = store.registrations[0]
+        path = checkin.generate_badge(store.get_attendee("A0"), first, d)
+        with open(path, encoding="utf-8") as f:
+            single = f.read()
+        assert single.replace("Session ID: S1", "Keynote") == titled[first["id"]]
+        assert "  - Keynote\n  - Session ID: S9" in titled[first["id"]]
+
+        [zpath] = badges.generate_event_badges(store, e["id"], os.path.join(d, "out.zip"), ticket_type="General")
+        with zipfile.ZipFile(zpath) as zf:
+            assert sorted(zf.namelist()) == sorted(f"badge_{r['id']}.txt" for r in store.registrations[1:3])
+
+        chunks = badges.generate_event_badges(store, e["id"], os.path.join(d, "spool.txt"), fmt="printers", printers=2)
+        with open(chunks[0], encoding="utf-8") as f:
+            assert f.read().count(badges.PAGE_BREAK) == 1
+
+
+def test_datagen_is_deterministic_and_benchmarks_compare():
+    import benchmark
+    import datagen
+
+    data = datagen.generate("1k", seed=3)
+    assert data == datagen.generate("1k", seed=3)
+    events_, _, regs = data
+    store = Store(*data)
+    for e in events_:
+        mine = [r for r in regs if r["event_id"] == e["id"]]
+        assert store.event_counters(e["id"])["confirmed"] <= e["capacity"]
+        sids = {s["id"] for s in e["sessions"]}
+        assert all(set(r["sessions"]) <= sids for r in mine)
+        waiting = [r["waitlist_position"] for r in mine if r["status"] == "waitlisted"]
+        assert waiting == list(range(1, len(waiting) + 1))
+
+    result = benchmark.bench_hot_paths(200, repeat=1, ops=20)
+    assert {"create_registration", "promote_waitlist", "check_in_attendee", "save_state"} <= set(result["results"])
+    slower = {"results": {k: dict(v, seconds=v["seconds"] * 2) for k, v in result["results"].items()}}
+    assert all(row["regression"] for row in benchmark.compare(result, slower))
+    assert not any(row["regression"] for row in benchmark.compare(slower, result))
+
+
+def test_instrumentation_records_calls_and_save_bytes():
+    import instrument
+    import reports
+
+    instrument.reset()
+    instrument.enable()
+    try:
+        with tempfile.TemporaryDirectory() as base:
+            store = Store()
+            e = events.create_event(
+                store.events,
+                {
+                    "name": "TimedConf",
+                    "location": "X",
+                    "start_date": "2030-01-01",
+                    "end_date": "2030-01-02",
+                    "capacity": 5,
+                    "price": 10.0,
+                },
+                store,
+            )
+            for i in range(3):
+                reg_mod.create_registration(
+                    store.registrations,
+                    {"event_id": e["id"], "attendee_id": f"A{i}", "ticket_type": "General", "payment_method": "Card"},
+                    store.events,
+                    store,
+                )
+            views = reports.ReportViews(store)
+            views.attendance_report()
+            storage.save_state(base, store.events, store.attendees, store.registrations, store)
+            stats = instrument.stats()
+            assert stats["registration.create_registration"]["calls"] == 3
+            assert stats["reports.ReportViews.attendance_report"]["calls"] == 1
+            assert stats["storage.save_state"]["p99_ms"] >= stats["storage.save_state"]["p50_ms"] > 0
+            assert stats["storage.bytes_written"]["bytes"] == sum(
+                os.path.getsize(os.path.join(base, "data", f"{n}.json"))
+                for n in ("events", "attendees", "registrations")
+            )
+            out = reports.export_report(stats, os.path.join(base, "timings.csv"))
+            assert os.path.getsize(out) > 0
+            assert not hasattr(reports.ReportViews.apply, "__wrapped_by_instrument__")
+
+            # the journal counts what it appends, however quickly saves follow each other
+            import journal
+
+            instrument.reset()
+            sizes = [journal.append(base, [("registration", r)]) for r in store.registrations]
+            assert instrument.stats()["storage.bytes_written"]["bytes"] == sum(sizes) > 0
+    finally:
+        instrument.disable()
+        instrument.reset()
+    assert not hasattr(reg_mod.create_registration, "__wrapped_by_instrument__")
+    instrument.add_bytes(100)
+    assert instrument.stats()["storage.bytes_written"]["bytes"] == 0
+
+
+def test_attendee_directory_login_uniqueness_and_prefix_search():
+    import attendees
+
+    store = Store()
+    ann = attendees.register_attendee(
+        store.attendees, {"name": "Ann Marie Lee", "email": " Ann@Example.com", "organization": "Globex"}, store
+    )
+    bob = attendees.register_attendee(store.attendees, {"name": "Bob Leeds", "email": "bob@corp.io"}, store)
+    try:
+        attendees.register_attendee(store.attendees, {"name": "Dup", "email": "ANN@example.com "}, store)
+        assert False, "duplicate email accepted"
+    except ValueError:
+        pass
+
+    assert attendees.authenticate_attendee(store.attendees, " ann@EXAMPLE.com", ann["pin"], store) is ann
+    assert attendees.authenticate_attendee(store.attendees, "ann@example.com", "no-pin", store) is None
+    # plain lists still work through a throwaway store
+    assert attendees.authenticate_attendee(store.attendees, "bob@corp.io", bob["pin"]) is bob
+
+    def ids(query):
+        return sorted(a["id"] for a in attendees.search_attendees(store.attendees, query, store))
+
+    assert ids("lee") == sorted([ann["id"], bob["id"]])
+    assert ids("marie") == [ann["id"]]
+    assert ids("glob") == [ann["id"]]
+
+    attendees.update_attendee(store.attendees, bob["id"], {"email": "robert@corp.io", "name": "Robert Smith"}, store)
+    assert ids("lee") == [ann["id"]]
+    assert ids("robert@") == [bob["id"]]
+    assert attendees.authenticate_attendee(store.attendees, "bob@corp.io", bob["pin"], store) is None
+    try:
+        attendees.update_attendee(store.attendees, bob["id"], {"email": "ann@example.com"}, store)
+        assert False, "email taken by another attendee accepted"
+    except ValueError:
+        pass
+    carl = attendees.register_attendee(store.attendees, {"name": "Carl Lee", "email": "carl@x.org"}, store)
+    assert ids("lee") == sorted([ann["id"], carl["id"]])
+
+
+def test_door_manifest_lookup_side_file_and_merge():
+    import checkin_manifest
+
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {
+            "name": "DoorConf",
+            "location": "X",
+            "start_date": "2030-01-01",
+            "end_date": "2030-01-02",
+            "capacity": 4,
+            "price": 10.0,
+        },
+        store,
+    )
+    regs = []
+    for i in range(5):
+        store.add_attendee({"id": f"A{i}", "name": f"Zoë Ümlaut-Smith {i}" * 3})
+        regs.append(
+            reg_mod.create_registration(
+                store.registrations,
+                {"event_id": e["id"], "attendee_id": f"A{i}", "ticket_type": "General", "payment_method": "Card"},
+                store.events,
+                store,
+            )
+        )
+    checkin.check_in_attendee(store.registrations, regs[0]["id"], store)
+
+    with tempfile.TemporaryDirectory() as d:
+        path = checkin_manifest.compile_manifest(store, e["id"], os.path.join(d, "door.bin"))
+        with checkin_manifest.DoorManifest(path) as door, checkin_manifest.DoorManifest(path) as other_desk:
+            assert door.count == 5 and door.event_id == e["id"]
+            for r in regs:
+                entry = door.lookup(r["confirmation_code"])
+                assert entry["registration_id"] == r["id"]
+                assert entry["status"] == r["status"]
+                assert entry["seat_number"] == r["seat_number"]
+                assert entry["attendee_name"].startswith("Zoë Ümlaut")
+            assert door.lookup("NOPE") is None
+
+            door.check_in(regs[1]["confirmation_code"], "door-1")
+            for code, desk in ((regs[1]["confirmation_code"], other_desk), (regs[0]["confirmation_code"], door)):
+                try:
+                    desk.check_in(code)
+                    assert False, "checked in twice"
+                except ValueError as err:
+                    assert "Already checked in" in str(err)
+            try:
+                door.check_in(regs[4]["confirmation_code"])
+                assert False, "waitlisted ticket checked in"
+            except ValueError:
+                pass
+            other_desk.check_in(regs[2]["confirmation_code"], "door-2")
+
+            # the other desk scans the same ticket between this desk's lookup and its append
+            lookup = door.lookup
+
+            def racing_lookup(code):
+                entry = lookup(code)
+                other_desk.check_in(code, "door-2")
+                return entry
+
+            door.lookup = racing_lookup
+            try:
+                door.check_in(regs[3]["confirmation_code"], "door-1")
+                assert False, "both desks accepted the ticket"
+            except ValueError as err:
+                assert "Already checked in" in str(err)
+            door.lookup = lookup
+
+        store.take_dirty()
+        result = checkin_manifest.merge_checkins(store, path)
+        assert result == {"merged": 3, "skipped": 1}
+        assert [r["status"] for r in regs] == ["checked-in"] * 4 + ["waitlisted"]
+        assert store.event_counters(e["id"])["checked_in"] == 4
+        assert len(store.take_dirty()) == 3
+        assert checkin_manifest.merge_checkins(store, path) == {"merged": 0, "skipped": 0}
+
+
+def test_compact_records_behave_like_dicts_and_save_the_same_json(monkeypatch):
+    import json
+    import sys
+    import datagen
+    import records
+
+    _, _, regs = datagen.generate(200)
+    plain = json.loads(json.dumps(regs))
+    compact = records.compact_all(json.loads(json.dumps(regs)))
+    r, d = compact[0], plain[0]
+    assert r == d and d == r and list(r) == list(d) and dict(r) == d
+    assert r["status"] is sys.intern(d["status"]) and r.get("nope", 1) == 1 and "sessions" in r
+    r["note"] = "vip guest"
+    assert list(r)[-1] == "note" and r.pop("note") == "vip guest" and list(r) == list(d)
+    assert storage.validate_registration(r)
+
+    with tempfile.TemporaryDirectory() as base:
+        with open(os.path.join(base, "config.json"), "w", encoding="utf-8") as f:
+            json.dump({"compact_records": True}, f)
+        monkeypatch.delenv("EVENT_STORAGE", raising=False)
+        events_, attendees_, _ = datagen.generate(200)
+        storage.save_state(base, events_, attendees_, compact)
+        with open(os.path.join(base, "data", "registrations.json"), encoding="utf-8") as f:
+            assert json.load(f) == plain
+
+        events_, attendees_, loaded = storage.load_state(base)
+        assert all(isinstance(x, records.Registration) for x in loaded) and loaded == plain
+        store = Store(events_, attendees_, loaded)
+        victim = next(x for x in loaded if x["status"] == "confirmed")
+        before = dict(store.event_counters(victim["event_id"]))
+        checkin.check_in_attendee(store.registrations, victim["confirmation_code"], store)
+        assert store.event_counters(victim["event_id"]) == dict(before, checked_in=before["checked_in"] + 1)
+
+        monkeypatch.setenv("EVENT_STORAGE", "journal")
+        storage.save_state(base, store.events, store.attendees, store.registrations, store)
+        assert storage.load_state(base)[2] == store.registrations
+
+
+def test_lazy_state_reads_attendees_only_when_needed(monkeypatch):
+    import subprocess
+    import sys
+
+    import datagen
+
+    monkeypatch.delenv("EVENT_STORAGE", raising=False)
+    with tempfile.TemporaryDirectory() as base:
+        events_, attendees_, regs = datagen.generate(200)
+        storage.save_changes(base, events_, attendees_, regs, None)
+        people = os.path.join(base, "data", "attendees.json")
+        os.utime(people, ns=(0, 0))
+
+        state = storage.LazyState(base)
+        calls = []
+        store = Store(state.get("events"), lambda: calls.append(1) or state.get("attendees"), state.get("registrations"))
+        assert store.loaded_attendees() is None and not state.loaded("attendees")
+        r = next(x for x in store.registrations if x["status"] == "confirmed")
+        checkin.check_in_attendee(store.registrations, r["confirmation_code"], store)
+        storage.save_state(base, store.events, store.loaded_attendees(), store.registrations, store)
+        assert calls == [] and os.stat(people).st_mtime_ns == 0
+        assert storage.load_state(base) == (events_, attendees_, store.registrations)
+
+        assert store.get_attendee(r["attendee_id"])["id"] == r["attendee_id"]
+        assert len(store.attendees) == len(attendees_) and calls == [1]
+
+    # the role prompt should not wait for modules only some menus use
+    code = "import sys, main; print(sorted({'argparse', 'badges', 'csv', 'inspect', 'uuid'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(__file__))
+    assert out.stdout.strip() == "[]", out.stderr
+
+
+def test_seats_are_reused_reserved_and_rebuilt():
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {"name": "SeatConf", "location": "X", "start_date": "2030-01-01", "end_date": "2030-01-02", "capacity": 8, "price": 0},
+        store,
+    )
+
+    def register(aid, **extra):
+        data = {"event_id": e["id"], "attendee_id": aid, "ticket_type": "General", "payment_method": "Card", **extra}
+        return reg_mod.create_registration(store.registrations, data, store.events, store)
+
+    events.reserve_seats(store.events, e["id"], 2, 3, store)
+    regs = [register(f"A{i}") for i in range(4)]
+    assert [r["seat_number"] for r in regs] == [1, 4, 5, 6]
+    reg_mod.cancel_registration(store.registrations, regs[1]["id"], store.events, store)
+    reg_mod.cancel_registration(store.registrations, regs[0]["id"], store.events, store)
+    assert register("A4")["seat_number"] == 1 and register("A5")["seat_number"] == 4
+
+    # the sponsor gets a reserved seat explicitly; a held seat cannot be handed out twice
+    assert register("S1", seat_number=3)["seat_number"] == 3
+    try:
+        register("S2", seat_number=3)
+        assert False, "seat 3 is taken"
+    except ValueError as ex:
+        assert "taken" in str(ex)
+    assert events.reserve_seat_block(store.events, e["id"], 2, store) == [7, 8]
+    assert register("A6")["status"] == "waitlisted"
+
+    events.release_reserved_seats(store.events, e["id"], 2, 8, store)
+    assert e["reserved_seats"] == []
+    assert reg_mod.promote_waitlist(store.registrations, e["id"], store)["seat_number"] == 2
+
+    seated = [r["seat_number"] for r in store.registrations if r["status"] == "confirmed"]
+    assert len(seated) == len(set(seated))
+    rebuilt = Store(store.events, [], store.registrations)
+    assert rebuilt.seats(e["id"]).first_free(8) == store.seats(e["id"]).first_free(8) == 7
+
+
+def test_session_capacity_rosters_and_waitlists():
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {"name": "TrackConf", "location": "X", "start_date": "2030-01-01", "end_date": "2030-01-02", "capacity": 4, "price": 0},
+        store,
+    )
+    events.add_session(store.events, e["id"], {"id": "S1", "title": "Deep dive", "speaker": "S", "room": "R", "capacity": 2}, store)
+
+    def register(aid):
+        data = {"event_id": e["id"], "attendee_id": aid, "ticket_type": "General", "payment_method": "Card", "sessions": ["S1", "X"]}
+        return reg_mod.create_registration(store.registrations, data, store.events, store)
+
+    def attendance():
+        return checkin.session_attendance(store.registrations, e["id"], "S1", store)
+
+    a, b, c, d = (register(f"A{i}") for i in range(4))
+    assert a["sessions"] == b["sessions"] == ["S1", "X"]
+    assert c["sessions"] == ["X"] and c["session_waitlist"] == {"S1": 1} and d["session_waitlist"] == {"S1": 2}
+    assert reg_mod.session_waitlist_position(d, "S1", store) == 2
+
+    checkin.check_in_attendee(store.registrations, a["id"], store)
+    reg_mod.transfer_ticket(store.registrations, a["id"], "B0", store)
+    assert attendance() == {"event_id": e["id"], "session_id": "S1", "registered": 2, "checked_in": 1, "waitlisted": 2}
+
+    # a's place goes to c, the first in the session's queue
+    reg_mod.cancel_registration(store.registrations, a["id"], store.events, store)
+    assert c["sessions"] == ["X", "S1"] and "session_waitlist" not in c
+    assert reg_mod.session_waitlist_position(d, "S1", store) == 1
+    assert attendance() == {"event_id": e["id"], "session_id": "S1", "registered": 2, "checked_in": 0, "waitlisted": 1}
+
+    # promoted from the event waitlist, the next registration queues for S1 behind d
+    register("A4")
+    late = register("A5")
+    assert late["status"] == "waitlisted" and late["sessions"] == ["S1", "X"]
+    reg_mod.cancel_registration(store.registrations, b["id"], store.events, store)
+    assert d["sessions"] == ["X", "S1"]
+    reg_mod.promote_waitlist(store.registrations, e["id"], store)
+    assert late["status"] == "confirmed" and late["session_waitlist"] == {"S1": 4}
+
+    rebuilt = Store(store.events, [], store.registrations)
+    assert checkin.session_attendance(rebuilt.registrations, e["id"], "S1", rebuilt) == attendance()
+    assert checkin.session_attendance(store.registrations, e["id"], "S1") == attendance()
+
+    # bulk imports fit sessions row by row, in a dry run too
+    import bulk_import
+
+    small = events.create_event(
+        store.events,
+        {"name": "Tiny", "location": "Y", "start_date": "2030-01-01", "end_date": "2030-01-01", "capacity": 10, "price": 0},
+        store,
+    )
+    events.add_session(store.events, small["id"], {"id": "T1", "title": "T", "speaker": "S", "room": "R", "capacity": 1}, store)
+    rows = [
+        {"event_id": small["id"], "attendee_id": f"T{i}", "ticket_type": "General", "payment_method": "Card", "sessions": ["T1"]}
+        for i in range(4)
+    ]
+    for dry_run in (True, False):
+        created = bulk_import.import_registrations(store, rows, dry_run=dry_run)["created"]
+        assert created[0]["sessions"] == ["T1"] and "session_waitlist" not in created[0]
+        assert [r["session_waitlist"] for r in created[1:]] == [{"T1": 1}, {"T1": 2}, {"T1": 3}]
+    assert len(store.session_roster(small["id"], "T1")) == 1 and len(store.session_waitlist(small["id"], "T1")) == 3
+
+    # without a store, on bare lists
+    evts = [{"id": "E", "capacity": 5, "sessions": [{"id": "S1", "capacity": 1}]}]
+    regs = [
+        {"id": "R1", "event_id": "E", "status": "cancelled", "sessions": ["S1"]},
+        {"id": "R2", "event_id": "E", "status": "confirmed", "sessions": [], "session_waitlist": {"S1": 1}},
+    ]
+    promoted = reg_mod.promote_session_waitlist(regs, "E", "S1", evts)
+    assert promoted is regs[1] and regs[1]["sessions"] == ["S1"] and "session_waitlist" not in regs[1]
+
+
+def test_schedule_rejects_room_and_attendee_conflicts():
+    import schedule
+
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {"name": "SchedConf", "location": "Hub", "start_date": "2030-01-01", "end_date": "2030-01-02", "capacity": 9, "price": 0},
+        store,
+    )
+
+    def session(sid, room, start, end):
+        data = {"id": sid, "title": sid, "speaker": "S", "room": room, "capacity": 9,
+                "start_time": f"2030-01-01T{start}", "end_time": f"2030-01-01T{end}"}
+        return events.add_session(store.events, e["id"], data, store)
+
+    session("S1", "Hall", "09:00", "10:00")
+    session("S2", "Hall", "10:00", "11:00")
+    session("S3", "Lab", "09:30", "10:30")
+    try:
+        session("S4", " hall", "10:30", "11:30")
+        assert False, "Hall is booked"
+    except ValueError as ex:
+        assert "S2" in str(ex)
+    assert [s["id"] for s in e["sessions"]] == ["S1", "S2", "S3"]
+
+    def register(aid, sessions):
+        data = {"event_id": e["id"], "attendee_id": aid, "ticket_type": "General", "payment_method": "Card", "sessions": sessions}
+        return reg_mod.create_registration(store.registrations, data, store.events, store)
+
+    for bad in (["S1", "S3"], ["S2", "S3"]):
+        try:
+            register("A1", bad)
+            assert False, f"{bad} overlap"
+        except ValueError as ex:
+            assert "overlaps" in str(ex)
+    r = register("A1", ["S1", "S2"])
+    other = register("A2", ["S3"])
+    try:
+        reg_mod.transfer_ticket(store.registrations, other["id"], "A1", store)
+        assert False, "A1 is in S1 and S2"
+    except ValueError:
+        pass
+    reg_mod.cancel_registration(store.registrations, r["id"], store.events, store)
+    reg_mod.transfer_ticket(store.registrations, other["id"], "A1", store)
+
+    # two events racing to book the same attendees into overlapping sessions
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    twins = []
+    for loc in ("North", "South"):
+        twin = events.create_event(
+            store.events,
+            {"name": loc, "location": loc, "start_date": "2030-02-01", "end_date": "2030-02-01", "capacity": 99, "price": 0},
+            store,
+        )
+        events.add_session(
+            store.events,
+            twin["id"],
+            {"id": "K", "title": "K", "speaker": "S", "room": "Main", "capacity": 99,
+             "start_time": "2030-02-01T09:00", "end_time": "2030-02-01T10:00"},
+            store,
+        )
+        twins.append(twin["id"])
+
+    def race(n):
+        data = {"event_id": twins[n % 2], "attendee_id": f"R{n // 2}", "ticket_type": "General", "payment_method": "Card", "sessions": ["K"]}
+        try:
+            return reg_mod.create_registration(store.registrations, data, store.events, store)
+        except ValueError:
+            return None
+
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            booked = [r for r in pool.map(race, range(200)) if r is not None]
+    finally:
+        sys.setswitchinterval(old)
+    assert sorted(r["attendee_id"] for r in booked) == sorted(f"R{i}" for i in range(100))
+
+    # rows earlier in one import count against the later rows of the same attendee
+    import bulk_import
+
+    rows = [
+        {"event_id": e["id"], "attendee_id": "A9", "ticket_type": "General", "payment_method": "Card", "sessions": s}
+        for s in (["S1"], ["S3"], ["S2"])
+    ]
+    result = bulk_import.import_registrations(store, rows, dry_run=True)
+    assert [n for n, _ in result["errors"]] == [2] and result["confirmed"] == 2
+
+    # data written without these checks still shows up in the sweep-line report
+    e["sessions"].append({"id": "S5", "room": "Lab", "start_time": "2030-01-01T10:00", "end_time": "2030-01-01T12:00"})
+    other["sessions"].append("S2")
+    report = schedule.conflict_report(Store(store.events, [], store.registrations), e["id"])
+    assert [(c["first"], c["second"], c["from"]) for c in report["rooms"]] == [
+        ([e["id"], "S3"], [e["id"], "S5"], "2030-01-01T10:00:00")
+    ]
+    assert [(c["attendee_id"], c["first"], c["second"]) for c in report["attendees"]] == [
+        ("A1", [e["id"], "S3"], [e["id"], "S2"])
+    ]
+
+    # moving an event takes its sessions' rooms along to the new location
+    def annex(name, start, end):
+        ev = events.create_event(
+            store.events,
+            {"name": name, "location": "Annex", "start_date": "2030-01-01", "end_date": "2030-01-01", "capacity": 9, "price": 0},
+            store,
+        )
+        events.add_session(
+            store.events,
+            ev["id"],
+            {"id": "T1", "title": "T", "speaker": "S", "room": "Hall", "capacity": 9,
+             "start_time": f"2030-01-01T{start}", "end_time": f"2030-01-01T{end}"},
+            store,
+        )
+        return ev
+
+    moving = annex("Moving", "12:00", "13:00")
+    events.update_event(store.events, moving["id"], {"location": "hub"}, store)
+    try:
+        session("S6", "Hall", "12:30", "13:00")
+        assert False, "Hall at Hub is booked by the moved event"
+    except ValueError as ex:
+        assert moving["id"] in str(ex)
+    annex("Stays", "12:00", "13:00")
+    blocked = annex("Blocked", "09:30", "10:00")
+    try:
+        events.update_event(store.events, blocked["id"], {"location": "Hub"}, store)
+        assert False, "Hall at Hub is booked by S1"
+    except ValueError:
+        assert blocked["location"] == "Annex"
+
+
+def test_checkin_analytics_stream_backfill_and_export():
+    import json
+
+    import analytics
+
+    store = Store()
+    e = events.create_event(
+        store.events,
+        {"name": "DoorConf", "location": "X", "start_date": "2030-01-01", "end_date": "2030-01-01", "capacity": 10, "price": 0},
+        store,
+    )
+    regs = [
+        reg_mod.create_registration(
+            store.registrations,
+            {"event_id": e["id"], "attendee_id": f"A{i}", "ticket_type": "VIP" if i < 2 else "General", "payment_method": "Card"},
+            store.events,
+            store,
+        )
+        for i in range(6)
+    ]
+    # two earlier check-ins are on record before the listener exists
+    for r, ts in zip(regs[:2], ["2030-01-01T08:00:10", "2030-01-01T08:00:50"]):
+        with store.updating(r):
+            r["status"], r["checkin_timestamp"] = "checked-in", ts
+
+    live = analytics.CheckinAnalytics(store)
+    checkin.check_in_attendee(store.registrations, regs[2]["id"], store)
+    minute = regs[2]["checkin_timestamp"][:16]
+    assert live.per_minute(e["id"]) == {"2030-01-01T08:00": 2, minute: 1}
+    assert live.no_show_rates(e["id"]) == {
+        "General": {"registered": 4, "checked_in": 1, "no_show": 3, "no_show_rate": 0.75},
+        "VIP": {"registered": 2, "checked_in": 2, "no_show": 0, "no_show_rate": 0.0},
+    }
+    reg_mod.cancel_registration(store.registrations, regs[5]["id"], store.events, store)
+    assert live.no_show_rates(e["id"])["General"]["registered"] == 3
+
+    from datetime import datetime
+
+    # five active registrations over a 4-minute window; the live check-in
+    # happened before these doors opened, so it counts in the first minute
+    summary = live.summary(e["id"], doors_open="2030-01-01T08:00", window=4, now=datetime(2030, 1, 1, 8, 5))
+    assert list(summary["arrivals"]) == ["2030-01-01T08:0%d" % m for m in range(4)]
+    assert summary["arrivals"]["2030-01-01T08:00"] == {"checked_in": 2, "cumulative": 3, "expected": 1.2, "queue": 0.0}
+    assert summary["arrivals"]["2030-01-01T08:03"] == {"checked_in": 0, "cumulative": 3, "expected": 5.0, "queue": 2.0}
+    assert summary["queue_now"] == 2.0 and summary["per_minute_now"] == 0.0 and summary["peak_per_minute"] == 2
+
+    offline = analytics.CheckinAnalytics().backfill(iter(store.registrations))
+    assert offline.per_minute(e["id"]) == live.per_minute(e["id"])
+    live.close()
+    checkin.check_in_attendee(store.registrations, regs[3]["id"], store)
+    assert sum(live.per_minute(e["id"]).values()) == 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = analytics.export(offline, e["id"], os.path.join(tmp, "doors.json"), doors_open="2030-01-01T08:00", window=3)
+        with open(path, encoding="utf-8") as f:
+            assert list(json.load(f)["arrivals"])[:3] == ["2030-01-01T08:00", "2030-01-01T08:01", "2030-01-01T08:02"]
+        path = analytics.export(offline, e["id"], os.path.join(tmp, "doors.csv"), doors_open="2030-01-01T08:00", window=3)
+        with open(path, encoding="utf-8") as f:
+            assert f.readline().strip() == "key,checked_in,cumulative,expected,queue"
+
+
+def test_checkin_analytics_bounds_arrivals_to_the_window():
+    from datetime import datetime
+
+    import analytics
+
+    regs = [
+        {"id": f"R{i}", "event_id": "E", "ticket_type": "General", "status": "checked-in", "checkin_timestamp": ts}
+        for i, ts in enumerate(["2030-01-01T08:01:00", "2030-01-01T07:59:00", "2031-06-01T12:00:00"])
+    ]
+    stats = analytics.CheckinAnalytics().backfill(regs)
+    table = stats.arrivals("E", datetime(2030, 1, 1, 8, 0), window=3)
+    assert list(table) == ["2030-01-01T08:00", "2030-01-01T08:01", "2030-01-01T08:02"]
+    assert table["2030-01-01T08:02"]["cumulative"] == 2
+    summary = stats.summary("E", doors_open="2030-01-01T08:00", window=3, now=datetime(2032, 1, 1))
+    assert len(summary["arrivals"]) == 3
+    assert (summary["before_window"], summary["after_window"], summary["checked_in"]) == (1, 1, 3)
+
+
+def test_result_cache_follows_data_generations():
+    import cache
+    import reports
+
+    store = Store()
+    a, b = [
+        events.create_event(
+            store.events,
+            {"name": n, "location": "X", "start_date": "2030-01-01", "end_date": "2030-01-01", "capacity": 5, "price": 10},
+            store,
+        )
+        for n in ("A", "B")
+    ]
+    regs = [
+        reg_mod.create_registration(
+            store.registrations,
+            {"event_id": eid, "attendee_id": f"A{i}", "ticket_type": "General", "payment_method": "Card"},
+            store.events,
+            store,
+        )
+        for i, eid in enumerate([a["id"], a["id"], b["id"]])
+    ]
+    for r in regs:
+        with store.updating(r):
+            r["payment_status"] = "paid"
+
+    rep = reports.attendance_report(store.events, store.registrations, store=store)
+    assert reports.attendance_report(store.events, store.registrations, store=store) is rep
+    revenue_a = reg_mod.calculate_event_revenue(store.registrations, a["id"], store)
+    revenue_b = reg_mod.calculate_event_revenue(store.registrations, b["id"], store)
+    assert (revenue_a, revenue_b) == (regs[0]["price"] * 2, regs[2]["price"])
+    assert checkin.list_checked_in_attendees(store.registrations, a["id"], store) == []
+
+    # a change to event A leaves B's entries valid and recomputes A's and the reports
+    gen_b = store.generation(b["id"])
+    checkin.check_in_attendee(store.registrations, regs[0]["id"], store)
+    assert store.generation(b["id"]) == gen_b
+    hits = store.results.hits
+    assert reg_mod.calculate_event_revenue(store.registrations, b["id"], store) == revenue_b
+    assert store.results.hits == hits + 1
+    assert checkin.list_checked_in_attendees(store.registrations, a["id"], store) == [regs[0]]
+    rep2 = reports.attendance_report(store.events, store.registrations, store=store)
+    assert rep2 is not rep and rep2[a["id"]]["checked_in"] == 1
+
+    # other lists than the store's own are computed, never served from the cache
+    subset = reports.attendance_report([b], store.registrations, store=store)
+    assert list(subset) == [b["id"]]
+    assert reg_mod.calculate_event_revenue(store.registrations[1:], a["id"], store) == regs[1]["price"]
+    assert checkin.list_checked_in_attendees([], a["id"], store) == []
+
+    views = reports.ReportViews(store, verify=True)
+    assert views.attendance_report() is views.attendance_report()
+    events.update_event(store.events, a["id"], {"name": "A2"}, store)
+    assert views.attendance_report()[a["id"]]["event_name"] == "A2"
+
+    # bounded, least recently used out first
+    lru = cache.ResultCache(maxsize=2)
+    for k in ("x", "y"):
+        lru.get_or_compute((k,), 1, lambda k=k: k)
+    lru.get_or_compute(("x",), 1, lambda: "stale")
+    lru.get_or_compute(("z",), 1, lambda: "z")
+    assert len(lru) == 2 and lru.get_or_compute(("x",), 1, lambda: "new") == "x"
+    assert lru.get_or_compute(("y",), 1, lambda: "recomputed") == "recomputed"
+    assert lru.get_or_compute(("x",), 2, lambda: "next") == "next"
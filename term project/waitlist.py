@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import heapq
+from typing import List, Dict, Any, Optional
+
+
+class Waitlist:
+    # Heap ordered by (waitlist_position, created_at) with lazy deletion, plus
+    # a Fenwick tree over positions so an entry's rank is computed on demand
+    # instead of renumbering everyone behind a promoted registration.
+
+    def __init__(self) -> None:
+        self._heap: list[tuple] = []
+        self._active: dict[str, tuple[int, int]] = {}  # registration id -> (position, token)
+        self._token = 0
+        self._freq: list[int] = [0]
+        self._tree: list[int] = [0]
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __contains__(self, registration_id: str) -> bool:
+        return registration_id in self._active
+
+    def add(self, registration: dict, position: int | None = None) -> None:
+        # position defaults to the event waitlist's; session waitlists pass their own
+        rid = registration.get("id")
+        if rid in self._active:
+            self.remove(rid)
+        pos = int((registration.get("waitlist_position") if position is None else position) or 0)
+        self._token += 1
+        self._active[rid] = (pos, self._token)
+        heapq.heappush(self._heap, (pos, registration.get("created_at", ""), self._token, rid))
+        self._bump(pos, 1)
+
+    def remove(self, registration_id: str) -> None:
+        entry = self._active.pop(registration_id, None)
+        if entry is not None:
+            self._bump(entry[0], -1)
+        if not self._active:
+            self._heap.clear()
+
+    def peek(self) -> str | None:
+        heap = self._heap
+        while heap:
+            _, _, token, rid = heap[0]
+            entry = self._active.get(rid)
+            if entry is not None and entry[1] == token:
+                return rid
+            heapq.heappop(heap)
+        return None
+
+    def pop(self) -> str | None:
+        rid = self.peek()
+        if rid is not None:
+            heapq.heappop(self._heap)
+            self.remove(rid)
+        return rid
+
+    def rank(self, registration_id: str) -> int | None:
+        entry = self._active.get(registration_id)
+        if entry is None:
+            return None
+        return self._prefix(entry[0] - 1) + 1
+
+    # Fenwick tree indexed by position + 1 so legacy entries without a
+    # position (treated as 0, i.e. first in line) still fit.
+
+    def _bump(self, pos: int, delta: int) -> None:
+        i = pos + 1
+        if i >= len(self._freq):
+            self._grow(i)
+        self._freq[i] += delta
+        tree = self._tree
+        n = len(tree)
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, pos: int) -> int:
+        i = min(pos + 1, len(self._tree) - 1)
+        total = 0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _grow(self, i: int) -> None:
+        size = max(i + 1, 2 * len(self._freq))
+        self._freq.extend([0] * (size - len(self._freq)))
+        tree = self._freq[:]
+        for j in range(1, size):
+            parent = j + (j & -j)
+            if parent < size:
+                tree[parent] += tree[j]
+        self._tree = tree